@@ -0,0 +1,461 @@
+# -*- coding: utf-8 -*-
+"""Yerel banka protokol simülatörü (EST, Garanti, PosNet, PayFor).
+
+Gerçek banka test ortamları hız sınırlı ve kararsız olduğundan yük testleri
+bu sunucuya karşı yapılır. Simülatör modülün ürettiği istekleri konuşur:
+
+- ``POST /api``: CC5Request / GVPSRequest / posnetRequest / PayforRequest XML
+  gövdeleri ve non-secure ödemenin form gövdeleri
+- ``POST /3d``: 3D form gönderimleri; ``_est_process_3d_return`` ve
+  ``_garanti_process_3d_return`` tarafından kabul edilen hash'lerle dönüş
+  adresine otomatik gönderilen bir form döndürür
+- ``GET/POST /__config``: gecikme, hata oranı ve yanıt kodlarını çalışırken
+  okur/günceller
+- ``GET /__stats``: istek sayaçları
+
+Sağlayıcının test URL'leri simülatöre yönlendirilmelidir::
+
+    api_url_test    = http://127.0.0.1:8099/api
+    api_3d_url_test = http://127.0.0.1:8099/3d
+
+Kullanım::
+
+    python -m benchmarks.bank_simulator --port 8099 --store-key TEST1234 \\
+        --latency-ms 150 --jitter-ms 50 --error-rate 0.01 --decline-rate 0.05
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    'store_key': 'TEST1234',
+    'hash_algorithm': 'sha256',
+    'latency_ms': 0.0,
+    'jitter_ms': 0.0,
+    'error_rate': 0.0,           # HTTP 503 döndürülen isteklerin oranı
+    'timeout_rate': 0.0,         # timeout_ms kadar bekletilen isteklerin oranı
+    'timeout_ms': 35000.0,
+    'decline_rate': 0.0,         # Banka tarafından reddedilen işlemlerin oranı
+    'approve_code': '00',
+    'decline_code': '05',
+    'md_status': '1',
+    'declined_md_status': '0',
+}
+
+
+def _hash(data, algorithm):
+    if algorithm == 'sha512':
+        return hashlib.sha512(data.encode('utf-8')).hexdigest()
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class BankState(object):
+    """Simülatörün sipariş defteri ve ayarları"""
+
+    def __init__(self, config):
+        self.config = dict(DEFAULT_CONFIG, **config)
+        self.orders = {}
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+    def update(self, values):
+        with self.lock:
+            for key, value in values.items():
+                if key in DEFAULT_CONFIG:
+                    self.config[key] = type(DEFAULT_CONFIG[key])(value)
+
+    def approve(self):
+        return random.random() >= self.config['decline_rate']
+
+    def new_ids(self):
+        return {
+            'auth_code': '%06d' % random.randint(0, 999999),
+            'trans_id': uuid.uuid4().hex[:20].upper(),
+            'rrn': '%012d' % random.randint(0, 10 ** 12 - 1),
+        }
+
+    def record(self, order_id, **values):
+        with self.lock:
+            self.orders.setdefault(order_id, {}).update(values)
+            return dict(self.orders[order_id])
+
+    def get(self, order_id):
+        with self.lock:
+            return dict(self.orders.get(order_id) or {})
+
+
+# ==================== XML API ====================
+
+def _text(root, path):
+    return (root.findtext(path) or '').strip()
+
+
+def _cc5_response(state, code, message='', order_id='', extra=None, ids=None):
+    ids = ids or {}
+    root = ET.Element('CC5Response')
+    ET.SubElement(root, 'OrderId').text = order_id
+    ET.SubElement(root, 'GroupId').text = order_id
+    ET.SubElement(root, 'Response').text = 'Approved' if code == '00' else 'Declined'
+    ET.SubElement(root, 'AuthCode').text = ids.get('auth_code', '')
+    ET.SubElement(root, 'HostRefNum').text = ids.get('rrn', '')
+    ET.SubElement(root, 'ProcReturnCode').text = code
+    ET.SubElement(root, 'TransId').text = ids.get('trans_id', '')
+    ET.SubElement(root, 'ErrMsg').text = message
+    extra_elem = ET.SubElement(root, 'Extra')
+    for key, value in (extra or {}).items():
+        ET.SubElement(extra_elem, key).text = value
+    return ET.tostring(root, encoding='ISO-8859-9', xml_declaration=True)
+
+
+def handle_cc5(state, root):
+    request_type = _text(root, 'Type')
+    order_id = _text(root, 'OrderId')
+    config = state.config
+    state.stats['cc5_%s' % request_type] += 1
+
+    if request_type == 'OrderInq':
+        order = state.get(order_id)
+        if not order:
+            return _cc5_response(state, '99', 'Order not found', order_id)
+        return _cc5_response(state, '00', '', order_id, extra={
+            'TRANS_STAT': order.get('status', 'A'),
+            'REFUND_AMOUNT': '%.2f' % order.get('refunded', 0.0),
+        }, ids=order)
+
+    if not state.approve():
+        return _cc5_response(state, config['decline_code'], 'Declined by simulator', order_id)
+
+    ids = state.new_ids()
+    if request_type == 'Void':
+        state.record(order_id, status='V', **ids)
+    elif request_type == 'Credit':
+        order = state.get(order_id)
+        refunded = order.get('refunded', 0.0) + float(_text(root, 'Total') or 0)
+        state.record(order_id, status=order.get('status', 'A'), refunded=refunded)
+    else:
+        state.record(order_id, status='A', **ids)
+    return _cc5_response(state, config['approve_code'], '', order_id, ids=ids)
+
+
+def _gvps_response(code, message='', order_id='', ids=None):
+    ids = ids or {}
+    root = ET.Element('GVPSResponse')
+    ET.SubElement(root, 'Mode').text = 'TEST'
+    order = ET.SubElement(root, 'Order')
+    ET.SubElement(order, 'OrderID').text = order_id
+    transaction = ET.SubElement(root, 'Transaction')
+    response = ET.SubElement(transaction, 'Response')
+    ET.SubElement(response, 'Source').text = 'HOST'
+    ET.SubElement(response, 'Code').text = code
+    ET.SubElement(response, 'ReasonCode').text = code
+    ET.SubElement(response, 'Message').text = 'Approved' if code == '00' else 'Declined'
+    ET.SubElement(response, 'ErrorMsg').text = message
+    ET.SubElement(transaction, 'RetrefNum').text = ids.get('rrn', '')
+    ET.SubElement(transaction, 'AuthCode').text = ids.get('auth_code', '')
+    return ET.tostring(root, encoding='UTF-8', xml_declaration=True)
+
+
+def handle_gvps(state, root):
+    request_type = _text(root, 'Transaction/Type')
+    order_id = _text(root, 'Order/OrderID')
+    config = state.config
+    state.stats['gvps_%s' % request_type] += 1
+
+    if request_type == 'orderinq':
+        order = state.get(order_id)
+        if not order:
+            return _gvps_response('99', 'Order not found', order_id)
+        return _gvps_response('00', '', order_id, ids=order)
+
+    if not state.approve():
+        return _gvps_response(config['decline_code'], 'Declined by simulator', order_id)
+
+    ids = state.new_ids()
+    state.record(order_id, status='V' if request_type == 'void' else 'A', **ids)
+    return _gvps_response(config['approve_code'], '', order_id, ids=ids)
+
+
+def handle_posnet(state, root):
+    state.stats['posnet'] += 1
+    approved = state.approve()
+    ids = state.new_ids()
+    response = ET.Element('posnetResponse')
+    ET.SubElement(response, 'approved').text = '1' if approved else '0'
+    ET.SubElement(response, 'respCode').text = '' if approved else state.config['decline_code']
+    ET.SubElement(response, 'respText').text = '' if approved else 'Declined by simulator'
+    ET.SubElement(response, 'hostlogkey').text = ids['rrn']
+    ET.SubElement(response, 'authCode').text = ids['auth_code'] if approved else ''
+    return ET.tostring(response, encoding='ISO-8859-9', xml_declaration=True)
+
+
+def handle_payfor(state, root):
+    state.stats['payfor'] += 1
+    approved = state.approve()
+    ids = state.new_ids()
+    response = ET.Element('PayforResponse')
+    ET.SubElement(response, 'OrderId').text = _text(root, 'OrderId') or _text(root, 'OrgOrderId')
+    ET.SubElement(response, 'ProcReturnCode').text = state.config['approve_code'] if approved else state.config['decline_code']
+    ET.SubElement(response, 'AuthCode').text = ids['auth_code'] if approved else ''
+    ET.SubElement(response, 'TransId').text = ids['trans_id']
+    ET.SubElement(response, 'ErrMsg').text = '' if approved else 'Declined by simulator'
+    return ET.tostring(response, encoding='UTF-8', xml_declaration=True)
+
+
+XML_HANDLERS = {
+    'CC5Request': handle_cc5,
+    'GVPSRequest': handle_gvps,
+    'posnetRequest': handle_posnet,
+    'PayforRequest': handle_payfor,
+}
+
+
+def handle_non_secure_form(state, form):
+    """Non-secure ödemede form olarak gönderilen Auth isteğini yanıtlar"""
+    state.stats['form_auth'] += 1
+    approved = state.approve()
+    ids = state.new_ids() if approved else {}
+    if 'terminalid' in form:
+        order_id = form.get('orderid', '')
+        if approved:
+            state.record(order_id, status='A', **ids)
+        code = state.config['approve_code'] if approved else state.config['decline_code']
+        return _gvps_response(code, '' if approved else 'Declined by simulator', order_id, ids=ids)
+    order_id = form.get('oid') or form.get('OrderId') or ''
+    if approved:
+        state.record(order_id, status='A', **ids)
+    code = state.config['approve_code'] if approved else state.config['decline_code']
+    return _cc5_response(state, code, '' if approved else 'Declined by simulator', order_id, ids=ids)
+
+
+# ==================== 3D FORM ====================
+
+def _est_callback(state, form):
+    config = state.config
+    approved = state.approve()
+    ids = state.new_ids() if approved else {'auth_code': '', 'trans_id': '', 'rrn': ''}
+    order_id = form.get('oid', '')
+    values = {
+        'clientid': form.get('clientid', ''),
+        'oid': order_id,
+        'AuthCode': ids['auth_code'],
+        'ProcReturnCode': config['approve_code'] if approved else config['decline_code'],
+        'Response': 'Approved' if approved else 'Declined',
+        'mdStatus': config['md_status'] if approved else config['declined_md_status'],
+        'transId': ids['trans_id'],
+        'HostRefNum': ids['rrn'],
+        'amount': form.get('amount', ''),
+        'taksit': form.get('taksit', ''),
+        'rnd': form.get('rnd', ''),
+        'mdErrorMsg': '' if approved else 'Declined by simulator',
+    }
+    hash_params = ['clientid', 'oid', 'AuthCode', 'ProcReturnCode', 'Response', 'mdStatus', 'rnd']
+    values['HASHPARAMS'] = ':'.join(hash_params) + ':'
+    values['HASHPARAMSVAL'] = ''.join(values[name] for name in hash_params)
+    values['HASH'] = _hash(values['HASHPARAMSVAL'] + config['store_key'], config['hash_algorithm'])
+    if approved:
+        state.record(order_id, status='A', **ids)
+    return form.get('okUrl') if approved else form.get('failUrl'), values
+
+
+def _garanti_callback(state, form):
+    config = state.config
+    approved = state.approve()
+    ids = state.new_ids() if approved else {'auth_code': '', 'trans_id': '', 'rrn': ''}
+    order_id = form.get('orderid', '')
+    values = {
+        'clientid': form.get('terminalid', ''),
+        'oid': order_id,
+        'orderId': order_id,
+        'authCode': ids['auth_code'],
+        'procReturnCode': config['approve_code'] if approved else config['decline_code'],
+        'mdStatus': config['md_status'] if approved else config['declined_md_status'],
+        'transId': ids['trans_id'],
+        'mdErrorMsg': '' if approved else 'Declined by simulator',
+    }
+    hash_data = '%s%s%s%s%s%s' % (values['clientid'], values['oid'], values['authCode'],
+                                  values['procReturnCode'], values['mdStatus'], config['store_key'])
+    values['HASH'] = _hash(hash_data, 'sha256').upper()
+    if approved:
+        state.record(order_id, status='A', **ids)
+    return form.get('successurl') if approved else form.get('errorurl'), values
+
+
+def _posnet_callback(state, form):
+    approved = state.approve()
+    ids = state.new_ids()
+    values = {
+        'posnet_order_id': form.get('orderID', ''),
+        'MerchantPacket': uuid.uuid4().hex,
+        'BankPacket': uuid.uuid4().hex,
+        'Sign': uuid.uuid4().hex,
+        'mdStatus': state.config['md_status'] if approved else state.config['declined_md_status'],
+        'authCode': ids['auth_code'] if approved else '',
+    }
+    return form.get('url'), values
+
+
+def _payfor_callback(state, form):
+    config = state.config
+    approved = state.approve()
+    ids = state.new_ids()
+    values = {
+        'OrderId': form.get('OrderId', ''),
+        'ProcReturnCode': config['approve_code'] if approved else config['decline_code'],
+        '3DStatus': config['md_status'] if approved else config['declined_md_status'],
+        'AuthCode': ids['auth_code'] if approved else '',
+        'TransId': ids['trans_id'],
+    }
+    hash_data = '%s%s%s%s' % (form.get('MbrId', ''), values['OrderId'], values['AuthCode'], values['ProcReturnCode'])
+    values['ResponseHash'] = _hash(hash_data + config['store_key'], config['hash_algorithm'])
+    return form.get('OkUrl') if approved else form.get('FailUrl'), values
+
+
+def handle_3d_form(state, form):
+    """3D formunu yanıtlar: dönüş adresine otomatik gönderilen HTML formu"""
+    if 'clientid' in form and 'oid' in form:
+        dialect, handler = 'est', _est_callback
+    elif 'terminalid' in form:
+        dialect, handler = 'garanti', _garanti_callback
+    elif 'posnetID' in form:
+        dialect, handler = 'posnet', _posnet_callback
+    elif 'MbrId' in form:
+        dialect, handler = 'payfor', _payfor_callback
+    else:
+        return None
+    state.stats['3d_%s' % dialect] += 1
+    action, values = handler(state, form)
+    inputs = ''.join(
+        '<input type="hidden" name="%s" value="%s"/>' % (html.escape(key), html.escape(value or ''))
+        for key, value in values.items()
+    )
+    page = (
+        '<!DOCTYPE html><html><body onload="document.forms[0].submit()">'
+        '<form method="post" action="%s">%s</form></body></html>'
+    ) % (html.escape(action or ''), inputs)
+    return page.encode('utf-8')
+
+
+# ==================== HTTP SUNUCU ====================
+
+class SimulatorHandler(BaseHTTPRequestHandler):
+    server_version = 'TurkeyPosBankSimulator/1.0'
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, fmt, *args):
+        _logger.debug(fmt, *args)
+
+    def _reply(self, status, body, content_type='text/xml; charset=utf-8'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate_network(self):
+        """Yapılandırılan gecikme ve hataları uygular; hata döndürüldüyse True"""
+        config = self.state.config
+        if config['timeout_rate'] and random.random() < config['timeout_rate']:
+            self.state.stats['timeouts'] += 1
+            time.sleep(config['timeout_ms'] / 1000.0)
+        delay = config['latency_ms'] + random.uniform(-config['jitter_ms'], config['jitter_ms'])
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        if config['error_rate'] and random.random() < config['error_rate']:
+            self.state.stats['errors'] += 1
+            self._reply(503, b'Service Unavailable', 'text/plain')
+            return True
+        return False
+
+    def do_GET(self):
+        if self.path.startswith('/__config'):
+            return self._reply(200, json.dumps(self.state.config).encode(), 'application/json')
+        if self.path.startswith('/__stats'):
+            return self._reply(200, json.dumps(self.state.stats).encode(), 'application/json')
+        self._reply(404, b'Not Found', 'text/plain')
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.state.stats['requests'] += 1
+
+        if self.path.startswith('/__config'):
+            self.state.update(json.loads(body or b'{}'))
+            return self._reply(200, json.dumps(self.state.config).encode(), 'application/json')
+
+        if self._simulate_network():
+            return
+
+        content_type = self.headers.get('Content-Type', '')
+        if self.path.startswith('/3d'):
+            form = {key: values[0] for key, values in parse_qs(body.decode('utf-8')).items()}
+            page = handle_3d_form(self.state, form)
+            if page is None:
+                return self._reply(400, b'Unknown 3D dialect', 'text/plain')
+            return self._reply(200, page, 'text/html; charset=utf-8')
+
+        if 'xml' in content_type or body.lstrip().startswith(b'<'):
+            try:
+                root = ET.fromstring(body)
+            except ET.ParseError:
+                return self._reply(400, b'Malformed XML', 'text/plain')
+            handler = XML_HANDLERS.get(root.tag)
+            if not handler:
+                return self._reply(400, b'Unknown XML dialect', 'text/plain')
+            return self._reply(200, handler(self.state, root))
+
+        form = {key: values[0] for key, values in parse_qs(body.decode('utf-8')).items()}
+        return self._reply(200, handle_non_secure_form(self.state, form))
+
+
+class BankSimulator(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config=None):
+        super().__init__(address, SimulatorHandler)
+        self.state = BankState(config or {})
+
+    def start(self):
+        """Sunucuyu arka planda başlatır ve temel URL'yi döndürür"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        host, port = self.server_address[:2]
+        return 'http://%s:%s' % (host, port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    for key, value in DEFAULT_CONFIG.items():
+        parser.add_argument('--%s' % key.replace('_', '-'), dest=key, type=type(value), default=value)
+    args = parser.parse_args(argv)
+    config = {key: getattr(args, key) for key in DEFAULT_CONFIG}
+
+    logging.basicConfig(level=logging.INFO)
+    server = BankSimulator((args.host, args.port), config)
+    _logger.info('Bank simulator listening on http://%s:%s', args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""Uçtan uca ödeme akışı performans testi.
+
+Her sanal müşteri şu adımları sırayla yürütür:
+
+1. ``POST /payment/turkey_pos/process`` (işlem oluşturma, 3D formu)
+2. 3D formunun banka simülatörüne gönderilmesi
+3. Simülatörün döndürdüğü formun ``/payment/turkey_pos/3d_return/<id>``
+   adresine gönderilmesi (``_process_notification_data``,
+   ``_create_pos_order`` ve ``_reconcile_after_done`` bu istekte çalışır)
+
+Sonuç olarak adım bazında p50/p95/p99 gecikme, saniyedeki işlem sayısı ve
+(``--pg-dsn`` verilirse ``pg_stat_statements`` üzerinden) işlem başına SQL
+sorgu sayısı JSON olarak yazılır; sürümler arası karşılaştırma bu dosya
+üzerinden yapılır.
+
+Sağlayıcının test URL'leri ``benchmarks.bank_simulator`` adresine
+yönlendirilmiş ve 3D Secure açık olmalıdır. Örnek::
+
+    python -m benchmarks.bank_simulator --port 8099 &
+    python -m benchmarks.checkout_benchmark --base-url http://localhost:8069 \\
+        --provider-id 3 --transactions 500 --concurrency 20 \\
+        --pg-dsn "dbname=odoo" --output bench_output.json
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import requests
+
+_logger = logging.getLogger(__name__)
+
+STEPS = ('process', 'bank_3d', 'return', 'total')
+
+SQL_CALLS_QUERY = "SELECT coalesce(sum(calls), 0) FROM pg_stat_statements WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())"
+
+
+class FormParser(HTMLParser):
+    """Sayfadaki ilk formun action adresini ve gizli alanlarını toplar"""
+
+    def __init__(self):
+        super().__init__()
+        self.action = None
+        self.fields = {}
+        self._in_form = False
+        self._done = False
+
+    def handle_starttag(self, tag, attrs):
+        if self._done:
+            return
+        attrs = dict(attrs)
+        if tag == 'form':
+            self._in_form = True
+            self.action = attrs.get('action')
+        elif tag == 'input' and attrs.get('name') and (self._in_form or attrs.get('name') == 'csrf_token'):
+            self.fields[attrs['name']] = attrs.get('value') or ''
+
+    def handle_endtag(self, tag):
+        if tag == 'form' and self._in_form:
+            self._in_form = False
+            self._done = True
+
+
+def parse_form(text):
+    parser = FormParser()
+    parser.feed(text)
+    return parser.action, parser.fields
+
+
+def percentile(values, pct):
+    """En yakın sıra yöntemiyle yüzdelik değeri döndürür"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(math.ceil(pct / 100.0 * len(ordered))) - 1, 0)
+    return ordered[rank]
+
+
+def summarize(values):
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean_ms': round(sum(values) / len(values) * 1000, 2),
+        'p50_ms': round(percentile(values, 50) * 1000, 2),
+        'p95_ms': round(percentile(values, 95) * 1000, 2),
+        'p99_ms': round(percentile(values, 99) * 1000, 2),
+        'max_ms': round(max(values) * 1000, 2),
+    }
+
+
+class SqlCounter(object):
+    """``pg_stat_statements`` üzerinden çalıştırılan sorgu sayısını ölçer"""
+
+    def __init__(self, dsn):
+        import psycopg2
+        self.connection = psycopg2.connect(dsn)
+        self.connection.autocommit = True
+
+    def calls(self):
+        with self.connection.cursor() as cr:
+            cr.execute(SQL_CALLS_QUERY)
+            return int(cr.fetchone()[0])
+
+    def close(self):
+        self.connection.close()
+
+
+class CheckoutClient(object):
+    """Tek bir müşteri oturumu; her iş parçacığının kendi oturumu vardır"""
+
+    def __init__(self, args):
+        self.args = args
+        self.session = requests.Session()
+        self.csrf_token = None
+
+    def _csrf(self):
+        if self.csrf_token is None:
+            response = self.session.get(urljoin(self.args.base_url, self.args.csrf_page), timeout=self.args.timeout)
+            self.csrf_token = parse_form(response.text)[1].get('csrf_token', '')
+        return self.csrf_token
+
+    def checkout(self, index):
+        """Tek bir ödemeyi uçtan uca yürütür ve adım sürelerini döndürür"""
+        args = self.args
+        timings = {}
+        started = time.perf_counter()
+
+        post = {
+            'csrf_token': self._csrf(),
+            'provider_id': args.provider_id,
+            'amount': '%.2f' % args.amount,
+            'reference': '%s-%s-%d' % (args.reference_prefix, uuid.uuid4().hex[:8], index),
+            'card_number': args.card_number,
+            'expiry_month': args.expiry_month,
+            'expiry_year': args.expiry_year,
+            'cvv': args.cvv,
+            'installment_count': args.installment_count,
+            'email': 'benchmark@example.com',
+        }
+        step = time.perf_counter()
+        response = self.session.post(urljoin(args.base_url, '/payment/turkey_pos/process'),
+                                     data=post, timeout=args.timeout)
+        response.raise_for_status()
+        timings['process'] = time.perf_counter() - step
+        action, fields = parse_form(response.text)
+        if not action or not fields:
+            raise RuntimeError('3D form not found in /process response')
+
+        step = time.perf_counter()
+        response = self.session.post(action, data=fields, timeout=args.timeout)
+        response.raise_for_status()
+        timings['bank_3d'] = time.perf_counter() - step
+        action, fields = parse_form(response.text)
+        if not action:
+            raise RuntimeError('Callback form not found in bank response')
+
+        step = time.perf_counter()
+        response = self.session.post(urljoin(args.base_url, action), data=fields,
+                                     timeout=args.timeout, allow_redirects=False)
+        timings['return'] = time.perf_counter() - step
+        timings['total'] = time.perf_counter() - started
+
+        location = response.headers.get('Location', '')
+        return timings, '/payment/confirmation' in location
+
+
+def run(args):
+    local = threading.local()
+    durations = defaultdict(list)
+    outcomes = defaultdict(int)
+    lock = threading.Lock()
+
+    def worker(index):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = CheckoutClient(args)
+        try:
+            timings, approved = client.checkout(index)
+        except Exception as e:
+            _logger.debug('Checkout %s failed: %s', index, e)
+            with lock:
+                outcomes['error'] += 1
+                outcomes['error: %s' % type(e).__name__] += 1
+            return
+        with lock:
+            for name, value in timings.items():
+                durations[name].append(value)
+            outcomes['approved' if approved else 'declined'] += 1
+
+    for index in range(args.warmup):
+        worker(-index - 1)
+    durations.clear()
+    outcomes.clear()
+
+    sql_counter = SqlCounter(args.pg_dsn) if args.pg_dsn else None
+    sql_before = sql_counter.calls() if sql_counter else None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(worker, range(args.transactions)))
+    elapsed = time.perf_counter() - started
+
+    completed = outcomes['approved'] + outcomes['declined']
+    sql_per_transaction = None
+    if sql_counter:
+        # Sayım sorgusunun kendisi de bir çağrı olarak eklenir
+        sql_total = sql_counter.calls() - sql_before - 1
+        sql_counter.close()
+        sql_per_transaction = round(sql_total / completed, 2) if completed else None
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'label': args.label,
+        'host': platform.node(),
+        'parameters': {
+            'base_url': args.base_url,
+            'provider_id': args.provider_id,
+            'transactions': args.transactions,
+            'concurrency': args.concurrency,
+            'amount': args.amount,
+            'installment_count': args.installment_count,
+        },
+        'elapsed_seconds': round(elapsed, 3),
+        'tps': round(completed / elapsed, 2) if elapsed else None,
+        'outcomes': dict(outcomes),
+        'sql_queries_per_transaction': sql_per_transaction,
+        'latency': {name: summarize(durations[name]) for name in STEPS},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--base-url', default='http://localhost:8069')
+    parser.add_argument('--provider-id', required=True)
+    parser.add_argument('--transactions', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=5, help='ölçüme dahil edilmeyen ısınma işlemleri')
+    parser.add_argument('--amount', type=float, default=100.0)
+    parser.add_argument('--installment-count', type=int, default=1)
+    parser.add_argument('--reference-prefix', default='BENCH')
+    parser.add_argument('--card-number', default='4355084355084358')
+    parser.add_argument('--expiry-month', default='12')
+    parser.add_argument('--expiry-year', default='30')
+    parser.add_argument('--cvv', default='000')
+    parser.add_argument('--csrf-page', default='/web/login', help='csrf_token alınacak sayfa')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--pg-dsn', help='pg_stat_statements ile SQL sayımı için veritabanı bağlantısı')
+    parser.add_argument('--label', default=os.environ.get('BENCH_LABEL', ''))
+    parser.add_argument('--output', help='JSON sonuç dosyası (varsayılan: standart çıktı)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    result = run(args)
+    output = json.dumps(result, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        _logger.info('Results written to %s', args.output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Banka yanıtı ayrıştırıcı mikro performans testi.
+
+``benchmarks/samples`` altındaki örnek yanıtları (dosya adı öneki gateway
+tipidir) eski ElementTree tabanlı ayrıştırıcılarla ve
+``tools.response_parsers`` kaydındaki lxml ayrıştırıcılarıyla ayrıştırır,
+iki yolun aynı alanları döndürdüğünü doğrular ve çağrı başına süreleri
+JSON olarak yazar::
+
+    python -m benchmarks.parser_benchmark --number 20000
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import timeit
+import xml.etree.ElementTree as ET
+
+from tools import response_parsers
+
+SAMPLES_DIR = os.path.join(os.path.dirname(__file__), 'samples')
+
+# Dosya adı öneki -> gateway tipi
+SAMPLE_GATEWAYS = {
+    'est': 'est',
+    'garanti': 'garanti',
+}
+
+COMPARED_FIELDS = ('success', 'message', 'transaction_id')
+
+
+# ---- Önceki sürümün ayrıştırıcıları (karşılaştırma için) ----
+
+def legacy_parse_est(response_text):
+    root = ET.fromstring(response_text)
+    result = {'success': False, 'message': '', 'code': '', 'transaction_id': ''}
+    for elem in root:
+        if elem.tag == 'ProcReturnCode':
+            result['success'] = elem.text == '00'
+        elif elem.tag == 'ErrMsg':
+            result['message'] = elem.text or ''
+        elif elem.tag == 'TransId':
+            result['transaction_id'] = elem.text or ''
+        elif elem.tag == 'Response':
+            result['code'] = elem.text or ''
+    return result
+
+
+def legacy_parse_garanti(response_text):
+    root = ET.fromstring(response_text)
+    result = {'success': False, 'message': '', 'code': '', 'transaction_id': ''}
+    transaction = root.find('.//Transaction')
+    if transaction is not None:
+        response_elem = transaction.find('Response')
+        if response_elem is not None:
+            result['code'] = response_elem.findtext('Code', '')
+            result['message'] = response_elem.findtext('Message', '')
+            result['success'] = result['code'] == '00'
+        result['transaction_id'] = transaction.findtext('RetrefNum', '')
+    return result
+
+
+LEGACY_PARSERS = {
+    'est': legacy_parse_est,
+    'garanti': legacy_parse_garanti,
+}
+
+
+def load_samples():
+    """Örnekleri ``requests`` gibi bildirilen kodlamayla metne çözer"""
+    samples = []
+    for path in sorted(glob.glob(os.path.join(SAMPLES_DIR, '*.xml'))):
+        name = os.path.basename(path)
+        gateway_type = SAMPLE_GATEWAYS.get(name.split('_')[0])
+        if not gateway_type:
+            continue
+        with open(path, 'rb') as f:
+            data = f.read()
+        match = re.search(br'encoding="([^"]+)"', data[:100])
+        samples.append((name, gateway_type, data.decode(match.group(1).decode() if match else 'utf-8')))
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--number', type=int, default=10000, help='örnek başına çağrı sayısı')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='JSON sonuç dosyası (varsayılan: standart çıktı)')
+    args = parser.parse_args(argv)
+
+    results = []
+    for name, gateway_type, text in load_samples():
+        legacy = LEGACY_PARSERS[gateway_type]
+        current = response_parsers.get_parser(gateway_type)
+
+        old, new = legacy(text), current(text)
+        mismatched = [field for field in COMPARED_FIELDS if old[field] != new[field]]
+
+        timings = {}
+        for label, func in (('legacy', legacy), ('registry', current)):
+            best = min(timeit.repeat(lambda: func(text), number=args.number, repeat=args.repeat))
+            timings[label] = round(best / args.number * 1e6, 2)
+        results.append({
+            'sample': name,
+            'gateway_type': gateway_type,
+            'legacy_us': timings['legacy'],
+            'registry_us': timings['registry'],
+            'speedup': round(timings['legacy'] / timings['registry'], 2) if timings['registry'] else None,
+            'mismatched_fields': mismatched,
+        })
+
+    output = json.dumps({'number': args.number, 'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
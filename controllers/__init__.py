@@ -2,3 +2,4 @@
 
 from . import main
 from . import payment
+from . import website_sale
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import hmac
 import logging
 import json
 from datetime import datetime
@@ -8,8 +9,16 @@ from odoo import http, _, fields
 from odoo.http import request
 from odoo.exceptions import ValidationError, UserError
 
+from ..tools import metrics, routing
+
 _logger = logging.getLogger(__name__)
 
+# Taksit matrisi isteğinde kabul edilen en fazla tutar sayısı
+MATRIX_MAX_AMOUNTS = 50
+
+# Webhook gelen kutusuna kabul edilen en büyük gövde (bayt)
+WEBHOOK_MAX_BYTES = 64 * 1024
+
 
 class TurkeyPosController(http.Controller):
     """Türkiye Sanal POS Controller"""
@@ -36,10 +45,19 @@ class TurkeyPosController(http.Controller):
                 _logger.error('Order ID not found in 3D return data')
                 return request.redirect('/payment/error')
             
+            # Tekrarlanan dönüşler: sipariş kilidi ve saklanan sonuç
+            Callback = request.env['turkey.pos.callback'].sudo()
+            callback_hash = Callback._hash_payload(provider_id, post)
+            status, redirect_url = Callback._claim(order_id, callback_hash)
+            if status == 'locked':
+                _logger.info('3D return for order %s is already being processed', order_id)
+                return request.redirect('/payment/status')
+            if status == 'replay':
+                _logger.info('Duplicate 3D return for order %s, replaying stored outcome', order_id)
+                return request.redirect(redirect_url)
+            
             # İşlemi bul
-            transaction = request.env['payment.transaction'].sudo().search([
-                ('pos_order_id', 'like', order_id.split('_')[0] if '_' in order_id else order_id)
-            ], limit=1)
+            transaction = request.env['payment.transaction'].sudo()._find_by_pos_order_id(order_id, provider)
             
             if not transaction:
                 _logger.error('Transaction not found for order: %s', order_id)
@@ -48,10 +66,10 @@ class TurkeyPosController(http.Controller):
             # 3D dönüşünü işle ve sonucu al
             result = transaction._process_notification_data(post)
             
-            if result and result.get('success'):
-                return request.redirect('/payment/confirmation')
-            else:
-                return request.redirect('/payment/error')
+            success = bool(result and result.get('success'))
+            redirect_url = '/payment/confirmation' if success else '/payment/error'
+            Callback._store(order_id, callback_hash, transaction, success, redirect_url)
+            return request.redirect(redirect_url)
                 
         except Exception as e:
             _logger.exception('Error processing 3D return: %s', e)
@@ -73,16 +91,11 @@ class TurkeyPosController(http.Controller):
         if not sale_order.exists():
             return request.redirect('/shop/cart')
         
-        # Aktif sağlayıcıları al
-        providers = request.env['payment.provider'].sudo().search([
-            ('state', 'in', ['enabled', 'test']),
-            ('code', 'in', ['akbank', 'garanti', 'isbank', 'ziraat', 'halkbank',
-                           'vakifbank', 'vakifkatilim', 'yapikredi', 'finansbank',
-                           'denizbank', 'teb', 'sekerbank', 'kuveytturk', 'param', 'tosla'])
-        ])
+        # Aktif sağlayıcıları önerilen sırayla al
+        providers = self._get_checkout_providers()._rank_for_checkout(amount=float(amount))
         
         # Kategori bazlı taksit seçeneklerini al
-        installment_options = sale_order.get_category_based_installments()
+        installment_options = sale_order._get_installment_quote()
         
         values = {
             'sale_order': sale_order,
@@ -111,16 +124,13 @@ class TurkeyPosController(http.Controller):
                 return {'success': False, 'message': 'Banka bulunamadı'}
             
             # Taksit seçeneklerini al
-            options = request.env['installment.option'].sudo().search([
-                ('provider_id', '=', provider.id),
-                ('is_active', '=', True),
-                ('min_amount', '<=', amount),
-                ('max_amount', '>=', amount),
-            ])
+            options = request.env['installment.option'].sudo()._search_eligible(
+                amount, provider.id, max_count=self._get_pos_settings().max_installments(float(amount)))
             
+            quotes = options._price(amount)
             installments = []
             for opt in options:
-                calc = opt.calculate_installment_amount(amount)
+                calc = quotes[opt.id]
                 installments.append({
                     'count': opt.installment_count,
                     'monthly_amount': calc['installment_amount'],
@@ -143,36 +153,20 @@ class TurkeyPosController(http.Controller):
     def get_default_installments(self, amount, **kwargs):
         """Varsayılan banka için taksit seçeneklerini döndürür"""
         try:
-            # Varsayılan sağlayıcıyı al
-            provider_id = request.env['ir.config_parameter'].sudo().get_param(
-                'turkey_pos_payment.default_pos_provider'
-            )
-            
-            if provider_id:
-                provider = request.env['payment.provider'].sudo().browse(int(provider_id))
-            else:
-                # İlk aktif sağlayıcıyı al
-                provider = request.env['payment.provider'].sudo().search([
-                    ('state', 'in', ['enabled', 'test']),
-                    ('code', 'in', ['akbank', 'garanti', 'isbank', 'ziraat', 'halkbank',
-                                   'vakifbank', 'vakifkatilim', 'yapikredi', 'finansbank',
-                                   'denizbank', 'teb', 'sekerbank', 'kuveytturk', 'param', 'tosla'])
-                ], limit=1)
+            # Yönlendirmenin ilk sıradaki sağlayıcısı (varsayılan sağlayıcı tercihlidir)
+            provider = self._get_checkout_providers()._rank_for_checkout(amount=float(amount))[:1]
             
             if not provider:
                 return {'success': False, 'message': 'Varsayılan banka bulunamadı'}
             
             # Taksit seçeneklerini al
-            options = request.env['installment.option'].sudo().search([
-                ('provider_id', '=', provider.id),
-                ('is_active', '=', True),
-                ('min_amount', '<=', amount),
-                ('max_amount', '>=', amount),
-            ])
+            options = request.env['installment.option'].sudo()._search_eligible(
+                amount, provider.id, max_count=self._get_pos_settings().max_installments(float(amount)))
             
+            quotes = options._price(amount)
             installments = []
             for opt in options:
-                calc = opt.calculate_installment_amount(amount)
+                calc = quotes[opt.id]
                 installments.append({
                     'count': opt.installment_count,
                     'monthly_amount': calc['installment_amount'],
@@ -192,33 +186,83 @@ class TurkeyPosController(http.Controller):
             return {'success': False, 'message': str(e)}
 
     @http.route('/payment/turkey_pos/get_default_provider', type='json', auth='public', csrf=True)
-    def get_default_provider(self, **kwargs):
-        """Varsayılan POS sağlayıcısını döndürür"""
+    def get_default_provider(self, bin_number=None, amount=None, installment_count=1, **kwargs):
+        """Kart BIN'i, banka sağlığı ve taksite göre önerilen POS sağlayıcısını döndürür"""
         try:
-            provider_id = request.env['ir.config_parameter'].sudo().get_param(
-                'turkey_pos_payment.default_pos_provider'
-            )
-            
-            if provider_id:
-                return {'provider_id': int(provider_id)}
-            
-            # İlk aktif sağlayıcıyı bul
-            provider = request.env['payment.provider'].sudo().search([
-                ('state', 'in', ['enabled', 'test']),
-                ('code', 'in', ['akbank', 'garanti', 'isbank', 'ziraat', 'halkbank',
-                               'vakifbank', 'vakifkatilim', 'yapikredi', 'finansbank',
-                               'denizbank', 'teb', 'sekerbank', 'kuveytturk', 'param', 'tosla'])
-            ], limit=1)
-            
-            if provider:
-                return {'provider_id': provider.id}
-            
-            return {'provider_id': None}
+            provider = self._get_checkout_providers()._rank_for_checkout(
+                card_number=bin_number,
+                amount=float(amount) if amount else None,
+                installment_count=int(installment_count or 1),
+            )[:1]
+            return {'provider_id': provider.id or None}
             
         except Exception as e:
             _logger.error('Get default provider error: %s', e)
             return {'provider_id': None}
 
+    @http.route('/payment/turkey_pos/route_providers', type='json', auth='public', csrf=True)
+    def route_providers(self, bin_number=None, amount=None, installment_count=1, **kwargs):
+        """Ödeme ekranı için sağlayıcıları önerilen sırayla döndürür"""
+        try:
+            providers = self._get_checkout_providers()._rank_for_checkout(
+                card_number=bin_number,
+                amount=float(amount) if amount else None,
+                installment_count=int(installment_count or 1),
+            )
+            return {
+                'success': True,
+                'issuer': routing.detect_bank(bin_number),
+                'providers': [{'id': p.id, 'code': p.code, 'name': p.name} for p in providers],
+            }
+            
+        except Exception as e:
+            _logger.error('Provider routing error: %s', e)
+            return {'success': False, 'providers': []}
+
+    @http.route('/payment/turkey_pos/installment_matrix', type='json', auth='public', csrf=True)
+    def installment_matrix(self, amounts, bin_number=None, installment_count=1, **kwargs):
+        """Önerilen sıradaki sağlayıcılar × taksit sayıları × tutarlar fiyat matrisini döndürür"""
+        try:
+            if not isinstance(amounts, (list, tuple)):
+                amounts = [amounts]
+            amounts = [float(amount) for amount in amounts[:MATRIX_MAX_AMOUNTS]]
+            providers = self._get_checkout_providers()._rank_for_checkout(
+                card_number=bin_number,
+                amount=amounts[0] if amounts else None,
+                installment_count=int(installment_count or 1),
+            )
+            matrix = request.env['installment.option'].sudo()._get_installment_matrix(providers.ids, amounts)
+            return {
+                'success': True,
+                'issuer': routing.detect_bank(bin_number),
+                'amounts': amounts,
+                'counts': matrix['counts'],
+                'providers': [{
+                    'id': p.id,
+                    'code': p.code,
+                    'name': p.name,
+                    'cells': matrix['cells'][p.id],
+                } for p in providers],
+            }
+            
+        except Exception as e:
+            _logger.error('Installment matrix error: %s', e)
+            return {'success': False, 'providers': []}
+
+    def _get_pos_settings(self):
+        return request.env['res.config.settings'].sudo()._get_pos_settings()
+
+    def _get_checkout_providers(self):
+        """Ödeme ekranında sunulabilecek POS sağlayıcıları"""
+        Provider = request.env['payment.provider'].sudo()
+        Provider._ensure_warm()
+        return Provider.search([
+            ('state', 'in', ['enabled', 'test']),
+            ('code', 'in', ['akbank', 'garanti', 'isbank', 'ziraat', 'halkbank',
+                           'vakifbank', 'vakifkatilim', 'yapikredi', 'finansbank',
+                           'denizbank', 'teb', 'sekerbank', 'kuveytturk', 'param', 'tosla'])
+        ])._filter_checkout_available()
+
     # ==================== TAKSİT HESAPLAMA ====================
 
     @http.route('/payment/turkey_pos/calculate_installment', type='json', auth='public', csrf=True)
@@ -228,13 +272,12 @@ class TurkeyPosController(http.Controller):
             provider = request.env['payment.provider'].sudo().browse(int(provider_id))
             if not provider.exists():
                 return {'error': _('Provider not found')}
+            if int(installment_count) > self._get_pos_settings().max_installments(float(amount)):
+                return {'error': _('Bu tutar için taksit seçeneği bulunmuyor')}
             
             # Taksit seçeneğini bul
-            installment_option = request.env['installment.option'].sudo().search([
-                ('provider_id', '=', provider.id),
-                ('installment_count', '=', int(installment_count)),
-                ('is_active', '=', True),
-            ], limit=1)
+            installment_option = request.env['installment.option'].sudo()._search_eligible(
+                provider_id=provider.id, installment_count=int(installment_count))[:1]
             
             if not installment_option:
                 # Varsayılan hesaplama
@@ -263,20 +306,14 @@ class TurkeyPosController(http.Controller):
         try:
             amount = float(amount)
             
-            domain = [
-                ('is_active', '=', True),
-                ('min_amount', '<=', amount),
-                ('max_amount', '>=', amount),
-            ]
-            
-            if provider_id:
-                domain.append(('provider_id', '=', int(provider_id)))
-            
-            options = request.env['installment.option'].sudo().search(domain)
+            options = request.env['installment.option'].sudo()._search_eligible(
+                amount, int(provider_id) if provider_id else None,
+                max_count=self._get_pos_settings().max_installments(amount))
             
+            quotes = options._price(amount)
             result = []
             for opt in options:
-                calc = opt.calculate_installment_amount(amount)
+                calc = quotes[opt.id]
                 result.append({
                     'id': opt.id,
                     'installment_count': opt.installment_count,
@@ -301,7 +338,7 @@ class TurkeyPosController(http.Controller):
             if not sale_order.exists():
                 return {'success': False, 'error': _('Order not found')}
             
-            installments = sale_order.get_category_based_installments()
+            installments = sale_order._get_installment_quote()
             
             return {'success': True, 'installments': installments}
             
@@ -372,27 +409,7 @@ class TurkeyPosController(http.Controller):
 
     def _detect_bank_from_card(self, card_number):
         """Kart numarasından banka tespiti"""
-        card_bin_ranges = {
-            'akbank': ['454671', '454672', '413252', '520932'],
-            'garanti': ['514915', '540036', '540037', '541865'],
-            'isbank': ['450803', '540667', '540668', '541078'],
-            'ziraat': ['454671', '540130', '541865'],
-            'halkbank': ['522241', '540435', '543081'],
-            'vakifbank': ['411724', '411726', '425669'],
-            'yapikredi': ['545103', '545616', '547564'],
-            'finansbank': ['525312', '540963', '542404'],
-            'denizbank': ['552096', '554567', '676366'],
-            'teb': ['450918', '540638', '543738'],
-            'sekerbank': ['402275', '402276', '403814'],
-            'kuveytturk': ['402589', '402590', '410555'],
-        }
-        
-        bin_num = card_number.replace(' ', '').replace('-', '')[:6]
-        
-        for bank, bins in card_bin_ranges.items():
-            if bin_num in bins:
-                return bank
-        return None
+        return routing.detect_bank(card_number)
 
     def _mask_card_number(self, card_number):
         """Kart numarasını maskele"""
@@ -417,7 +434,7 @@ class TurkeyPosController(http.Controller):
                 return {'error': _('Access denied')}
             
             result = transaction.provider_id.query_status(transaction)
-            return result
+            return result.to_dict()
             
         except Exception as e:
             _logger.error('Transaction query error: %s', e)
@@ -426,32 +443,28 @@ class TurkeyPosController(http.Controller):
     # ==================== WEBHOOK ====================
 
     @http.route('/payment/turkey_pos/webhook/<string:provider_code>', 
-                type='json', auth='public', csrf=False, methods=['POST'])
+                type='http', auth='public', csrf=False, methods=['POST'])
     def turkey_pos_webhook(self, provider_code, **kwargs):
-        """Webhook bildirimlerini işler"""
-        _logger.info('Webhook received for provider: %s', provider_code)
-        
+        """Webhook gövdesini gelen kutusuna yazar; işleme cron'da toplu yapılır"""
         try:
-            # Sağlayıcıyı bul
-            provider = request.env['payment.provider'].sudo().search([
-                ('code', '=', provider_code)
-            ], limit=1)
-            
-            if not provider:
-                return {'status': 'error', 'message': 'Provider not found'}
-            
-            # Webhook verilerini işle
-            data = request.jsonrequest
-            _logger.info('Webhook data: %s', data)
-            
-            # İşlemi güncelle
-            # ... webhook işleme mantığı ...
-            
-            return {'status': 'success'}
+            Webhook = request.env['turkey.pos.webhook'].sudo()
+            # Bilinmeyen, kapalı ya da anahtarsız sağlayıcılar gelen kutusuna yazılmaz
+            if not Webhook._accepts(provider_code):
+                return request.make_json_response({'status': 'unknown provider'}, status=404)
+            payload = None
+            if (request.httprequest.content_length or 0) <= WEBHOOK_MAX_BYTES:
+                payload = request.httprequest.get_data()
+            if payload is None or len(payload) > WEBHOOK_MAX_BYTES:
+                return request.make_json_response({'status': 'payload too large'}, status=413)
+            payload = payload.decode('utf-8', errors='replace')
+            signature = request.httprequest.headers.get('X-Signature') \
+                or request.httprequest.headers.get('X-Hmac-Signature')
+            Webhook._ingest(provider_code, payload, signature)
+            return request.make_json_response({'status': 'accepted'})
             
         except Exception as e:
             _logger.exception('Webhook error: %s', e)
-            return {'status': 'error', 'message': str(e)}
+            return request.make_json_response({'status': 'error'}, status=500)
 
     # ==================== API ENDPOINTLERİ ====================
 
@@ -463,7 +476,7 @@ class TurkeyPosController(http.Controller):
             ('code', 'in', ['akbank', 'garanti', 'isbank', 'ziraat', 'halkbank',
                            'vakifbank', 'vakifkatilim', 'yapikredi', 'finansbank',
                            'denizbank', 'teb', 'sekerbank', 'kuveytturk', 'param', 'tosla'])
-        ])
+        ])._filter_checkout_available()
         
         return {
             'providers': [{
@@ -480,15 +493,13 @@ class TurkeyPosController(http.Controller):
     def api_get_installments(self, amount, provider_id=None, category_id=None, **kwargs):
         """Taksit seçeneklerini döndürür"""
         try:
-            domain = [('is_active', '=', True)]
-            if provider_id:
-                domain.append(('provider_id', '=', int(provider_id)))
-            
-            options = request.env['installment.option'].sudo().search(domain)
+            options = request.env['installment.option'].sudo()._search_eligible(
+                provider_id=int(provider_id) if provider_id else None)
             
+            quotes = options._price(float(amount))
             result = []
             for opt in options:
-                calc = opt.calculate_installment_amount(float(amount))
+                calc = quotes[opt.id]
                 result.append({
                     'id': opt.id,
                     'provider_id': opt.provider_id.id,
@@ -524,3 +535,17 @@ class TurkeyPosController(http.Controller):
             'is_3d_secure': transaction.is_3d_secure,
             'payment_date': transaction.payment_date.isoformat() if transaction.payment_date else None,
         }
+
+    # ==================== METRİKLER ====================
+
+    @http.route('/metrics/turkey_pos', type='http', auth='public', csrf=False, methods=['GET'])
+    def turkey_pos_metrics(self, token=None, **kwargs):
+        """Banka çağrısı metriklerini Prometheus metin formatında döndürür"""
+        # Anahtar tanımlı değilse uç nokta kapalıdır
+        expected = self._get_pos_settings().metrics_token
+        auth_header = request.httprequest.headers.get('Authorization', '')
+        provided = token or (auth_header[7:] if auth_header.startswith('Bearer ') else '')
+        if not expected or not hmac.compare_digest(provided.encode('utf-8'), expected.encode('utf-8')):
+            return request.make_response('Forbidden', headers=[('Content-Type', 'text/plain')], status=403)
+        request.env['turkey.pos.webhook'].sudo()._update_queue_metrics()
+        return request.make_response(metrics.render(), headers=[('Content-Type', metrics.CONTENT_TYPE)])
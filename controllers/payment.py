@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
 
 import logging
-import requests
 from odoo import http, _
 from odoo.http import request
 
+from ..tools import response_parsers
+
 _logger = logging.getLogger(__name__)
 
 
@@ -27,7 +28,9 @@ class TurkeyPosPaymentController(http.Controller):
                     })
             
             provider_id = int(post.get('provider_id'))
-            provider = request.env['payment.provider'].sudo().browse(provider_id)
+            Provider = request.env['payment.provider'].sudo()
+            Provider._ensure_warm()
+            provider = Provider.browse(provider_id)
             
             if not provider.exists():
                 return request.render('turkey_pos_payment.payment_error', {
@@ -39,24 +42,33 @@ class TurkeyPosPaymentController(http.Controller):
             amount = float(post.get('amount'))
 
             # Güvenlik Kontrolü: Tutarı doğrula
-            # Eğer referans bir Sale Order ise, gerçek tutarı oradan al
+            # Eğer referans bir Sale Order veya Fatura ise, gerçek tutarı oradan al
             # Taksit faizi/vade farkı nedeniyle tutar asıl tutardan fazla olabilir, 
             # ancak asla daha az olmamalıdır.
-            sale_order = request.env['sale.order'].sudo().search([('name', '=', reference)], limit=1)
-            if sale_order:
-                if request.env.company.currency_id.compare_amounts(amount, sale_order.amount_total) < 0:
-                    _logger.warning("Security Warning: Amount too low for reference %s. Client sent %s, expected at least %s.", reference, amount, sale_order.amount_total)
-                    amount = sale_order.amount_total
-            else:
-                # Referans bir Invoice (Fatura) olabilir
-                invoice = request.env['account.move'].sudo().search([('name', '=', reference), ('move_type', '=', 'out_invoice')], limit=1)
-                if invoice:
-                    if request.env.company.currency_id.compare_amounts(amount, invoice.amount_total) < 0:
-                        _logger.warning("Security Warning: Amount too low for reference %s. Client sent %s, expected at least %s.", reference, amount, invoice.amount_total)
-                        amount = invoice.amount_total
+            document = request.env['payment.transaction'].sudo()._resolve_reference(reference)
+            if document['model']:
+                if request.env.company.currency_id.compare_amounts(amount, document['amount']) < 0:
+                    _logger.warning("Security Warning: Amount too low for reference %s. Client sent %s, expected at least %s.", reference, amount, document['amount'])
+                    amount = document['amount']
+
+            settings = request.env['res.config.settings'].sudo()._get_pos_settings()
+            if int(post.get('installment_count') or 1) > settings.max_installments(amount):
+                return request.render('turkey_pos_payment.payment_error', {
+                    'error_message': _('Bu tutar için taksit seçeneği bulunmuyor')
+                })
+            if not provider.use_3d_secure and settings.requires_3d(amount):
+                return request.render('turkey_pos_payment.payment_error', {
+                    'error_message': _('Bu tutar için 3D Secure zorunludur')
+                })
+            # Yanıtı ayrıştırılamayan gateway'e Auth gönderilmez: banka çekimi onaylasa da
+            # işlem güncellenemezdi
+            if not provider.use_3d_secure and not response_parsers.get_parser(provider.gateway_type):
+                return request.render('turkey_pos_payment.payment_error', {
+                    'error_message': _('Bu banka için 3D Secure olmadan ödeme desteklenmiyor')
+                })
 
             # Referans kontrolü - mükerrer veya yanlış tutarlı işlemi önle
-            existing_transaction = request.env['payment.transaction'].sudo().search([('reference', '=', reference)], limit=1)
+            existing_transaction = document['transaction']
             if existing_transaction:
                 if request.env.company.currency_id.compare_amounts(amount, existing_transaction.amount) != 0:
                     _logger.warning("Security Warning: Amount mismatch for existing transaction %s", reference)
@@ -87,9 +99,8 @@ class TurkeyPosPaymentController(http.Controller):
             # Dönüş URL'sini oluştur
             return_url = request.httprequest.host_url.rstrip('/') + '/payment/turkey_pos/3d_return/' + str(provider.id)
             
-            # Ödeme verisini hazırla
+            # Ödeme verisini hazırla (sipariş numarası işleme burada bağlanır)
             payment_data, order_id = provider.prepare_payment_data(transaction, card_data, return_url)
-            transaction.pos_order_id = order_id
             
             # 3D Secure kullanılacaksa
             if provider.use_3d_secure:
@@ -100,15 +111,9 @@ class TurkeyPosPaymentController(http.Controller):
                 })
             else:
                 # Non-secure ödeme
-                # API isteği gönder
-                response = requests.post(
-                    provider._get_api_url(),
-                    data=payment_data,
-                    timeout=provider.timeout_seconds
-                )
-                
-                # Yanıtı işle
-                result = provider._parse_est_response(response.text) if 'est' in provider.gateway_type else provider._parse_garanti_response(response.text)
+                # API isteği gönder ve yanıtı işle
+                result = provider._call_gateway('Auth', payment_data, provider._parse_gateway_response,
+                                                transaction=transaction)
                 result['processed'] = True
                 
                 if result.get('success'):
@@ -131,20 +136,14 @@ class TurkeyPosPaymentController(http.Controller):
         try:
             amount = float(amount)
             
-            domain = [
-                ('is_active', '=', True),
-                ('min_amount', '<=', amount),
-                ('max_amount', '>=', amount),
-            ]
-            
-            if provider_id:
-                domain.append(('provider_id', '=', int(provider_id)))
-            
-            options = request.env['installment.option'].sudo().search(domain)
+            settings = request.env['res.config.settings'].sudo()._get_pos_settings()
+            options = request.env['installment.option'].sudo()._search_eligible(
+                amount, int(provider_id) if provider_id else None, max_count=settings.max_installments(amount))
             
+            quotes = options._price(amount)
             result = []
             for opt in options:
-                calc = opt.calculate_installment_amount(amount)
+                calc = quotes[opt.id]
                 result.append({
                     'id': opt.id,
                     'installment_count': opt.installment_count,
@@ -169,7 +168,7 @@ class TurkeyPosPaymentController(http.Controller):
             if not sale_order.exists():
                 return {'success': False, 'error': _('Order not found')}
             
-            installments = sale_order.get_category_based_installments()
+            installments = sale_order._get_installment_quote()
             
             return {'success': True, 'installments': installments}
             
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+from odoo import http
+from odoo.http import request
+from odoo.addons.website_sale.controllers.cart import Cart
+from odoo.addons.website_sale.controllers.main import WebsiteSale
+
+
+def _add_cart_installment_quote(response):
+    """Sepet özetindeki taksit teklifini render öncesi hesaplayıp şablona verir.
+
+    Teklif gerekirse siparişe yazılır; bu yüzden şablon içinde değil istek
+    sırasında hesaplanır.
+    """
+    qcontext = getattr(response, 'qcontext', None)
+    if qcontext is None:
+        return response
+    order = request.website.sale_get_order()
+    if order and order.amount_total > 0:
+        qcontext['cart_installment_quote'] = order.sudo()._get_installment_quote()
+    return response
+
+
+class TurkeyPosCart(Cart):
+
+    @http.route()
+    def cart(self, **post):
+        return _add_cart_installment_quote(super().cart(**post))
+
+
+class TurkeyPosWebsiteSale(WebsiteSale):
+
+    @http.route()
+    def checkout(self, **post):
+        return _add_cart_installment_quote(super().checkout(**post))
+
+    @http.route()
+    def shop_payment(self, **post):
+        return _add_cart_installment_quote(super().shop_payment(**post))
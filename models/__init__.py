@@ -6,6 +6,9 @@ from . import bank_gateway
 from . import installment_option
 from . import product_category
 from . import pos_order
+from . import pos_callback
+from . import pos_job
+from . import pos_webhook
 from . import sale_order
 from . import account_move
 from . import account_journal
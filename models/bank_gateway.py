@@ -4,6 +4,8 @@ import logging
 from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError
 
+from ..tools import circuit_breaker
+
 _logger = logging.getLogger(__name__)
 
 
@@ -88,6 +90,12 @@ class BankGateway(models.Model):
     transaction_count = fields.Integer(string='Toplam İşlem Sayısı', compute='_compute_statistics')
     success_rate = fields.Float(string='Başarı Oranı (%)', compute='_compute_statistics')
     
+    # Devre Kesici
+    circuit_state = fields.Selection(circuit_breaker.STATES, string='Devre Durumu',
+                                     compute='_compute_circuit_state',
+                                     help='Bağlı sağlayıcılar arasındaki en kötü devre durumu')
+    circuit_open_count = fields.Integer(string='Devresi Açık Sağlayıcı', compute='_compute_circuit_state')
+    
     # ==================== HESAPLAMA METOTLARI ====================
     
     @api.depends('provider_ids')
@@ -111,6 +119,13 @@ class BankGateway(models.Model):
             gateway.transaction_count = total_tx
             gateway.success_rate = (success_tx / total_tx * 100) if total_tx > 0 else 0.0
 
+    def _compute_circuit_state(self):
+        severity = {circuit_breaker.CLOSED: 0, circuit_breaker.HALF_OPEN: 1, circuit_breaker.OPEN: 2}
+        for gateway in self:
+            states = [p.circuit_state for p in gateway.provider_ids]
+            gateway.circuit_state = max(states, key=severity.get) if states else circuit_breaker.CLOSED
+            gateway.circuit_open_count = states.count(circuit_breaker.OPEN)
+
     # ==================== İLİŞKİLER ====================
     
     provider_ids = fields.One2many('payment.provider', 'gateway_id', string='Ödeme Sağlayıcıları')
@@ -1,17 +1,55 @@
 # -*- coding: utf-8 -*-
 
 import logging
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import ValidationError
 
+from ..tools import installment_index, pricing
+
 _logger = logging.getLogger(__name__)
 
 
+class InstallmentRuleMixin(models.AbstractModel):
+    """Taksit kuralı dizinini besleyen modeller.
+
+    Dizin kayıt defteri önbelleğinde tutulur; bu modellerde dizine giren bir
+    alan değiştiğinde önbellek temizlenir ve diğer worker'lar kayıt defteri
+    sinyaliyle dizini yeniden kurar.
+    """
+    _name = 'installment.rule.mixin'
+    _description = 'Taksit Kuralı Dizini'
+
+    # Değiştiğinde dizinin yeniden kurulmasını gerektiren alanlar
+    _installment_index_fields = ()
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if any(field in vals for field in self._installment_index_fields):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+
 class InstallmentOption(models.Model):
     _name = 'installment.option'
     _description = 'Taksit Seçeneği'
     _order = 'provider_id, installment_count'
-    _inherit = ['mail.thread']
+    _inherit = ['mail.thread', 'installment.rule.mixin']
+
+    _installment_index_fields = (
+        'provider_id', 'installment_count', 'is_active', 'commission_rate', 'interest_rate',
+        'min_amount', 'max_amount',
+    )
 
     # ==================== TEMEL BİLGİLER ====================
     
@@ -78,45 +116,141 @@ class InstallmentOption(models.Model):
 
     # ==================== İŞ METOTLARI ====================
     
+    @api.model
+    @tools.ormcache()
+    def _get_installment_index(self):
+        """Aktif taksit kurallarının worker içi dizini (``installment_index.InstallmentIndex``)"""
+        for model in ('installment.option', 'product.category.installment',
+                      'product.category.bank.installment', 'product.category.campaign'):
+            self.env[model].flush_model()
+        cr = self.env.cr
+        rules = []
+        cr.execute("""
+            SELECT id, provider_id, installment_count, interest_rate, commission_rate, min_amount, max_amount
+              FROM installment_option
+             WHERE is_active
+          ORDER BY provider_id, installment_count, id
+        """)
+        rules += [installment_index.Rule(installment_index.OPTION, *row) for row in cr.fetchall()]
+        cr.execute("""
+            SELECT ci.id, o.provider_id, o.installment_count, o.interest_rate,
+                   COALESCE(NULLIF(ci.custom_commission_rate, 0), o.commission_rate),
+                   o.min_amount, o.max_amount, ci.category_id, o.id, o.is_active
+              FROM product_category_installment ci
+              JOIN installment_option o ON o.id = ci.installment_option_id
+             WHERE ci.is_active
+          ORDER BY ci.sequence, ci.category_id, ci.id
+        """)
+        rules += [installment_index.Rule(installment_index.CATEGORY, *row) for row in cr.fetchall()]
+        cr.execute("""
+            SELECT id, provider_id, installment_count, interest_rate, commission_rate, min_amount, max_amount,
+                   category_id
+              FROM product_category_bank_installment
+             WHERE is_active
+          ORDER BY sequence, installment_count, id
+        """)
+        rules += [installment_index.Rule(installment_index.BANK, *row) for row in cr.fetchall()]
+        cr.execute("""
+            SELECT id, provider_id, installment_count, interest_rate, commission_rate, min_amount, max_amount,
+                   category_id, NULL, TRUE, date_start, date_end, card_brand_id
+              FROM product_category_campaign
+             WHERE is_active
+          ORDER BY date_start DESC, id
+        """)
+        rules += [installment_index.Rule(installment_index.CAMPAIGN, *row) for row in cr.fetchall()]
+        return installment_index.InstallmentIndex(rules)
+
+    @api.model
+    def _search_eligible(self, amount=None, provider_id=None, installment_count=None, max_count=None):
+        """Aktif ve tutara uygun seçenekleri veritabanına gitmeden bulur"""
+        rules = self._get_installment_index().lookup(
+            installment_index.OPTION, amount=amount, provider_id=provider_id,
+            installment_count=installment_count, max_count=max_count)
+        return self.browse([rule.id for rule in rules])
+
+    @api.model
+    def _get_installment_matrix(self, provider_ids, amounts):
+        """Sağlayıcı × taksit sayısı × tutar fiyat matrisi.
+
+        ``{'counts': [taksit sayıları], 'cells': {sağlayıcı id: [[hücre]]}}``
+        döndürür; ``cells[sağlayıcı][tutar sırası][sayı sırası]`` ya ``None``
+        ya da ``[aylık, toplam, komisyon, komisyon oranı]`` olur. Tek çekim
+        matrise girmez. Tüm hücreler tek fiyatlama çağrısıyla hesaplanır.
+        """
+        index = self._get_installment_index()
+        settings = self.env['res.config.settings']._get_pos_settings()
+        rules = [rule for provider_id in provider_ids
+                 for rule in index.lookup(installment_index.OPTION, provider_id=provider_id)
+                 if rule.installment_count > 1]
+        counts = sorted({rule.installment_count for rule in rules})
+        column = {count: position for position, count in enumerate(counts)}
+        quotes = pricing.RateTable(rule.rate_row() for rule in rules).price(amounts)
+        cells = {provider_id: [[None] * len(counts) for _amount in amounts] for provider_id in provider_ids}
+        for position, amount in enumerate(amounts):
+            max_count = settings.max_installments(amount)
+            for rule in rules:
+                if rule.installment_count > max_count or not rule.min_amount <= amount <= rule.max_amount:
+                    continue
+                row = cells[rule.provider_id][position]
+                # Aynı sayıda birden çok tutar bandı varsa ilk uyan kullanılır
+                if row[column[rule.installment_count]] is None:
+                    row[column[rule.installment_count]] = list(quotes[position][rule.id]) + [rule.commission_rate]
+        return {'counts': counts, 'cells': cells}
+
+    def _get_rate_table(self):
+        """Seçeneklerin oran tablosu"""
+        return pricing.RateTable(
+            (option.id, option.installment_count, option.interest_rate, option.commission_rate,
+             option.min_amount, option.max_amount)
+            for option in self
+        )
+
+    @api.model
+    def _format_quotes(self, quotes):
+        return {option_id: {
+            'installment_amount': installment_amount,
+            'total_amount': total_amount,
+            'commission_amount': commission_amount,
+        } for option_id, (installment_amount, total_amount, commission_amount) in quotes.items()}
+
+    def _price_amounts(self, amounts):
+        """Tüm seçenekleri tüm tutarlar için tek geçişte fiyatlar.
+
+        Her tutar için ``{seçenek id: calculate_installment_amount sözlüğü}``
+        döndürür.
+        """
+        return [self._format_quotes(quotes) for quotes in self._get_rate_table().price(amounts)]
+
+    @api.model
+    def _price_rules(self, rules, amount):
+        """Dizindeki seçenek kurallarını kayıt okumadan fiyatlar"""
+        table = pricing.RateTable(rule.rate_row() for rule in rules)
+        return self._format_quotes(table.price([amount])[0])
+
+    def _price(self, amount):
+        """Tek tutar için ``{seçenek id: hesap}``"""
+        return self._price_amounts([amount])[0]
+
     def calculate_installment_amount(self, total_amount):
         """Taksit tutarını hesaplar"""
         self.ensure_one()
-        
-        if self.installment_count <= 1:
-            return {
-                'installment_amount': total_amount,
-                'total_amount': total_amount,
-                'commission_amount': 0.0,
-            }
-        
-        # Vade farkı hesapla
-        if self.interest_rate > 0:
-            total_with_interest = total_amount * (1 + (self.interest_rate / 100))
-        else:
-            total_with_interest = total_amount
-        
-        # Komisyon hesapla
-        commission = (total_with_interest * self.commission_rate) / 100
-        total_with_commission = total_with_interest + commission
-        
-        installment_amount = total_with_commission / self.installment_count
-        
-        return {
-            'installment_amount': round(installment_amount, 2),
-            'total_amount': round(total_with_commission, 2),
-            'commission_amount': round(commission, 2),
-        }
+        return self._price(total_amount)[self.id]
 
     def is_eligible(self, amount):
         """Verilen tutar için bu taksit seçeneği uygun mu?"""
         self.ensure_one()
-        return self.is_active and self.min_amount <= amount <= self.max_amount
+        return self.id in self._search_eligible(amount, self.provider_id.id).ids
 
 
 class ProductCategoryInstallment(models.Model):
     _name = 'product.category.installment'
     _description = 'Kategori Bazlı Taksit Seçeneği'
     _order = 'sequence, category_id'
+    _inherit = ['installment.rule.mixin']
+
+    _installment_index_fields = (
+        'category_id', 'installment_option_id', 'custom_commission_rate', 'is_active', 'sequence',
+    )
 
     # İlişkiler
     category_id = fields.Many2one('product.category', string='Ürün Kategorisi', required=True)
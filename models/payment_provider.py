@@ -5,18 +5,41 @@ import hashlib
 import hmac
 import base64
 import json
-import requests
-import xml.etree.ElementTree as ET
+import time
 from datetime import datetime, timedelta
 from urllib.parse import urlencode, parse_qs, urlparse
-from lxml import etree
 
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import ValidationError, UserError
 from odoo.tools.float_utils import float_round
 
+from ..tools import (
+    circuit_breaker, http_session, metrics, response_parsers, retry, routing, signing, transport, warmup,
+    xml_templates,
+)
+
 _logger = logging.getLogger(__name__)
 
+# Değiştiğinde havuzdaki HTTP oturumunun yeniden kurulmasını gerektiren alanlar
+HTTP_SESSION_FIELDS = (
+    'environment', 'api_url_test', 'api_url_production', 'api_3d_url_test', 'api_3d_url_production',
+    'api_username', 'api_password', 'api_client_id', 'api_merchant_id', 'api_store_key',
+    'api_provision_user', 'api_terminal_id',
+)
+
+# Değiştiğinde önbellekteki XML istek şablonlarının ve imzalama bağlamının
+# yeniden oluşturulmasını gerektiren alanlar
+ORMCACHE_FIELDS = HTTP_SESSION_FIELDS + ('gateway_type', 'hash_algorithm')
+
+# Toplu istemcinin desteklediği işlemler -> gateway'e özgü istek oluşturucu
+BULK_REQUEST_BUILDERS = {
+    'OrderInq': '_%s_query_xml',
+    'Credit': '_%s_refund_xml',
+    'Void': '_%s_cancel_xml',
+}
+
+XML_HEADERS = {'Content-Type': 'application/xml'}
+
 
 class PaymentProvider(models.Model):
     _inherit = 'payment.provider'
@@ -120,8 +143,15 @@ class PaymentProvider(models.Model):
     refund_time_limit_days = fields.Integer(string='İade Süre Limiti (Gün)', default=30)
     
     # İleri Seviye Ayarlar
-    timeout_seconds = fields.Integer(string='API Zaman Aşımı (Saniye)', default=30)
-    retry_count = fields.Integer(string='Tekrar Deneme Sayısı', default=3)
+    timeout_seconds = fields.Integer(string='API Zaman Aşımı (Saniye)',
+                                     default=lambda self: self._default_config_int('timeout_seconds', 30))
+    connect_timeout_seconds = fields.Integer(string='Bağlantı Zaman Aşımı (Saniye)', default=5)
+    request_deadline_seconds = fields.Integer(string='Toplam İstek Süresi Limiti (Saniye)', default=60,
+                                              help='Tekrar denemeler dahil bir banka çağrısı için toplam süre')
+    retry_count = fields.Integer(string='Tekrar Deneme Sayısı',
+                                 default=lambda self: self._default_config_int('retry_count', 3))
+    max_concurrent_requests = fields.Integer(string='Eşzamanlı İstek Limiti', default=4,
+                                             help='Toplu sorgulamalarda bu bankaya aynı anda gönderilecek en fazla istek')
     log_requests = fields.Boolean(string='API İsteklerini Logla', default=True)
     
     # İstatistikler
@@ -132,6 +162,18 @@ class PaymentProvider(models.Model):
                                    currency_field='main_currency_id')
     success_rate = fields.Float(string='Başarı Oranı (%)', compute='_compute_statistics')
 
+    # Devre Kesici (worker bazlı anlık durum)
+    circuit_state = fields.Selection(circuit_breaker.STATES, string='Devre Durumu',
+                                     compute='_compute_circuit_state',
+                                     help='Bu worker üzerindeki banka bağlantı sağlığı')
+    circuit_error_rate = fields.Float(string='Son Hata Oranı (%)', compute='_compute_circuit_state')
+    circuit_avg_latency = fields.Float(string='Ortalama Gecikme (ms)', compute='_compute_circuit_state')
+
+    # ==================== VARSAYILAN DEĞERLER ====================
+
+    def _default_config_int(self, key, default):
+        return getattr(self.env['res.config.settings']._get_pos_settings(), key) or default
+
     # ==================== HESAPLAMA METOTLARI ====================
     
     def _compute_statistics(self):
@@ -145,6 +187,14 @@ class PaymentProvider(models.Model):
             done_count = len(transactions.filtered(lambda t: t.state == 'done'))
             provider.success_rate = (done_count / len(transactions) * 100) if transactions else 0.0
 
+    def _compute_circuit_state(self):
+        for provider in self:
+            breaker = provider.id and circuit_breaker.peek_breaker(provider._get_circuit_breaker_key())
+            snapshot = breaker.snapshot() if breaker else {}
+            provider.circuit_state = snapshot.get('state', circuit_breaker.CLOSED)
+            provider.circuit_error_rate = snapshot.get('error_rate', 0.0) * 100
+            provider.circuit_avg_latency = snapshot.get('avg_latency', 0.0) * 1000
+
     # ==================== KISITLAMALAR ====================
     
     @api.constrains('max_installment_count')
@@ -153,6 +203,32 @@ class PaymentProvider(models.Model):
             if record.max_installment_count < 1 or record.max_installment_count > 24:
                 raise ValidationError(_('Maksimum taksit sayısı 1-24 arasında olmalıdır.'))
 
+    # ==================== CRUD ====================
+
+    def write(self, vals):
+        res = super().write(vals)
+        if any(field in vals for field in HTTP_SESSION_FIELDS):
+            self._drop_http_sessions()
+        if any(field in vals for field in ORMCACHE_FIELDS):
+            self.env.registry.clear_cache()
+            warmup.reset(self.env.cr.dbname)
+        return res
+
+    def unlink(self):
+        self._drop_http_sessions()
+        return super().unlink()
+
+    def _register_hook(self):
+        super()._register_hook()
+        if self._get_warmup_mode() == warmup.EAGER:
+            try:
+                # Başarısız sorgu kayıt defteri yükleme işlemini bozmasın
+                with self.env.cr.savepoint():
+                    self._ensure_warm()
+            except Exception:
+                # Isınma yalnızca hızlandırır; ilk ödeme isteği yeniden dener
+                _logger.exception('Turkey POS warm-up failed for %s', self.env.cr.dbname)
+
     # ==================== HAZIRLIK METOTLARI ====================
     
     def _get_api_url(self, endpoint_type='api'):
@@ -162,17 +238,157 @@ class PaymentProvider(models.Model):
             return endpoint_type == '3d' and self.api_3d_url_test or self.api_url_test
         return endpoint_type == '3d' and self.api_3d_url_production or self.api_url_production
 
+    # ---- HTTP Oturum Havuzu ----
+    def _get_http_session_key(self):
+        """Oturum havuzu anahtarı: veritabanı, sağlayıcı ve ortam"""
+        self.ensure_one()
+        return (self.env.cr.dbname, self.id, self.environment)
+
+    def _get_http_session(self):
+        """Sağlayıcı için keep-alive HTTP oturumunu döndürür"""
+        self.ensure_one()
+        print_ = http_session.fingerprint(*(self[field] for field in HTTP_SESSION_FIELDS))
+        return http_session.get_session(self._get_http_session_key(), print_)
+
+    def _drop_http_sessions(self):
+        """Bu worker'daki sağlayıcı oturumlarını kapatır"""
+        dbname = self.env.cr.dbname
+        provider_ids = set(self.ids)
+        http_session.drop_sessions(lambda key: key[0] == dbname and key[1] in provider_ids)
+
+    # ---- Devre Kesici ----
+    def _get_circuit_breaker_key(self):
+        self.ensure_one()
+        return (self.env.cr.dbname, self.id, self.gateway_type)
+
+    def _get_circuit_breaker(self):
+        """Sağlayıcı ve gateway tipi için devre kesiciyi döndürür"""
+        self.ensure_one()
+        return circuit_breaker.get_breaker(self._get_circuit_breaker_key())
+
+    def _is_circuit_open(self):
+        self.ensure_one()
+        breaker = circuit_breaker.peek_breaker(self._get_circuit_breaker_key())
+        return bool(breaker) and breaker.snapshot()['state'] == circuit_breaker.OPEN
+
+    def _filter_checkout_available(self):
+        """Ayar açıksa devresi açık olan sağlayıcıları ödeme ekranından gizler"""
+        if not self.env['res.config.settings']._get_pos_settings().hide_open_circuit:
+            return self
+        return self.filtered(lambda p: not p._is_circuit_open())
+
+    # ---- Yönlendirme ----
+    @api.model
+    def _get_routing_state(self):
+        """Worker'daki yönlendirme durumunu gerekirse değişen işlemlerle günceller"""
+        state = routing.get_state(self.env.cr.dbname)
+        if state.needs_refresh():
+            self._refresh_routing_state(state)
+        return state
+
+    @api.model
+    def _refresh_routing_state(self, state):
+        cr = self.env.cr
+        if state.watermark is None:
+            # İlk yükleme: sağlayıcı başına son işlemler
+            cr.execute("""
+                SELECT id, provider_id, state = 'done', write_date
+                  FROM (SELECT id, provider_id, state, write_date,
+                               row_number() OVER (PARTITION BY provider_id ORDER BY id DESC) AS rn
+                          FROM payment_transaction
+                         WHERE state IN ('done', 'error')
+                           AND write_date > (now() at time zone 'UTC') - interval '7 days') AS recent
+                 WHERE rn <= %s
+            """, [routing.OUTCOME_WINDOW])
+        else:
+            # Geç kaydedilen uzun işlemler kaçmasın diye pay bırakılır; tekrarlar işlem id ile ezilir
+            cr.execute("""
+                SELECT id, provider_id, state = 'done', write_date
+                  FROM payment_transaction
+                 WHERE state IN ('done', 'error') AND write_date >= %s
+            """, [state.watermark - timedelta(seconds=routing.WATERMARK_OVERLAP_SECONDS)])
+        rows = cr.fetchall()
+        watermark = max((row[3] for row in rows), default=state.watermark or fields.Datetime.now())
+        cr.execute("""
+            SELECT provider_id, installment_count, min_amount, max_amount
+              FROM installment_option
+             WHERE is_active
+        """)
+        installments = cr.fetchall()
+        state.apply([row[:3] for row in rows], installments, watermark)
+
+    def _rank_for_checkout(self, card_number=None, amount=None, installment_count=1):
+        """Sağlayıcıları kartı çıkaran banka, başarı oranı, gecikme ve taksite göre sıralar"""
+        if not self:
+            return self
+        state = self._get_routing_state()
+        ranked = state.rank(
+            [(provider.id, provider.code, provider._is_circuit_open()) for provider in self],
+            issuer=routing.detect_bank(card_number),
+            amount=amount,
+            installment_count=installment_count,
+            default_id=self.env['res.config.settings']._get_pos_settings().default_pos_provider,
+        )
+        return self.browse([provider_id for provider_id, _score, _details in ranked])
+
+    # ---- Isınma ----
+    @api.model
+    def _get_warmup_mode(self):
+        mode = self.env['res.config.settings']._get_pos_settings().warmup_mode
+        return mode if mode in (warmup.EAGER, warmup.LAZY, warmup.OFF) else warmup.LAZY
+
+    @api.model
+    def _ensure_warm(self):
+        """Ödeme yollarının kullandığı worker önbelleklerini bu veritabanı için bir kez doldurur"""
+        dbname = self.env.cr.dbname
+        if warmup.is_done(dbname) or self._get_warmup_mode() == warmup.OFF:
+            return
+        duration = warmup.run_once(dbname, self._warm_up)
+        if duration is not None:
+            metrics.WARMUP_DURATION.set(duration, dbname)
+            _logger.info('Turkey POS caches warmed up for %s in %.3fs', dbname, duration)
+
+    @api.model
+    def _warm_up(self):
+        """Sağlayıcı ayarlarını, istek şablonlarını, oturumları ve yönlendirme tablolarını yükler"""
+        self.env['res.config.settings']._get_pos_settings()
+        providers = self.sudo().search([
+            ('gateway_type', '!=', False), ('state', 'in', ['enabled', 'test']),
+        ])
+        for provider in providers:
+            provider._get_signing_context()
+            if xml_templates.get_dialect(provider.gateway_type):
+                for operation in BULK_REQUEST_BUILDERS:
+                    provider._get_request_template(operation)
+            provider._get_http_session()
+            provider._get_circuit_breaker()
+        # BIN tablosu modül yüklenirken kurulur; başarı oranları ve taksitler burada okunur
+        state = routing.get_state(self.env.cr.dbname)
+        self._refresh_routing_state(state)
+
     def _generate_hash(self, data, hash_type='sha256'):
         """Hash oluşturur"""
         self.ensure_one()
-        if hash_type == 'sha512':
-            return hashlib.sha512(data.encode('utf-8')).hexdigest()
-        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+        return signing.digest(data, hash_type)
 
     def _generate_hmac(self, data, key):
         """HMAC hash oluşturur"""
         return hmac.new(key.encode('utf-8'), data.encode('utf-8'), hashlib.sha256).hexdigest()
 
+    @tools.ormcache('self.id')
+    def _get_signing_context(self):
+        """Önbelleğe alınmış anahtar malzemesiyle sağlayıcının imzalama bağlamı"""
+        self.ensure_one()
+        return signing.SigningContext(
+            self.gateway_type, self.hash_algorithm, self.api_store_key,
+            terminal_id=self.api_terminal_id, provision_password=self.api_provision_user,
+        )
+
+    def _verify_callbacks(self, callbacks=(), webhooks=()):
+        """3D dönüşlerini ve ``(gövde, imza)`` webhook'larını toplu doğrular"""
+        self.ensure_one()
+        return self._get_signing_context().verify_many(callbacks, webhooks)
+
     def _get_currency_code(self, currency):
         """Para birimi kodunu döndürür"""
         currency_map = {
@@ -189,7 +405,7 @@ class PaymentProvider(models.Model):
     def _est_prepare_payment_data(self, transaction, card_data, return_url):
         """EST POS için ödeme verisi hazırlar"""
         self.ensure_one()
-        order_id = f"{transaction.reference}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        order_id = transaction._generate_pos_order_id()
         
         data = {
             'clientid': self.api_client_id,
@@ -209,7 +425,7 @@ class PaymentProvider(models.Model):
         
         # Hash oluştur
         hash_data = f"{data['clientid']}{data['oid']}{data['amount']}{data['okUrl']}{data['failUrl']}{data['islemtipi']}{data['taksit']}{data['rnd']}{self.api_store_key}"
-        data['hash'] = self._generate_hash(hash_data, self.hash_algorithm)
+        data['hash'] = self._get_signing_context().sign(hash_data)
         
         return data, order_id
 
@@ -217,15 +433,11 @@ class PaymentProvider(models.Model):
     def _garanti_prepare_payment_data(self, transaction, card_data, return_url):
         """Garanti POS için ödeme verisi hazırlar"""
         self.ensure_one()
-        order_id = f"{transaction.reference}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        
-        # Güvenlik verisi oluştur
-        terminal_id = self.api_terminal_id.zfill(9)
-        provision_password = self.api_provision_user
-        security_data = self._generate_hash(provision_password + terminal_id, 'sha256').upper()
+        order_id = transaction._generate_pos_order_id()
         
-        hash_data = f"{self.api_terminal_id}{order_id}{str(transaction.amount)}{security_data}"
-        hash_value = self._generate_hash(hash_data, 'sha256').upper()
+        signer = self._get_signing_context()
+        hash_data = f"{self.api_terminal_id}{order_id}{str(transaction.amount)}{signer.security_data}"
+        hash_value = signer.sign(hash_data)
         
         data = {
             'secure3dsecuritylevel': '3D' if self.use_3d_secure else '3D_PAY',
@@ -255,7 +467,7 @@ class PaymentProvider(models.Model):
     def _posnet_prepare_payment_data(self, transaction, card_data, return_url):
         """YKB PosNet için ödeme verisi hazırlar"""
         self.ensure_one()
-        order_id = f"{transaction.reference}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        order_id = transaction._generate_pos_order_id()
         
         data = {
             'posnetID': self.api_client_id,
@@ -264,7 +476,7 @@ class PaymentProvider(models.Model):
             'amount': str(int(transaction.amount * 100)),
             'currencyCode': self._get_currency_code(transaction.currency_id),
             'installment': str(card_data.get('installment_count', 0)),
-            'orderID': order_id[:24],  # PosNet max 24 karakter
+            'orderID': order_id,  # PosNet: 24 karakter, soldan sıfır dolgulu
             'lang': 'tr',
             'url': return_url,
             'cardNumber': card_data.get('card_number', ''),
@@ -278,7 +490,7 @@ class PaymentProvider(models.Model):
     def _payfor_prepare_payment_data(self, transaction, card_data, return_url):
         """PayFor için ödeme verisi hazırlar"""
         self.ensure_one()
-        order_id = f"{transaction.reference}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        order_id = transaction._generate_pos_order_id()
         
         data = {
             'MbrId': self.api_merchant_id,
@@ -302,7 +514,7 @@ class PaymentProvider(models.Model):
         
         # Hash oluştur
         hash_str = f"{data['MbrId']}{data['OrderId']}{data['PurchAmount']}{data['OkUrl']}{data['FailUrl']}{data['TxnType']}{data['InstallmentCount']}{data['Rnd']}{self.api_store_key}"
-        data['Hash'] = self._generate_hash(hash_str, self.hash_algorithm)
+        data['Hash'] = self._get_signing_context().sign(hash_str)
         
         return data, order_id
 
@@ -310,7 +522,7 @@ class PaymentProvider(models.Model):
     def _interpos_prepare_payment_data(self, transaction, card_data, return_url):
         """İnterPos için ödeme verisi hazırlar"""
         self.ensure_one()
-        order_id = f"{transaction.reference}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        order_id = transaction._generate_pos_order_id()
         
         data = {
             'ShopCode': self.api_client_id,
@@ -333,7 +545,7 @@ class PaymentProvider(models.Model):
         
         # Hash oluştur
         hash_str = f"{data['ShopCode']}{data['OrderId']}{data['PurchAmount']}{data['OkUrl']}{data['FailUrl']}{data['TxnType']}{data['InstallmentCount']}{data['Rnd']}{self.api_store_key}"
-        data['Hash'] = self._generate_hash(hash_str, self.hash_algorithm)
+        data['Hash'] = self._get_signing_context().sign(hash_str)
         
         return data, order_id
 
@@ -341,7 +553,7 @@ class PaymentProvider(models.Model):
     def _kuveyt_prepare_payment_data(self, transaction, card_data, return_url):
         """Kuveyt Türk için ödeme verisi hazırlar"""
         self.ensure_one()
-        order_id = f"{transaction.reference}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        order_id = transaction._generate_pos_order_id()
         
         data = {
             'MerchantId': self.api_merchant_id,
@@ -364,7 +576,7 @@ class PaymentProvider(models.Model):
         
         # Hash oluştur
         hash_str = f"{self.api_merchant_id}{self.api_client_id}{data['Amount']}{order_id}{return_url}{return_url}{self.api_password}"
-        data['HashData'] = self._generate_hash(hash_str, self.hash_algorithm).upper()
+        data['HashData'] = self._get_signing_context().sign(hash_str)
         
         return data, order_id
 
@@ -372,7 +584,7 @@ class PaymentProvider(models.Model):
     def _akbank_prepare_payment_data(self, transaction, card_data, return_url):
         """Akbank için ödeme verisi hazırlar"""
         self.ensure_one()
-        order_id = f"{transaction.reference}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        order_id = transaction._generate_pos_order_id()
         
         data = {
             'merchantId': self.api_merchant_id,
@@ -397,7 +609,7 @@ class PaymentProvider(models.Model):
     def _param_prepare_payment_data(self, transaction, card_data, return_url):
         """Param POS için ödeme verisi hazırlar"""
         self.ensure_one()
-        order_id = f"{transaction.reference}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        order_id = transaction._generate_pos_order_id()
         
         data = {
             'CLIENT_CODE': self.api_client_id,
@@ -422,7 +634,7 @@ class PaymentProvider(models.Model):
     def _tosla_prepare_payment_data(self, transaction, card_data, return_url):
         """Tosla için ödeme verisi hazırlar"""
         self.ensure_one()
-        order_id = f"{transaction.reference}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        order_id = transaction._generate_pos_order_id()
         
         data = {
             'apiKey': self.api_client_id,
@@ -445,7 +657,7 @@ class PaymentProvider(models.Model):
     def _vakifkatilim_prepare_payment_data(self, transaction, card_data, return_url):
         """Vakıf Katılım için ödeme verisi hazırlar"""
         self.ensure_one()
-        order_id = f"{transaction.reference}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        order_id = transaction._generate_pos_order_id()
         
         data = {
             'MerchantId': self.api_merchant_id,
@@ -469,7 +681,7 @@ class PaymentProvider(models.Model):
     def _payflex_prepare_payment_data(self, transaction, card_data, return_url):
         """PayFlex için ödeme verisi hazırlar"""
         self.ensure_one()
-        order_id = f"{transaction.reference}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        order_id = transaction._generate_pos_order_id()
         
         data = {
             'MerchantId': self.api_merchant_id,
@@ -517,7 +729,65 @@ class PaymentProvider(models.Model):
         if not method:
             raise UserError(_('Desteklenmeyen gateway tipi: %s') % self.gateway_type)
         
-        return method(transaction, card_data, return_url)
+        data, order_id = method(transaction, card_data, return_url)
+        transaction._set_pos_order_id(order_id)
+        return data, order_id
+
+    # ==================== XML İSTEK ŞABLONLARI ====================
+
+    @tools.ormcache('self.id', 'operation')
+    def _get_request_template(self, operation):
+        """Sağlayıcının ``operation`` için derlenmiş XML istek şablonunu döndürür"""
+        self.ensure_one()
+        dialect = xml_templates.get_dialect(self.gateway_type)
+        if not dialect:
+            raise UserError(_('Bu gateway için XML istek şablonu bulunmuyor: %s') % self.gateway_type)
+        root_tag, children = getattr(self, f'_{dialect}_template_spec')(operation)
+        return xml_templates.compile_template(root_tag, children, xml_templates.DIALECT_ENCODINGS[dialect])
+
+    def _cc5_template_spec(self, operation):
+        """EST CC5Request iskeleti"""
+        children = [
+            ('Name', self.api_username),
+            ('Password', self.api_password),
+            ('ClientId', self.api_client_id),
+            ('Type', operation),
+            ('OrderId', xml_templates.Slot('order_id')),
+        ]
+        if operation == 'Credit':
+            children += [
+                ('Total', xml_templates.Slot('amount')),
+                ('Currency', xml_templates.Slot('currency')),
+            ]
+        return 'CC5Request', children
+
+    def _gvps_template_spec(self, operation):
+        """Garanti GVPSRequest iskeleti"""
+        transaction_block = [('Type', {'Credit': 'refund', 'Void': 'void', 'OrderInq': 'orderinq'}[operation])]
+        if operation == 'Credit':
+            transaction_block += [
+                ('Amount', xml_templates.Slot('amount')),
+                ('CurrencyCode', xml_templates.Slot('currency')),
+            ]
+        return 'GVPSRequest', [
+            ('Mode', 'PROD' if self.environment == 'production' else 'TEST'),
+            ('Version', '0.01'),
+            ('Terminal', [
+                ('ProvUserID', self.api_provision_user),
+                ('HashData', xml_templates.Slot('hash')),
+                ('UserID', self.api_username),
+                ('ID', self.api_terminal_id),
+                ('MerchantID', self.api_merchant_id),
+            ]),
+            ('Customer', [
+                ('IPAddress', xml_templates.Slot('ip_address')),
+                ('EmailAddress', xml_templates.Slot('email')),
+            ]),
+            ('Order', [
+                ('OrderID', xml_templates.Slot('order_id')),
+            ]),
+            ('Transaction', transaction_block),
+        ]
 
     # ==================== İADE METOTLARI ====================
     
@@ -525,17 +795,9 @@ class PaymentProvider(models.Model):
         """İade işlemi yapar"""
         self.ensure_one()
         
-        if not self.allow_refund:
-            raise UserError(_('Bu sağlayıcı için iade işlemi desteklenmiyor.'))
-        
         if not amount:
             amount = transaction.amount
-        
-        # İade süre kontrolü
-        if transaction.payment_date:
-            days_diff = (fields.Date.today() - transaction.payment_date).days
-            if days_diff > self.refund_time_limit_days:
-                raise UserError(_('İade süresi dolmuş. Maksimum %s gün içinde iade yapılabilir.') % self.refund_time_limit_days)
+        self._check_refund_allowed(transaction)
         
         # Gateway'e göre iade işlemi
         refund_method = getattr(self, f'_{self.gateway_type}_refund', None)
@@ -544,75 +806,137 @@ class PaymentProvider(models.Model):
         
         raise UserError(_('Bu gateway için iade metodu henüz implement edilmemiş.'))
 
-    # ---- Helper: XML Gönder ----
-    def _send_xml_request(self, xml_data, headers=None):
-        if not headers:
-            headers = {'Content-Type': 'application/xml'}
+    def _check_refund_allowed(self, transaction):
+        """Sağlayıcı ayarlarına ve iade süresine göre iadeye izin verilip verilmediğini kontrol eder"""
+        self.ensure_one()
+        if not self.allow_refund:
+            raise UserError(_('Bu sağlayıcı için iade işlemi desteklenmiyor.'))
+        
+        # İade süre kontrolü
+        if transaction.payment_date:
+            days_diff = (fields.Date.today() - transaction.payment_date).days
+            if days_diff > self.refund_time_limit_days:
+                raise UserError(_('İade süresi dolmuş. Maksimum %s gün içinde iade yapılabilir.') % self.refund_time_limit_days)
+
+    # ---- Helper: İstek Gönder ----
+    def _get_retry_policy(self):
+        """Sağlayıcı ayarlarından yeniden deneme politikasını oluşturur"""
+        self.ensure_one()
+        read_timeout = self.timeout_seconds or 30
+        return retry.RetryPolicy(
+            retries=self.retry_count,
+            connect_timeout=min(self.connect_timeout_seconds or 5, read_timeout),
+            read_timeout=read_timeout,
+            deadline=self.request_deadline_seconds or read_timeout,
+        )
+
+    def _get_transport(self, endpoint_type='api'):
+        """Ağ çağrıları için ORM'den bağımsız taşıma nesnesini oluşturur"""
+        self.ensure_one()
+        return transport.Transport(
+            self.name,
+            self._get_api_url(endpoint_type),
+            self._get_http_session(),
+            self._get_circuit_breaker(),
+            self._get_retry_policy(),
+        )
+
+    def _send_request(self, data, headers=None, operation=None, transaction=None, endpoint_type='api'):
+        """Bankaya istek gönderir; geçici hatalarda politikaya göre tekrar dener"""
+        self.ensure_one()
+        verify = None
+        if transaction and not retry.is_idempotent(operation):
+            verify = lambda: self._verify_operation_applied(operation, transaction)
+
+        try:
+            return self._get_transport(endpoint_type).send(data, headers=headers, operation=operation, verify=verify)
+        except circuit_breaker.CircuitOpenError as e:
+            _logger.warning('%s request to %s rejected, circuit is open', operation, self.name)
+            raise UserError(_('%s şu anda yanıt vermiyor. Lütfen daha sonra tekrar deneyin.') % self.name) from e
+        except retry.GatewayError as e:
+            _logger.error('%s request to %s failed: %s', operation, self.name, e)
+            raise UserError(_('Banka ile iletişim kurulamadı: %s') % e) from e
+
+    def _send_xml_request(self, xml_data, headers=None, operation=None, transaction=None):
+        return self._send_request(xml_data, headers=headers or XML_HEADERS, operation=operation, transaction=transaction)
+
+    def _call_gateway(self, operation, data, parser, transaction=None, headers=None, endpoint_type='api'):
+        """İsteği gönderir, yanıtı ``parser`` ile ayrıştırır ve süreyi metriklere yazar"""
+        self.ensure_one()
+        started = time.monotonic()
         try:
-            response = requests.post(
-                self._get_api_url(),
-                data=xml_data,
-                headers=headers,
-                timeout=self.timeout_seconds
-            )
-            response.raise_for_status()
-            return response.text
+            response_text = self._send_request(data, headers=headers, operation=operation,
+                                               transaction=transaction, endpoint_type=endpoint_type)
+            result = parser(response_text)
         except Exception as e:
-            _logger.error('XML Request Error: %s', e)
-            return f'<Response><Error>{str(e)}</Error></Response>'
+            self._record_bank_call(operation, time.monotonic() - started, error=e)
+            raise
+        self._record_bank_call(operation, time.monotonic() - started, result=result)
+        return result
+
+    def _record_bank_call(self, operation, duration, result=None, error=None):
+        """Banka çağrısının süresini sonuç ve banka yanıt koduyla kaydeder"""
+        self.ensure_one()
+        code = ''
+        if error is not None:
+            cause = error.__cause__ or error
+            outcome = 'rejected' if isinstance(cause, circuit_breaker.CircuitOpenError) else 'error'
+        elif result.get('code') == response_parsers.PARSING_ERROR:
+            outcome = 'parse_error'
+        else:
+            outcome = 'approved' if result.get('success') else 'declined'
+            code = result.get('code') or ''
+        metrics.BANK_REQUEST_DURATION.observe(
+            duration, self.name, self.gateway_type or '', operation or '', outcome, code)
+        if outcome in ('approved', 'declined'):
+            routing.get_state(self.env.cr.dbname).observe_latency(self.id, duration)
+
+    def _verify_operation_applied(self, operation, transaction):
+        """Belirsiz sonuçlanan işlemin bankada gerçekleşip gerçekleşmediğini sorgular"""
+        self.ensure_one()
+        verify_method = getattr(self, f'_{self.gateway_type}_operation_applied', None)
+        if not verify_method or not transaction.pos_order_id:
+            return None, None
+        try:
+            return verify_method(operation, transaction)
+        except UserError as e:
+            _logger.warning('Could not verify %s for %s: %s', operation, transaction.reference, e)
+            return None, None
 
     # ---- EST İade ----
     def _est_refund(self, transaction, amount):
         """EST POS için iade"""
-        root = etree.Element("CC5Request")
-        etree.SubElement(root, "Name").text = self.api_username or ''
-        etree.SubElement(root, "Password").text = self.api_password or ''
-        etree.SubElement(root, "ClientId").text = self.api_client_id or ''
-        etree.SubElement(root, "Type").text = "Credit"
-        etree.SubElement(root, "OrderId").text = transaction.pos_order_id or ''
-        etree.SubElement(root, "Total").text = str(amount)
-        etree.SubElement(root, "Currency").text = self._get_currency_code(transaction.currency_id)
-        
-        xml_data = etree.tostring(root, encoding='ISO-8859-9', xml_declaration=True)
-        response_text = self._send_xml_request(xml_data)
-        return self._parse_est_response(response_text)
+        return self._call_gateway('Credit', self._est_refund_xml(transaction, amount), self._parse_est_response,
+                                  transaction=transaction, headers=XML_HEADERS)
+
+    def _est_refund_xml(self, transaction, amount):
+        """EST POS iade isteğini oluşturur"""
+        return self._get_request_template('Credit').render({
+            'order_id': transaction.pos_order_id or '',
+            'amount': str(amount),
+            'currency': self._get_currency_code(transaction.currency_id),
+        })
 
     # ---- Garanti İade ----
     def _garanti_refund(self, transaction, amount):
         """Garanti POS için iade"""
-        terminal_id = self.api_terminal_id.zfill(9)
-        provision_password = self.api_provision_user
-        security_data = self._generate_hash(provision_password + terminal_id, 'sha256').upper()
-        
-        hash_data = f"{self.api_terminal_id}{transaction.pos_order_id}{str(int(amount * 100))}{security_data}"
-        hash_value = self._generate_hash(hash_data, 'sha256').upper()
-        
-        root = etree.Element("GVPSRequest")
-        etree.SubElement(root, "Mode").text = 'PROD' if self.environment == 'production' else 'TEST'
-        etree.SubElement(root, "Version").text = "0.01"
-        
-        terminal = etree.SubElement(root, "Terminal")
-        etree.SubElement(terminal, "ProvUserID").text = self.api_provision_user or ''
-        etree.SubElement(terminal, "HashData").text = hash_value
-        etree.SubElement(terminal, "UserID").text = self.api_username or ''
-        etree.SubElement(terminal, "ID").text = self.api_terminal_id or ''
-        etree.SubElement(terminal, "MerchantID").text = self.api_merchant_id or ''
-        
-        customer = etree.SubElement(root, "Customer")
-        etree.SubElement(customer, "IPAddress").text = transaction.partner_ip_address or '127.0.0.1'
-        etree.SubElement(customer, "EmailAddress").text = transaction.partner_email or ''
-        
-        order = etree.SubElement(root, "Order")
-        etree.SubElement(order, "OrderID").text = transaction.pos_order_id or ''
-        
-        trans = etree.SubElement(root, "Transaction")
-        etree.SubElement(trans, "Type").text = "refund"
-        etree.SubElement(trans, "Amount").text = str(int(amount * 100))
-        etree.SubElement(trans, "CurrencyCode").text = self._get_currency_code(transaction.currency_id)
+        return self._call_gateway('Credit', self._garanti_refund_xml(transaction, amount),
+                                  self._parse_garanti_response, transaction=transaction, headers=XML_HEADERS)
+
+    def _garanti_refund_xml(self, transaction, amount):
+        """Garanti POS iade isteğini oluşturur"""
+        signer = self._get_signing_context()
+        hash_data = f"{self.api_terminal_id}{transaction.pos_order_id}{str(int(amount * 100))}{signer.security_data}"
+        hash_value = signer.sign(hash_data)
         
-        xml_data = etree.tostring(root, encoding='UTF-8', xml_declaration=True)
-        response_text = self._send_xml_request(xml_data)
-        return self._parse_garanti_response(response_text)
+        return self._get_request_template('Credit').render({
+            'hash': hash_value,
+            'ip_address': transaction.partner_ip_address or '127.0.0.1',
+            'email': transaction.partner_email or '',
+            'order_id': transaction.pos_order_id or '',
+            'amount': str(int(amount * 100)),
+            'currency': self._get_currency_code(transaction.currency_id),
+        })
 
     # ==================== İPTAL METOTLARI ====================
     
@@ -620,8 +944,7 @@ class PaymentProvider(models.Model):
         """İptal işlemi yapar"""
         self.ensure_one()
         
-        if not self.allow_cancel:
-            raise UserError(_('Bu sağlayıcı için iptal işlemi desteklenmiyor.'))
+        self._check_cancel_allowed()
         
         cancel_method = getattr(self, f'_{self.gateway_type}_cancel', None)
         if cancel_method:
@@ -629,19 +952,20 @@ class PaymentProvider(models.Model):
         
         raise UserError(_('Bu gateway için iptal metodu henüz implement edilmemiş.'))
 
+    def _check_cancel_allowed(self):
+        self.ensure_one()
+        if not self.allow_cancel:
+            raise UserError(_('Bu sağlayıcı için iptal işlemi desteklenmiyor.'))
+
     # ---- EST İptal ----
     def _est_cancel(self, transaction):
         """EST POS için iptal"""
-        root = etree.Element("CC5Request")
-        etree.SubElement(root, "Name").text = self.api_username or ''
-        etree.SubElement(root, "Password").text = self.api_password or ''
-        etree.SubElement(root, "ClientId").text = self.api_client_id or ''
-        etree.SubElement(root, "Type").text = "Void"
-        etree.SubElement(root, "OrderId").text = transaction.pos_order_id or ''
-        
-        xml_data = etree.tostring(root, encoding='ISO-8859-9', xml_declaration=True)
-        response_text = self._send_xml_request(xml_data)
-        return self._parse_est_response(response_text)
+        return self._call_gateway('Void', self._est_cancel_xml(transaction), self._parse_est_response,
+                                  transaction=transaction, headers=XML_HEADERS)
+
+    def _est_cancel_xml(self, transaction):
+        """EST POS iptal isteğini oluşturur"""
+        return self._get_request_template('Void').render({'order_id': transaction.pos_order_id or ''})
 
     # ==================== DURUM SORGULAMA ====================
     
@@ -655,73 +979,72 @@ class PaymentProvider(models.Model):
         
         raise UserError(_('Bu gateway için durum sorgulama metodu henüz implement edilmemiş.'))
 
+    def _prepare_bulk_request(self, operation, transaction, amount=None):
+        """Toplu istemci için isteği hazırlar: (veri, başlıklar, ayrıştırıcı).
+
+        Ağ çağrısı yapmaz; izin kontrolleri tekil işlemlerle aynıdır.
+        """
+        self.ensure_one()
+        if operation == 'Credit':
+            self._check_refund_allowed(transaction)
+        elif operation == 'Void':
+            self._check_cancel_allowed()
+        builder = getattr(self, BULK_REQUEST_BUILDERS[operation] % self.gateway_type, None)
+        if not builder:
+            raise UserError(_('Bu gateway için toplu %s işlemi henüz implement edilmemiş.') % operation)
+        data = builder(transaction, amount) if operation == 'Credit' else builder(transaction)
+        return data, XML_HEADERS, self._parse_gateway_response
+
+    def _parse_status_response(self, response_text):
+        """Durum sorgusu yanıtını gateway tipine göre ayrıştırır"""
+        return self._parse_gateway_response(response_text)
+
     # ---- EST Durum Sorgulama ----
     def _est_query(self, transaction):
         """EST POS için durum sorgulama"""
-        root = etree.Element("CC5Request")
-        etree.SubElement(root, "Name").text = self.api_username or ''
-        etree.SubElement(root, "Password").text = self.api_password or ''
-        etree.SubElement(root, "ClientId").text = self.api_client_id or ''
-        etree.SubElement(root, "Type").text = "OrderInq"
-        etree.SubElement(root, "OrderId").text = transaction.pos_order_id or ''
-        
-        xml_data = etree.tostring(root, encoding='ISO-8859-9', xml_declaration=True)
-        response_text = self._send_xml_request(xml_data)
-        return self._parse_est_response(response_text)
+        return self._call_gateway('OrderInq', self._est_query_xml(transaction), self._parse_est_response,
+                                  headers=XML_HEADERS)
+
+    def _est_query_xml(self, transaction):
+        """EST POS durum sorgulama isteğini oluşturur"""
+        return self._get_request_template('OrderInq').render({'order_id': transaction.pos_order_id or ''})
+
+    def _est_operation_applied(self, operation, transaction):
+        """EST sipariş durumuna göre işlemin gerçekleşip gerçekleşmediğini döndürür"""
+        result = self._call_gateway('OrderInq', self._est_query_xml(transaction), self._parse_est_response,
+                                    headers=XML_HEADERS)
+        if result.code != '00':
+            # Sipariş bankada yok: Auth ve Void hiç uygulanmamış
+            return (False, None) if operation in ('Auth', 'Void') else (None, None)
+        if operation == 'Void':
+            return result.trans_stat in ('V', 'CNCL'), result.raw
+        if operation == 'Auth':
+            return result.trans_stat in ('A', 'C', 'S'), result.raw
+        # Kısmi iadeler sipariş durumundan ayırt edilemez
+        return None, None
 
     # ==================== YANIT AYRİŞTIRMA ====================
     
+    def _parse_gateway_response(self, response_text):
+        """Yanıtı gateway tipinin kayıtlı ayrıştırıcısıyla ayrıştırır"""
+        self.ensure_one()
+        parser = response_parsers.get_parser(self.gateway_type)
+        if not parser:
+            raise UserError(_('Bu gateway için yanıt ayrıştırıcı bulunmuyor: %s') % self.gateway_type)
+        return self._log_parse_error(parser(response_text))
+
     def _parse_est_response(self, response_text):
         """EST yanıtını ayrıştırır"""
-        try:
-            root = ET.fromstring(response_text)
-            result = {
-                'success': False,
-                'message': '',
-                'code': '',
-                'transaction_id': '',
-            }
-            
-            for elem in root:
-                if elem.tag == 'ProcReturnCode':
-                    result['success'] = elem.text == '00'
-                elif elem.tag == 'ErrMsg':
-                    result['message'] = elem.text or ''
-                elif elem.tag == 'TransId':
-                    result['transaction_id'] = elem.text or ''
-                elif elem.tag == 'Response':
-                    result['code'] = elem.text or ''
-            
-            return result
-        except Exception as e:
-            _logger.error('EST response parsing error: %s', e)
-            return {'success': False, 'message': str(e), 'code': 'PARSING_ERROR'}
+        return self._log_parse_error(response_parsers.parse_cc5(response_text))
 
     def _parse_garanti_response(self, response_text):
         """Garanti yanıtını ayrıştırır"""
-        try:
-            root = ET.fromstring(response_text)
-            result = {
-                'success': False,
-                'message': '',
-                'code': '',
-                'transaction_id': '',
-            }
-            
-            transaction = root.find('.//Transaction')
-            if transaction is not None:
-                response_elem = transaction.find('Response')
-                if response_elem is not None:
-                    result['code'] = response_elem.findtext('Code', '')
-                    result['message'] = response_elem.findtext('Message', '')
-                    result['success'] = result['code'] == '00'
-                
-                result['transaction_id'] = transaction.findtext('RetrefNum', '')
-            
-            return result
-        except Exception as e:
-            _logger.error('Garanti response parsing error: %s', e)
-            return {'success': False, 'message': str(e), 'code': 'PARSING_ERROR'}
+        return self._log_parse_error(response_parsers.parse_gvps(response_text))
+
+    def _log_parse_error(self, result):
+        if result.code == response_parsers.PARSING_ERROR:
+            _logger.error('%s response parsing error: %s', self.gateway_type, result.message)
+        return result
 
     # ==================== 3D DÖNÜŞ İŞLEME ====================
     
@@ -748,13 +1071,7 @@ class PaymentProvider(models.Model):
         
         # Hash doğrulama
         if result['success']:
-            hash_params = post_data.get('HASHPARAMS', '')
-            hash_params_val = post_data.get('HASHPARAMSVAL', '')
-            hash = post_data.get('HASH', '')
-            
-            calculated_hash = self._generate_hash(hash_params_val + self.api_store_key, self.hash_algorithm)
-            
-            if calculated_hash.upper() != hash.upper():
+            if not self._get_signing_context().verify_callback(post_data):
                 result['success'] = False
                 result['message'] = _('Hash doğrulama başarısız.')
         
@@ -773,10 +1090,7 @@ class PaymentProvider(models.Model):
         
         # Hash doğrulama
         if result['success']:
-            hash_params = f"{post_data.get('clientid', '')}{post_data.get('oid', '')}{post_data.get('authCode', '')}{post_data.get('procReturnCode', '')}{post_data.get('mdStatus', '')}"
-            calculated_hash = self._generate_hash(hash_params + self.api_store_key, 'sha256').upper()
-            
-            if calculated_hash != post_data.get('HASH', ''):
+            if not self._get_signing_context().verify_callback(post_data):
                 result['success'] = False
                 result['message'] = _('Hash doğrulama başarısız.')
         
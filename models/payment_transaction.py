@@ -5,10 +5,19 @@ from datetime import datetime, timedelta
 
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools import split_every
 from odoo.tools.float_utils import float_round
 
+from ..tools import async_gateway, order_ids, response_parsers
+
 _logger = logging.getLogger(__name__)
 
+# Cron sonuçlarının veritabanına yazılacağı parti boyutu
+CRON_WRITE_BATCH_SIZE = 500
+
+# Banka sipariş numaralarının sıra parçası
+ORDER_ID_SEQUENCE = 'turkey_pos_order_id_seq'
+
 
 class PaymentTransaction(models.Model):
     _inherit = 'payment.transaction'
@@ -90,6 +99,16 @@ class PaymentTransaction(models.Model):
             else:
                 tx.installment_amount = tx.amount
 
+    def init(self):
+        super().init()
+        # Yönlendirme durumu değişen işlemleri write_date üzerinden artımlı okur
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS payment_transaction_turkey_pos_write_date_idx
+                ON payment_transaction (write_date)
+        """)
+        # Sipariş numaralarının sıra parçası; nextval kilitsizdir ve geri alınmaz
+        self.env.cr.execute("CREATE SEQUENCE IF NOT EXISTS %s" % ORDER_ID_SEQUENCE)
+
     # ==================== İŞLEM METOTLARI ====================
     
     def _send_payment_request(self):
@@ -103,7 +122,7 @@ class PaymentTransaction(models.Model):
         
         try:
             # POS sipariş ID oluştur
-            self.pos_order_id = f"ODOO_{self.id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            self._set_pos_order_id(self._generate_pos_order_id())
             
             # İşlem durumunu güncelle
             self.pos_state = 'processing'
@@ -121,6 +140,38 @@ class PaymentTransaction(models.Model):
             self._add_history_entry('failed', str(e))
             return {'success': False, 'error': str(e)}
 
+    @api.model
+    def _next_order_sequence(self):
+        self.env.cr.execute("SELECT nextval(%s)", [ORDER_ID_SEQUENCE])
+        return self.env.cr.fetchone()[0]
+
+    def _generate_pos_order_id(self):
+        """Her denemede farklı, işlem id'sine geri çözülebilen banka sipariş numarası"""
+        self.ensure_one()
+        return order_ids.encode(self.id, self._next_order_sequence(), self.provider_id.gateway_type)
+
+    @api.model
+    def _find_by_pos_order_id(self, order_id, provider=None):
+        """Bankanın döndürdüğü sipariş numarasından işlemi bulur.
+
+        Yeni numaralar arama yapılmadan işlem id'sine çözülür; ``pos_order_id``
+        araması önceki biçimdeki numaralar içindir.
+        """
+        if not order_id:
+            return self.browse()
+        tx_id = order_ids.decode(order_id, provider.gateway_type if provider else None)
+        if tx_id:
+            transaction = self.browse(tx_id).exists()
+            if transaction and order_ids.same(transaction.pos_order_id, order_id) \
+                    and (not provider or transaction.provider_id == provider):
+                return transaction
+        return self.search([('pos_order_id', '=', order_id)], limit=1)
+
+    def _set_pos_order_id(self, order_id):
+        """Banka sipariş numarasını atar"""
+        self.ensure_one()
+        self.pos_order_id = order_id
+
     def _process_notification_data(self, data):
         """Bildirim verilerini işler"""
         self.ensure_one()
@@ -130,9 +181,16 @@ class PaymentTransaction(models.Model):
                                        'denizbank', 'teb', 'sekerbank', 'kuveytturk', 'param', 'tosla']:
             return super(PaymentTransaction, self)._process_notification_data(data)
         
+        if self.state == 'done':
+            # Tamamlanmış işlem için gelen tekrar bildirimleri durumu değiştirmez
+            _logger.info('Ignoring notification for already completed transaction %s', self.reference)
+            return {'success': True, 'message': _('İşlem zaten tamamlanmış.'), 'replayed': True}
+        
         try:
             # Eğer veri zaten işlenmişse (success anahtarı varsa) direkt kullan
-            if isinstance(data, dict) and 'success' in data and 'processed' in data:
+            if isinstance(data, response_parsers.GatewayResult) and data.processed:
+                result = data
+            elif isinstance(data, dict) and 'success' in data and 'processed' in data:
                 result = data
             else:
                 # 3D dönüş verilerini işle
@@ -150,14 +208,8 @@ class PaymentTransaction(models.Model):
                 self.is_3d_secure = True
                 self.md_status = data.get('mdStatus', '')
                 
-                self._add_history_entry('authorized', 
-                    _('Ödeme başarılı. Onay Kodu: %s') % self.pos_auth_code)
-                
-                # POS Siparişi Oluştur
-                self._create_pos_order()
-                
-                # Faturayı ödendi olarak işaretle
-                self._reconcile_after_done()
+                # Sipariş, mutabakat ve bildirimler müşteri yönlendirildikten sonra cron'da çalışır
+                self.env['turkey.pos.job'].sudo()._enqueue(self)
             else:
                 self.pos_state = 'failed'
                 self.state = 'error'
@@ -176,6 +228,46 @@ class PaymentTransaction(models.Model):
             self._add_history_entry('failed', str(e))
             return {'success': False, 'error': str(e)}
 
+    # ==================== YETKİLENDİRME SONRASI İŞLER ====================
+
+    def _post_auth_pos_order(self):
+        """Tarihçe kaydını yazar ve POS siparişini oluşturur"""
+        self.ensure_one()
+        if self.env['turkey.pos.order'].sudo().search_count([('transaction_id', '=', self.id)], limit=1):
+            return
+        self._add_history_entry('authorized',
+            _('Ödeme başarılı. Onay Kodu: %s') % self.pos_auth_code)
+        self._create_pos_order()
+
+    def _post_auth_reconcile(self):
+        """Faturayı ödendi olarak işaretler ve POS siparişine bağlar"""
+        self.ensure_one()
+        self._reconcile_after_done()
+        invoice = self.invoice_ids[:1] if hasattr(self, 'invoice_ids') else False
+        if invoice:
+            self.env['turkey.pos.order'].sudo().search([
+                ('transaction_id', '=', self.id), ('invoice_id', '=', False),
+            ]).write({'invoice_id': invoice.id})
+
+    def _post_auth_notify(self):
+        """Ayarlarda açıksa müşteriye başarılı ödeme bildirimi gönderir"""
+        self.ensure_one()
+        if not self.env['res.config.settings']._get_pos_settings().notify_success:
+            return
+        order = self.env['turkey.pos.order'].sudo().search([('transaction_id', '=', self.id)], limit=1)
+        if not order:
+            # Sipariş adımı henüz tamamlanmadı; iş yeniden denenir
+            raise UserError(_('İşlem için POS siparişi henüz oluşturulmadı.'))
+        if self.partner_id:
+            order.message_post(
+                body=_('%(amount)s %(currency)s tutarındaki ödemeniz alındı. Onay Kodu: %(code)s') % {
+                    'amount': self.amount, 'currency': self.currency_id.name, 'code': self.pos_auth_code,
+                },
+                partner_ids=self.partner_id.ids,
+                message_type='notification',
+                subtype_xmlid='mail.mt_comment',
+            )
+
     def _create_pos_order(self):
         """İşlem başarılı olduğunda POS siparişi oluşturur"""
         self.ensure_one()
@@ -192,18 +284,63 @@ class PaymentTransaction(models.Model):
             'payment_date': datetime.now(),
         }
         
-        # Sale Order linkleme
+        # Sale Order / Fatura linkleme
         if hasattr(self, 'sale_order_ids') and self.sale_order_ids:
             order_vals['sale_order_id'] = self.sale_order_ids[0].id
         elif self.reference:
-            so_name = self.reference.split('_')[0]
-            sale_order = self.env['sale.order'].sudo().search([('name', '=', so_name)], limit=1)
-            if sale_order:
-                order_vals['sale_order_id'] = sale_order.id
+            document = self._resolve_reference(self.reference.split('_')[0])
+            if document['model'] == 'sale.order':
+                order_vals['sale_order_id'] = document['id']
+            elif document['model'] == 'account.move':
+                order_vals['invoice_id'] = document['id']
         
         order = pos_order_model.create(order_vals)
         return order
 
+    @api.model
+    def _resolve_reference(self, reference):
+        """Ödeme referansını tek sorguda çözer.
+
+        Satış siparişi, müşteri faturası ve aynı referanslı işlem tek bir
+        ``UNION ALL`` sorgusuyla, her biri kendi ad/referans indeksi üzerinden
+        aranır. Dönen sözlük:
+
+        * ``model``/``id``/``amount``/``currency_id``: tutarı belirleyen belge
+          (önce satış siparişi, sonra fatura; yoksa ``model`` False)
+        * ``transaction``: aynı referanslı mevcut işlem (yoksa boş kayıt)
+        """
+        result = {'model': False, 'id': False, 'amount': 0.0, 'currency_id': False,
+                  'transaction': self.env['payment.transaction']}
+        if not reference:
+            return result
+        # Ham sorgu bekleyen ORM yazmalarını görmeli
+        self.env['sale.order'].flush_model(['name', 'amount_total', 'currency_id'])
+        self.env['account.move'].flush_model(['name', 'move_type', 'amount_total', 'currency_id'])
+        self.env['payment.transaction'].flush_model(['reference'])
+        self.env.cr.execute("""
+            (SELECT 0 AS priority, 'sale.order' AS model, id, amount_total, currency_id
+               FROM sale_order
+              WHERE name = %(reference)s
+              LIMIT 1)
+            UNION ALL
+            (SELECT 1, 'account.move', id, amount_total, currency_id
+               FROM account_move
+              WHERE name = %(reference)s AND move_type = 'out_invoice'
+              LIMIT 1)
+            UNION ALL
+            (SELECT 2, 'payment.transaction', id, NULL, NULL
+               FROM payment_transaction
+              WHERE reference = %(reference)s
+              LIMIT 1)
+            ORDER BY 1
+        """, {'reference': reference})
+        for _priority, model, res_id, amount, currency_id in self.env.cr.fetchall():
+            if model == 'payment.transaction':
+                result['transaction'] = self.env['payment.transaction'].browse(res_id)
+            elif not result['model']:
+                result.update(model=model, id=res_id, amount=float(amount or 0.0), currency_id=currency_id)
+        return result
+
     def _add_history_entry(self, state, message):
         """İşlem tarihçesine kayıt ekler"""
         self.ensure_one()
@@ -240,22 +377,7 @@ class PaymentTransaction(models.Model):
             result = provider.process_refund(self, amount)
             
             if result['success']:
-                self.refund_amount += amount
-                self.refund_date = datetime.now()
-                self.refund_transaction_id = result.get('transaction_id', '')
-                
-                if self.refund_amount >= self.amount:
-                    self.is_refunded = True
-                    self.pos_state = 'refunded'
-                    self.state = 'cancel'
-                else:
-                    self.pos_state = 'partial_refunded'
-                
-                self._add_history_entry('refunded', 
-                    _('İade yapıldı. Tutar: %s, İade ID: %s') % (amount, self.refund_transaction_id))
-                
-                # İade kaydı oluştur
-                self._create_refund_move(amount)
+                self._apply_refund_result(amount, result)
                 
                 return {
                     'type': 'ir.actions.client',
@@ -273,6 +395,26 @@ class PaymentTransaction(models.Model):
             _logger.error('Refund error: %s', e)
             raise UserError(_('İade işlemi sırasında hata: %s') % str(e))
 
+    def _apply_refund_result(self, amount, result):
+        """Başarılı iade yanıtını işleme yansıtır"""
+        self.ensure_one()
+        self.refund_amount += amount
+        self.refund_date = datetime.now()
+        self.refund_transaction_id = result.get('transaction_id', '')
+        
+        if self.refund_amount >= self.amount:
+            self.is_refunded = True
+            self.pos_state = 'refunded'
+            self.state = 'cancel'
+        else:
+            self.pos_state = 'partial_refunded'
+        
+        self._add_history_entry('refunded', 
+            _('İade yapıldı. Tutar: %s, İade ID: %s') % (amount, self.refund_transaction_id))
+        
+        # İade kaydı oluştur
+        self._create_refund_move(amount)
+
     def _create_refund_move(self, amount):
         """İade muhasebe kaydı oluşturur"""
         self.ensure_one()
@@ -319,14 +461,7 @@ class PaymentTransaction(models.Model):
             result = provider.process_cancel(self)
             
             if result['success']:
-                self.is_cancelled = True
-                self.cancel_date = datetime.now()
-                self.cancel_transaction_id = result.get('transaction_id', '')
-                self.pos_state = 'cancelled'
-                self.state = 'cancel'
-                
-                self._add_history_entry('cancelled', 
-                    _('İptal edildi. İptal ID: %s') % self.cancel_transaction_id)
+                self._apply_cancel_result(result)
                 
                 return {
                     'type': 'ir.actions.client',
@@ -344,6 +479,18 @@ class PaymentTransaction(models.Model):
             _logger.error('Cancel error: %s', e)
             raise UserError(_('İptal işlemi sırasında hata: %s') % str(e))
 
+    def _apply_cancel_result(self, result):
+        """Başarılı iptal yanıtını işleme yansıtır"""
+        self.ensure_one()
+        self.is_cancelled = True
+        self.cancel_date = datetime.now()
+        self.cancel_transaction_id = result.get('transaction_id', '')
+        self.pos_state = 'cancelled'
+        self.state = 'cancel'
+        
+        self._add_history_entry('cancelled', 
+            _('İptal edildi. İptal ID: %s') % self.cancel_transaction_id)
+
     # ==================== DURUM SORGULAMA ====================
     
     def action_query_status(self):
@@ -423,6 +570,71 @@ class PaymentTransaction(models.Model):
             'context': {'default_transaction_id': self.id},
         }
 
+    # ==================== TOPLU BANKA İŞLEMLERİ ====================
+
+    def _bulk_gateway_call(self, operation, amounts=None):
+        """İşlemler için aynı banka işlemini eşzamanlı çalıştırır.
+
+        İstekler ORM'den hazırlanır, ağ aşaması imlece dokunmadan
+        ``async_gateway`` ile yapılır. ``{işlem id: (sonuç, hata)}``
+        döndürür; yazma işlemleri çağırana bırakılır.
+        """
+        amounts = amounts or {}
+        outcomes = {}
+        calls = []
+        transports = {}
+        limits = {}
+        parsers = {}
+        for tx in self:
+            provider = tx.provider_id
+            try:
+                data, headers, parser = provider._prepare_bulk_request(
+                    operation, tx, amounts.get(tx.id, tx.amount))
+                if provider.id not in transports:
+                    transports[provider.id] = provider._get_transport()
+                    limits[provider.id] = provider.max_concurrent_requests
+            except Exception as e:
+                outcomes[tx.id] = (None, e)
+                continue
+            parsers[tx.id] = parser
+            calls.append(async_gateway.BankCall(
+                provider.id, tx.id, transports[provider.id], data, headers=headers, operation=operation))
+
+        max_concurrency = (self.env['res.config.settings']._get_pos_settings().cron_max_workers
+                           or async_gateway.DEFAULT_MAX_CONCURRENCY)
+        results = async_gateway.run(calls, max_concurrency, limits)
+
+        for tx in self.filtered(lambda t: t.id in results):
+            response_text, duration, error = results[tx.id]
+            if error:
+                tx.provider_id._record_bank_call(operation, duration, error=error)
+                outcomes[tx.id] = (None, error)
+                continue
+            result = parsers[tx.id](response_text)
+            tx.provider_id._record_bank_call(operation, duration, result=result)
+            outcomes[tx.id] = (result, None)
+        return outcomes
+
+    def _bulk_query_status(self):
+        """Durum sorgularını toplu çalıştırır ve tarihçeyi toplu yazar"""
+        outcomes = self._bulk_gateway_call('OrderInq')
+        history_vals = []
+        for tx in self.filtered(lambda t: t.id in outcomes):
+            result, error = outcomes[tx.id]
+            if error or not result.get('success'):
+                _logger.error("Error checking transaction %s: %s", tx.reference,
+                              error or result.get('message'))
+                continue
+            history_vals.append({
+                'transaction_id': tx.id,
+                'state': 'query',
+                'message': _('Durum sorgulama: %s') % result.get('message', ''),
+                'date': datetime.now(),
+            })
+        for batch in split_every(CRON_WRITE_BATCH_SIZE, history_vals, list):
+            self.env['payment.transaction.history'].create(batch)
+        return outcomes
+
     # ==================== CRON METOTLARI ====================
 
     @api.model
@@ -434,11 +646,10 @@ class PaymentTransaction(models.Model):
             ('pos_order_id', '!=', False),
             ('create_date', '<', cutoff)
         ])
-        for tx in pending_transactions:
-            try:
-                tx.action_query_status()
-            except Exception as e:
-                _logger.error("Error checking transaction %s: %s", tx.reference, e)
+        if not pending_transactions:
+            return
+        
+        pending_transactions._bulk_query_status()
 
     @api.model
     def _cron_archive_old_transactions(self):
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import logging
+from datetime import timedelta
+
+from odoo import api, fields, models, _
+
+_logger = logging.getLogger(__name__)
+
+# pg_try_advisory_xact_lock(int, int) için modüle ait ad alanı
+ADVISORY_LOCK_NAMESPACE = 0x54504F53  # 'TPOS'
+
+# Sonuçları saklanan geri dönüşlerin tutulma süresi
+CALLBACK_RETENTION_DAYS = 30
+
+
+class PosCallback(models.Model):
+    _name = 'turkey.pos.callback'
+    _description = 'POS 3D Dönüş Kaydı'
+    _order = 'date desc'
+    _log_access = False
+
+    order_id = fields.Char(string='Banka Sipariş No', required=True)
+    callback_hash = fields.Char(string='Dönüş Özeti', required=True)
+    transaction_id = fields.Many2one('payment.transaction', string='Ödeme İşlemi', index=True,
+                                     ondelete='cascade')
+    success = fields.Boolean(string='Başarılı')
+    redirect_url = fields.Char(string='Yönlendirme Adresi')
+    date = fields.Datetime(string='Tarih', default=fields.Datetime.now)
+
+    def init(self):
+        # _store'daki ON CONFLICT hedefi; _sql_constraints Odoo 19'da oluşturulmuyor
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS turkey_pos_callback_order_callback_uniq
+                ON turkey_pos_callback (order_id, callback_hash)
+        """)
+
+    @api.model
+    def _hash_payload(self, provider_id, post):
+        """Sağlayıcı ve form alanlarından sıra bağımsız özet üretir"""
+        payload = '\n'.join('%s=%s' % (key, post[key]) for key in sorted(post))
+        return hashlib.sha256(('%s\n%s' % (provider_id, payload)).encode('utf-8')).hexdigest()
+
+    @api.model
+    def _claim(self, order_id, callback_hash):
+        """Sipariş için bloklamayan kilit alır ve önceki sonucu arar.
+
+        ``('locked', None)``: başka bir istek bu siparişi işliyor,
+        ``('replay', url)``: aynı dönüş (veya başarılı bir önceki dönüş) işlenmiş,
+        ``('new', None)``: bu istek işlemeye devam etmeli.
+        """
+        cr = self.env.cr
+        cr.execute("SELECT pg_try_advisory_xact_lock(%s, hashtext(%s))", [ADVISORY_LOCK_NAMESPACE, order_id])
+        if not cr.fetchone()[0]:
+            return 'locked', None
+        # Kopyalar ORM'e uğramadan saklanan sonucu alır
+        cr.execute("""
+            SELECT redirect_url
+              FROM turkey_pos_callback
+             WHERE order_id = %s AND (callback_hash = %s OR success)
+          ORDER BY callback_hash = %s DESC
+             LIMIT 1
+        """, [order_id, callback_hash, callback_hash])
+        row = cr.fetchone()
+        if row:
+            return 'replay', row[0]
+        return 'new', None
+
+    @api.model
+    def _store(self, order_id, callback_hash, transaction, success, redirect_url):
+        """İşlenen dönüşün sonucunu kaydeder; kilit işlem sonunda bırakılır"""
+        self.env.cr.execute("""
+            INSERT INTO turkey_pos_callback (order_id, callback_hash, transaction_id, success, redirect_url, date)
+            VALUES (%s, %s, %s, %s, %s, now() at time zone 'UTC')
+            ON CONFLICT (order_id, callback_hash) DO NOTHING
+        """, [order_id, callback_hash, transaction.id or None, bool(success), redirect_url])
+
+    @api.autovacuum
+    def _gc_old_callbacks(self):
+        """Eski dönüş kayıtlarını temizler"""
+        cutoff = fields.Datetime.now() - timedelta(days=CALLBACK_RETENTION_DAYS)
+        self.search([('date', '<', cutoff)]).unlink()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# Bir cron çalışmasında işlenen iş sayısı; kalan işler için cron yeniden tetiklenir
+JOB_BATCH_SIZE = 100
+
+# Deneme sayısı dolan iş 'failed' durumuna geçer ve elle yeniden denenir
+JOB_MAX_ATTEMPTS = 5
+
+# Yeniden deneme gecikmesi: JOB_RETRY_DELAY * 2 ** (deneme - 1) saniye
+JOB_RETRY_DELAY = 60
+
+# Başarılı yetkilendirmeden sonra sırayla kuyruğa alınan adımlar
+POST_AUTH_STEPS = ('pos_order', 'reconcile', 'notify')
+
+
+class PosJob(models.Model):
+    _name = 'turkey.pos.job'
+    _description = 'POS Yetkilendirme Sonrası İş'
+    _order = 'id desc'
+
+    transaction_id = fields.Many2one('payment.transaction', string='Ödeme İşlemi', required=True,
+                                     index=True, ondelete='cascade')
+    job_type = fields.Selection([
+        ('pos_order', 'POS Siparişi'),
+        ('reconcile', 'Mutabakat ve Fatura'),
+        ('notify', 'Bildirim'),
+    ], string='İş Tipi', required=True)
+    state = fields.Selection([
+        ('pending', 'Bekliyor'),
+        ('done', 'Tamamlandı'),
+        ('failed', 'Başarısız'),
+    ], string='Durum', default='pending', required=True)
+    attempts = fields.Integer(string='Deneme Sayısı', default=0)
+    next_attempt = fields.Datetime(string='Sonraki Deneme', default=fields.Datetime.now)
+    date_done = fields.Datetime(string='Tamamlanma Tarihi')
+    last_error = fields.Text(string='Son Hata')
+
+    def init(self):
+        # Cron yalnızca bekleyen ve zamanı gelmiş işleri okur
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS turkey_pos_job_pending_idx
+                ON turkey_pos_job (next_attempt, id) WHERE state = 'pending'
+        """)
+        # _enqueue'daki ON CONFLICT hedefi; _sql_constraints Odoo 19'da oluşturulmuyor
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS turkey_pos_job_transaction_job_uniq
+                ON turkey_pos_job (transaction_id, job_type)
+        """)
+
+    @api.model
+    def _enqueue(self, transaction, job_types=POST_AUTH_STEPS):
+        """İşlem için işleri kuyruğa alır ve cron'u tetikler.
+
+        Tekrar gelen bildirimler mevcut işlere dokunmaz.
+        """
+        self.env.cr.executemany("""
+            INSERT INTO turkey_pos_job (transaction_id, job_type, state, attempts, next_attempt,
+                                        create_uid, create_date, write_uid, write_date)
+            VALUES (%s, %s, 'pending', 0, now() at time zone 'UTC',
+                    %s, now() at time zone 'UTC', %s, now() at time zone 'UTC')
+            ON CONFLICT (transaction_id, job_type) DO NOTHING
+        """, [(transaction.id, job_type, self.env.uid, self.env.uid) for job_type in job_types])
+        self.env.ref('turkey_pos_payment.ir_cron_process_pos_jobs_turkey_pos')._trigger()
+
+    @api.model
+    def _claim_batch(self, limit=JOB_BATCH_SIZE):
+        """Zamanı gelmiş işleri kilitler; başka işçinin tuttukları atlanır"""
+        self.env.cr.execute("""
+            SELECT id
+              FROM turkey_pos_job
+             WHERE state = 'pending' AND next_attempt <= now() at time zone 'UTC'
+          ORDER BY next_attempt, id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """, [limit])
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    @api.model
+    def _cron_process_jobs(self, limit=JOB_BATCH_SIZE):
+        """Bekleyen yetkilendirme sonrası işleri toplu olarak çalıştırır"""
+        jobs = self._claim_batch(limit)
+        for job in jobs:
+            job._run()
+        if len(jobs) == limit:
+            # Kuyrukta iş kalmış olabilir; aynı çalışmayı uzatmak yerine yeniden tetikle
+            self.env.ref('turkey_pos_payment.ir_cron_process_pos_jobs_turkey_pos')._trigger()
+        return len(jobs)
+
+    def _run(self):
+        """İşi kendi kayıt noktasında çalıştırır; hata kalan işleri etkilemez"""
+        self.ensure_one()
+        transaction = self.transaction_id.sudo()
+        try:
+            with self.env.cr.savepoint():
+                getattr(transaction, '_post_auth_%s' % self.job_type)()
+        except Exception as e:
+            attempts = self.attempts + 1
+            _logger.warning('POS job %s (%s) for %s failed (attempt %s): %s',
+                            self.id, self.job_type, transaction.reference, attempts, e)
+            vals = {'attempts': attempts, 'last_error': str(e)}
+            if attempts >= JOB_MAX_ATTEMPTS:
+                vals['state'] = 'failed'
+            else:
+                vals['next_attempt'] = fields.Datetime.now() + timedelta(
+                    seconds=JOB_RETRY_DELAY * 2 ** (attempts - 1))
+            self.write(vals)
+            return False
+        self.write({
+            'state': 'done',
+            'attempts': self.attempts + 1,
+            'date_done': fields.Datetime.now(),
+            'last_error': False,
+        })
+        return True
+
+    def action_retry(self):
+        """Başarısız işleri yeniden kuyruğa alır"""
+        self.filtered(lambda j: j.state == 'failed').write({
+            'state': 'pending',
+            'attempts': 0,
+            'next_attempt': fields.Datetime.now(),
+        })
+        self.env.ref('turkey_pos_payment.ir_cron_process_pos_jobs_turkey_pos')._trigger()
+        return True
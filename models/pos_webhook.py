@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from odoo import api, fields, models, _
+
+from ..tools import metrics, response_parsers
+
+_logger = logging.getLogger(__name__)
+
+# Bir cron çalışmasında işlenen webhook sayısı
+WEBHOOK_BATCH_SIZE = 500
+
+# İşlenmiş webhook kayıtlarının tutulma süresi
+WEBHOOK_RETENTION_DAYS = 30
+
+# Sağlayıcıların gövdede kullandığı alan adları
+ORDER_ID_KEYS = ('orderId', 'order_id', 'ORDER_ID', 'OrderId', 'MerchantOrderId')
+STATUS_KEYS = ('status', 'Status', 'STATUS', 'result', 'Result')
+AUTH_CODE_KEYS = ('authCode', 'auth_code', 'AuthCode', 'AUTH_CODE')
+TRANSACTION_ID_KEYS = ('transactionId', 'transaction_id', 'TransactionId', 'TRANSACTION_ID')
+SUCCESS_STATUSES = {'success', 'successful', 'approved', 'paid', 'settled', '00', '1', 'true'}
+# Yalnızca bu durumlar işlemi başarısız yapar; ara bildirimler (pending, 3d_required...) yok sayılır
+FAILURE_STATUSES = {'failed', 'failure', 'fail', 'error', 'declined', 'rejected', 'cancelled', 'canceled',
+                    'void', 'voided', 'expired', '0', 'false'}
+
+
+def _first(payload, keys):
+    for key in keys:
+        value = payload.get(key)
+        if value not in (None, ''):
+            return str(value)
+    return ''
+
+
+class PosWebhook(models.Model):
+    _name = 'turkey.pos.webhook'
+    _description = 'POS Webhook Gelen Kutusu'
+    _order = 'received_at desc'
+    _log_access = False
+
+    provider_code = fields.Char(string='Sağlayıcı Kodu', required=True)
+    payload = fields.Text(string='Gövde')
+    signature = fields.Char(string='İmza')
+    payload_hash = fields.Char(string='Gövde Özeti', index=True)
+    received_at = fields.Datetime(string='Alınma Tarihi', default=fields.Datetime.now)
+    processed_at = fields.Datetime(string='İşlenme Tarihi')
+    state = fields.Selection([
+        ('pending', 'Bekliyor'),
+        ('done', 'İşlendi'),
+        ('duplicate', 'Tekrar'),
+        ('invalid', 'Geçersiz İmza'),
+        ('failed', 'Başarısız'),
+    ], string='Durum', default='pending', required=True)
+    transaction_id = fields.Many2one('payment.transaction', string='Ödeme İşlemi', index=True,
+                                     ondelete='set null')
+    error = fields.Text(string='Hata')
+
+    def init(self):
+        # Cron ve kuyruk metrikleri yalnızca bekleyen kayıtları okur
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS turkey_pos_webhook_pending_idx
+                ON turkey_pos_webhook (received_at, id) WHERE state = 'pending'
+        """)
+
+    @api.model
+    def _accepts(self, provider_code):
+        """Webhook'u doğrulayabilecek etkin bir sağlayıcı var mı"""
+        return bool(self.env['payment.provider'].sudo().search_count([
+            ('code', '=', provider_code), ('state', '!=', 'disabled'), ('api_store_key', '!=', False),
+        ], limit=1))
+
+    @api.model
+    def _ingest(self, provider_code, payload, signature):
+        """Ham gövdeyi gelen kutusuna ekler; doğrulama ve işleme cron'dadır"""
+        self.env.cr.execute("""
+            INSERT INTO turkey_pos_webhook (provider_code, payload, signature, received_at, state)
+            VALUES (%s, %s, %s, now() at time zone 'UTC', 'pending')
+        """, [provider_code, payload, signature or None])
+
+    @api.model
+    def _claim_batch(self, limit=WEBHOOK_BATCH_SIZE):
+        self.env.cr.execute("""
+            SELECT id
+              FROM turkey_pos_webhook
+             WHERE state = 'pending'
+          ORDER BY received_at, id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """, [limit])
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    @api.model
+    def _cron_process_webhooks(self, limit=WEBHOOK_BATCH_SIZE):
+        """Bekleyen webhook'ları sağlayıcı bazında doğrular ve toplu uygular"""
+        webhooks = self._claim_batch(limit)
+        if not webhooks:
+            return 0
+
+        providers = {}
+        codes = set(webhooks.mapped('provider_code'))
+        for provider in self.env['payment.provider'].sudo().search([
+            ('code', 'in', list(codes)), ('state', '!=', 'disabled'),
+        ]):
+            providers.setdefault(provider.code, provider)
+
+        outcomes = {}
+        by_provider = defaultdict(lambda: self.browse())
+        for webhook in webhooks:
+            if webhook.provider_code in providers:
+                by_provider[webhook.provider_code] |= webhook
+            else:
+                outcomes[webhook.id] = ('failed', _('Sağlayıcı bulunamadı'), False)
+
+        for code, group in by_provider.items():
+            outcomes.update(self._process_provider_batch(providers[code], group))
+
+        now = fields.Datetime.now()
+        for webhook in webhooks:
+            state, error, transaction_id = outcomes[webhook.id]
+            metrics.WEBHOOK_PROCESSING_LAG.observe(
+                max((now - webhook.received_at).total_seconds(), 0.0), webhook.provider_code, state)
+            webhook.write({
+                'state': state,
+                'error': error or False,
+                'transaction_id': transaction_id,
+                'processed_at': now,
+            })
+
+        if len(webhooks) == limit:
+            self.env.ref('turkey_pos_payment.ir_cron_process_webhooks_turkey_pos')._trigger()
+        return len(webhooks)
+
+    @api.model
+    def _process_provider_batch(self, provider, webhooks):
+        """Tek sağlayıcının webhook'larını işler; ``{id: (durum, hata, işlem id)}`` döndürür"""
+        outcomes = {}
+        if not provider.api_store_key:
+            # Anahtarsız sağlayıcının webhook'u doğrulanamaz
+            return {webhook.id: ('invalid', _('Mağaza anahtarı tanımlı değil'), False) for webhook in webhooks}
+        _callbacks, valid = provider._verify_callbacks(
+            webhooks=[(webhook.payload or '', webhook.signature) for webhook in webhooks])
+
+        # Daha önce işlenmiş ya da bu partide tekrar eden gövdeler
+        hashes = {}
+        for webhook, signature_ok in zip(webhooks, valid):
+            if not signature_ok:
+                outcomes[webhook.id] = ('invalid', _('İmza doğrulanamadı'), False)
+                continue
+            payload_hash = hashlib.sha256(
+                ('%s\n%s' % (webhook.provider_code, webhook.payload or '')).encode('utf-8')).hexdigest()
+            webhook.payload_hash = payload_hash
+            hashes.setdefault(payload_hash, []).append(webhook)
+        if not hashes:
+            return outcomes
+        self.env.cr.execute("""
+            SELECT DISTINCT payload_hash
+              FROM turkey_pos_webhook
+             WHERE payload_hash IN %s AND state = 'done'
+        """, [tuple(hashes)])
+        seen = {row[0] for row in self.env.cr.fetchall()}
+
+        events = []
+        Transaction = self.env['payment.transaction'].sudo()
+        for payload_hash, group in hashes.items():
+            first, duplicates = group[0], group[1:]
+            if payload_hash in seen:
+                duplicates = group
+                first = None
+            for webhook in duplicates:
+                outcomes[webhook.id] = ('duplicate', False, False)
+            if first is None:
+                continue
+            try:
+                payload = json.loads(first.payload or '{}')
+            except ValueError as e:
+                outcomes[first.id] = ('failed', str(e), False)
+                continue
+            if not isinstance(payload, dict):
+                outcomes[first.id] = ('failed', _('Beklenmeyen gövde biçimi'), False)
+                continue
+            order_id = _first(payload, ORDER_ID_KEYS)
+            transaction = Transaction._find_by_pos_order_id(order_id, provider)
+            if not transaction:
+                outcomes[first.id] = ('failed', _('İşlem bulunamadı: %s') % order_id, False)
+                continue
+            events.append((first, transaction, payload))
+
+        history_vals = []
+        settled = self.env['payment.transaction']
+        for webhook, transaction, payload in events:
+            status = _first(payload, STATUS_KEYS)
+            success = status.lower() in SUCCESS_STATUSES
+            failure = status.lower() in FAILURE_STATUSES
+            if not success and not failure:
+                # Ara durum: işlem değiştirilmez, yalnızca tarihçeye yazılır
+                _logger.info('Webhook %s: intermediate status %r for %s ignored',
+                             webhook.id, status, transaction.reference)
+                history_vals.append({
+                    'transaction_id': transaction.id,
+                    'state': 'query',
+                    'message': _('Webhook: %s') % status,
+                })
+            elif transaction.state != 'done':
+                # Yetkilendirme bildirimi: 3D dönüşüyle aynı durum geçişi
+                transaction._process_notification_data(response_parsers.GatewayResult(
+                    success=success,
+                    code='00' if success else status,
+                    message=_first(payload, ('message', 'Message', 'errorMessage')),
+                    auth_code=_first(payload, AUTH_CODE_KEYS),
+                    transaction_id=_first(payload, TRANSACTION_ID_KEYS),
+                    order_id=transaction.pos_order_id,
+                    processed=True,
+                    raw=webhook.payload,
+                ))
+            elif success:
+                # Tamamlanmış işlem için mutabakat bildirimi
+                settled |= transaction
+                history_vals.append({
+                    'transaction_id': transaction.id,
+                    'state': 'captured',
+                    'message': _('Webhook: tahsilat bildirildi (%s)') % status,
+                })
+            else:
+                history_vals.append({
+                    'transaction_id': transaction.id,
+                    'state': 'query',
+                    'message': _('Webhook: %s') % status,
+                })
+            outcomes[webhook.id] = ('done', False, transaction.id)
+
+        if settled:
+            settled.filtered(lambda tx: tx.pos_state == 'authorized').write({'pos_state': 'captured'})
+        if history_vals:
+            self.env['payment.transaction.history'].sudo().create(history_vals)
+        return outcomes
+
+    @api.model
+    def _update_queue_metrics(self):
+        """Kuyruk derinliği ve en eski bekleyen kaydın yaşı göstergelerini günceller"""
+        self.env.cr.execute("""
+            SELECT provider_code, count(*),
+                   extract(epoch FROM (now() at time zone 'UTC') - min(received_at))
+              FROM turkey_pos_webhook
+             WHERE state = 'pending'
+          GROUP BY provider_code
+        """)
+        rows = self.env.cr.fetchall()
+        metrics.WEBHOOK_QUEUE_DEPTH.replace({(code,): count for code, count, _age in rows})
+        metrics.WEBHOOK_QUEUE_OLDEST_AGE.replace({(code,): age or 0.0 for code, _count, age in rows})
+
+    @api.autovacuum
+    def _gc_processed_webhooks(self):
+        """Eski işlenmiş webhook kayıtlarını temizler"""
+        cutoff = fields.Datetime.now() - timedelta(days=WEBHOOK_RETENTION_DAYS)
+        self.search([('state', '!=', 'pending'), ('received_at', '<', cutoff)]).unlink()
@@ -3,6 +3,8 @@
 import logging
 from odoo import api, fields, models, _
 
+from ..tools import installment_index, pricing
+
 _logger = logging.getLogger(__name__)
 
 
@@ -69,198 +71,159 @@ class ProductCategory(models.Model):
         if not self.allow_installments:
             return []
         
-        domain = [('category_id', '=', self.id), ('is_active', '=', True)]
-        if provider_id:
-            domain.append(('provider_id', '=', provider_id))
-        
-        category_installments = self.env['product.category.installment'].search(domain)
+        index = self.env['installment.option']._get_installment_index()
+        max_count = min(self.max_installment_count,
+                        self.env['res.config.settings']._get_pos_settings().max_installments(amount))
+        rules = [rule for rule in index.lookup(installment_index.CATEGORY, amount=amount, provider_id=provider_id,
+                                               category_id=self.id, max_count=max_count)
+                 if rule.option_active]
+        option_rules = {rule.option_id: index.get(installment_index.OPTION, rule.option_id) for rule in rules}
+        quotes = self.env['installment.option']._price_rules(
+            [option_rule for option_rule in option_rules.values() if option_rule], amount)
+        providers = self.env['payment.provider'].browse({rule.provider_id for rule in rules})
+        provider_names = {provider.id: provider.name for provider in providers}
         
         available_options = []
-        for ci in category_installments:
-            option = ci.installment_option_id
-            if option.is_active and option.installment_count <= self.max_installment_count:
-                if option.is_eligible(amount):
-                    available_options.append({
-                        'option_id': option.id,
-                        'provider_id': option.provider_id.id,
-                        'provider_name': option.provider_id.name,
-                        'installment_count': option.installment_count,
-                        'commission_rate': ci.custom_commission_rate or option.commission_rate,
-                        'amounts': option.calculate_installment_amount(amount),
-                    })
+        for rule in rules:
+            if rule.option_id not in quotes:
+                continue
+            available_options.append({
+                'option_id': rule.option_id,
+                'provider_id': rule.provider_id,
+                'provider_name': provider_names.get(rule.provider_id),
+                'installment_count': rule.installment_count,
+                'commission_rate': rule.commission_rate,
+                'amounts': quotes[rule.option_id],
+            })
         
         return sorted(available_options, key=lambda x: x['installment_count'])
 
     def get_installment_options(self, amount, provider_id=None, card_brand=None):
         """Bu kategori için uygun taksit seçeneklerini döndürür"""
         self.ensure_one()
-        
-        if not self.allow_installments:
+        return self._resolve_cart_installments(amount, provider_id)
+
+    def _resolve_cart_installments(self, amount, provider_id=None):
+        """Kategorilerin ortak taksit seçeneklerini tek geçişte çözer.
+
+        Her kategori için kampanya, banka ve genel tanımlar dizinden okunur;
+        aynı sağlayıcı ve taksit sayısında sonraki kaynak öncekini ezer. En
+        düşük ``max_installment_count`` ve en yüksek
+        ``min_amount_for_installment`` tüm sepete uygulanır. Yalnızca her
+        kategoride bulunan (sağlayıcı, taksit sayısı) çiftleri sunulur; her
+        çift için kategoriler arasında en pahalı tanım seçilir ve tümü tek
+        çağrıda fiyatlanır.
+
+        ``option_id`` genel tanımlarda bağlı seçenektir; banka ve kampanya
+        tanımlarında aynı sağlayıcının tutara uyan aynı sayıdaki seçeneğidir,
+        yoksa False olur.
+        """
+        if not self or not all(self.mapped('allow_installments')):
             return []
-        
-        if amount < self.min_amount_for_installment:
+        if amount < max(self.mapped('min_amount_for_installment')):
             return []
+        max_count = min(self.mapped('max_installment_count') + [
+            self.env['res.config.settings']._get_pos_settings().max_installments(amount)])
         
-        # Temel taksit seçeneklerini al
-        options = []
-        
-        # 1. Kampanya taksitlerini kontrol et
-        campaign_options = self._get_campaign_options(amount, provider_id, card_brand)
-        options.extend(campaign_options)
-        
-        # 2. Banka özel taksitleri kontrol et
-        bank_options = self._get_bank_options(amount, provider_id, card_brand)
-        options.extend(bank_options)
-        
-        # 3. Genel taksit seçeneklerini ekle
-        general_options = self._get_general_options(amount, provider_id)
-        options.extend(general_options)
-        
-        # Tekrarları kaldır ve sırala
-        unique_options = {opt['installment_count']: opt for opt in options}
-        sorted_options = sorted(unique_options.values(), key=lambda x: x['installment_count'])
-        
-        return sorted_options
-
-    def _get_campaign_options(self, amount, provider_id, card_brand):
-        """Kampanya taksitlerini döndürür"""
-        self.ensure_one()
-        
+        index = self.env['installment.option']._get_installment_index()
         today = fields.Date.today()
-        campaigns = self.campaign_installment_ids.filtered(
-            lambda c: c.is_active and 
-                      c.date_start <= today <= c.date_end and
-                      c.min_amount <= amount <= c.max_amount
-        )
-        
-        if provider_id:
-            campaigns = campaigns.filtered(lambda c: c.provider_id.id == provider_id)
-        
-        options = []
-        for campaign in campaigns:
-            amounts = self._calculate_installment_amounts(
-                amount, 
-                campaign.installment_count, 
-                campaign.commission_rate,
-                campaign.interest_rate
-            )
-            options.append({
-                'type': 'campaign',
-                'campaign_id': campaign.id,
-                'campaign_name': campaign.name,
-                'installment_count': campaign.installment_count,
-                'commission_rate': campaign.commission_rate,
-                'interest_rate': campaign.interest_rate,
-                'provider_id': campaign.provider_id.id,
-                'provider_name': campaign.provider_id.name,
-                'monthly_amount': amounts['monthly_amount'],
-                'total_amount': amounts['total_amount'],
-                'commission_amount': amounts['commission_amount'],
-                'label': campaign.display_name,
-            })
-        
-        return options
-
-    def _get_bank_options(self, amount, provider_id, card_brand):
-        """Banka özel taksitleri döndürür"""
-        self.ensure_one()
-        
-        domain = [('is_active', '=', True), ('min_amount', '<=', amount), ('max_amount', '>=', amount)]
-        if provider_id:
-            domain.append(('provider_id', '=', provider_id))
-        
-        bank_installments = self.bank_installment_ids.search(domain)
-        
-        options = []
-        for bi in bank_installments:
-            if bi.installment_count > self.max_installment_count:
+        available = None
+        for category in self:
+            by_key = {}
+            for source, kind, rule_amount, on_date in (
+                ('campaign', installment_index.CAMPAIGN, amount, today),
+                ('bank', installment_index.BANK, amount, None),
+                ('general', installment_index.CATEGORY, None, None),
+            ):
+                for rule in index.lookup(kind, amount=rule_amount, provider_id=provider_id, category_id=category.id,
+                                         max_count=max_count, on_date=on_date):
+                    by_key[rule.provider_id, rule.installment_count] = (source, rule)
+            if available is None:
+                available = by_key
                 continue
-            
-            amounts = self._calculate_installment_amounts(
-                amount,
-                bi.installment_count,
-                bi.commission_rate,
-                bi.interest_rate
-            )
-            options.append({
-                'type': 'bank',
-                'installment_count': bi.installment_count,
-                'commission_rate': bi.commission_rate,
-                'interest_rate': bi.interest_rate,
-                'provider_id': bi.provider_id.id,
-                'provider_name': bi.provider_id.name,
-                'monthly_amount': amounts['monthly_amount'],
-                'total_amount': amounts['total_amount'],
-                'commission_amount': amounts['commission_amount'],
-                'label': f"{bi.installment_count} Taksit - {bi.provider_id.name}",
-            })
-        
-        return options
-
-    def _get_general_options(self, amount, provider_id):
-        """Genel taksit seçeneklerini döndürür"""
-        self.ensure_one()
-        
-        # Kategori özel tanımları kontrol et
-        domain = [('category_id', '=', self.id), ('is_active', '=', True)]
-        if provider_id:
-            domain.append(('provider_id', '=', provider_id))
+            # Kesişim: her kategoride bulunan çiftler, vade farkı ve komisyonu yüksek tanımla
+            available = {
+                key: max(entry, by_key[key], key=lambda item: (
+                    (1 + item[1].interest_rate / 100) * (1 + item[1].commission_rate / 100)))
+                for key, entry in available.items() if key in by_key
+            }
         
-        category_installments = self.env['product.category.installment'].search(domain)
+        chosen = [available[key] for key in sorted(available, key=lambda key: (key[1], key[0]))]
+        rules = [rule for _source, rule in chosen]
+        prices = self._price_installment_rules(amount, rules)
+        option_ids = {}
+        for source, rule in chosen:
+            if source == 'general':
+                option_ids[rule.provider_id, rule.installment_count] = rule.option_id
+                continue
+            options = index.lookup(installment_index.OPTION, amount=amount, provider_id=rule.provider_id,
+                                   installment_count=rule.installment_count)
+            option_ids[rule.provider_id, rule.installment_count] = options[0].id if options else False
+        providers = self.env['payment.provider'].browse({rule.provider_id for rule in rules})
+        provider_names = {provider.id: provider.name for provider in providers}
+        campaigns = self.env['product.category.campaign'].browse(
+            [rule.id for source, rule in chosen if source == 'campaign'])
+        campaign_labels = {campaign.id: (campaign.name, campaign.display_name) for campaign in campaigns}
         
         options = []
-        for ci in category_installments:
-            if ci.installment_option_id.installment_count > self.max_installment_count:
-                continue
-            
-            commission_rate = ci.custom_commission_rate or ci.installment_option_id.commission_rate
-            
-            amounts = self._calculate_installment_amounts(
-                amount,
-                ci.installment_option_id.installment_count,
-                commission_rate,
-                ci.installment_option_id.interest_rate
-            )
-            options.append({
-                'type': 'general',
-                'installment_count': ci.installment_option_id.installment_count,
-                'commission_rate': commission_rate,
-                'interest_rate': ci.installment_option_id.interest_rate,
-                'provider_id': ci.provider_id.id,
-                'provider_name': ci.provider_id.name,
+        for (source, rule), amounts in zip(chosen, prices):
+            provider_name = provider_names.get(rule.provider_id)
+            option = {
+                'type': source,
+                'option_id': option_ids[rule.provider_id, rule.installment_count],
+                'installment_count': rule.installment_count,
+                'commission_rate': rule.commission_rate,
+                'interest_rate': rule.interest_rate,
+                'provider_id': rule.provider_id,
+                'provider_name': provider_name,
                 'monthly_amount': amounts['monthly_amount'],
                 'total_amount': amounts['total_amount'],
                 'commission_amount': amounts['commission_amount'],
-                'label': f"{ci.installment_option_id.installment_count} Taksit",
-            })
+                'amounts': {
+                    'installment_amount': amounts['monthly_amount'],
+                    'total_amount': amounts['total_amount'],
+                    'commission_amount': amounts['commission_amount'],
+                },
+                'label': f"{rule.installment_count} Taksit",
+            }
+            if source == 'campaign':
+                option.update({
+                    'campaign_id': rule.id,
+                    'campaign_name': campaign_labels[rule.id][0],
+                    'label': campaign_labels[rule.id][1],
+                })
+            elif source == 'bank':
+                option['label'] = f"{rule.installment_count} Taksit - {provider_name}"
+            options.append(option)
         
         return options
 
-    def _calculate_installment_amounts(self, amount, installment_count, commission_rate, interest_rate):
-        """Taksit tutarlarını hesaplar"""
-        # Vade farkı ekle
-        if interest_rate > 0:
-            amount_with_interest = amount * (1 + interest_rate / 100)
-        else:
-            amount_with_interest = amount
-        
-        # Komisyon ekle
-        commission_amount = amount_with_interest * (commission_rate / 100)
-        total_amount = amount_with_interest + commission_amount
-        
-        monthly_amount = total_amount / installment_count if installment_count > 0 else total_amount
-        
-        return {
-            'monthly_amount': round(monthly_amount, 2),
-            'total_amount': round(total_amount, 2),
-            'commission_amount': round(commission_amount, 2),
-        }
+    def _price_installment_rules(self, amount, rules):
+        """Dizin kurallarını tek geçişte fiyatlar.
+
+        Kategori tanımlarında tek çekime de vade farkı ve komisyon uygulanır.
+        """
+        quotes = pricing.RateTable(
+            (index, rule.installment_count, rule.interest_rate, rule.commission_rate, 0.0, 0.0)
+            for index, rule in enumerate(rules)
+        ).price([amount], charge_single=True)[0]
+        return [{
+            'monthly_amount': quotes[index][0],
+            'total_amount': quotes[index][1],
+            'commission_amount': quotes[index][2],
+        } for index in range(len(rules))]
 
 
 class ProductCategoryBankInstallment(models.Model):
     _name = 'product.category.bank.installment'
     _description = 'Kategori - Banka Taksit Tanımı'
     _order = 'sequence, installment_count'
+    _inherit = ['installment.rule.mixin']
+
+    _installment_index_fields = (
+        'category_id', 'provider_id', 'installment_count', 'commission_rate', 'interest_rate',
+        'min_amount', 'max_amount', 'is_active', 'sequence',
+    )
 
     category_id = fields.Many2one('product.category', string='Kategori', required=True, ondelete='cascade')
     provider_id = fields.Many2one('payment.provider', string='Ödeme Sağlayıcısı', required=True)
@@ -282,6 +245,12 @@ class ProductCategoryCampaign(models.Model):
     _name = 'product.category.campaign'
     _description = 'Kategori Kampanya Taksiti'
     _order = 'date_start desc'
+    _inherit = ['installment.rule.mixin']
+
+    _installment_index_fields = (
+        'category_id', 'provider_id', 'installment_count', 'commission_rate', 'interest_rate',
+        'min_amount', 'max_amount', 'date_start', 'date_end', 'card_brand_id', 'is_active',
+    )
 
     category_id = fields.Many2one('product.category', string='Kategori', required=True, ondelete='cascade')
     name = fields.Char(string='Kampanya Adı', required=True)
@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 
 import logging
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
+
+from ..tools import settings, warmup
 
 _logger = logging.getLogger(__name__)
 
@@ -18,61 +20,89 @@ class ResConfigSettings(models.TransientModel):
                                                                      'ziraat', 'halkbank', 'vakifbank',
                                                                      'vakifkatilim', 'yapikredi', 'finansbank',
                                                                      'denizbank', 'teb', 'sekerbank', 
-                                                                     'kuveytturk', 'param', 'tosla'])])
+                                                                     'kuveytturk', 'param', 'tosla'])],
+                                            config_parameter='turkey_pos_payment.default_pos_provider')
     
     # 3D Secure Ayarları
     pos_force_3d_secure = fields.Boolean(string='3D Secure Zorunlu', 
                                           config_parameter='turkey_pos_payment.force_3d_secure',
-                                          default=False)
+                                          default=settings.DEFAULTS['force_3d_secure'])
     pos_min_amount_3d = fields.Monetary(string='3D Secure Min. Tutar',
                                          config_parameter='turkey_pos_payment.min_amount_3d',
-                                         default=0.0, currency_field='currency_id')
+                                         default=settings.DEFAULTS['min_amount_3d'], currency_field='currency_id')
     
     # Taksit Ayarları
     pos_enable_installments = fields.Boolean(string='Taksit Seçeneklerini Aktif Et',
                                               config_parameter='turkey_pos_payment.enable_installments',
-                                              default=True)
+                                              default=settings.DEFAULTS['enable_installments'])
     pos_max_installment_count = fields.Integer(string='Maksimum Taksit Sayısı',
                                                 config_parameter='turkey_pos_payment.max_installment_count',
-                                                default=12)
+                                                default=settings.DEFAULTS['max_installment_count'])
     pos_min_amount_installment = fields.Monetary(string='Taksit İçin Min. Tutar',
                                                   config_parameter='turkey_pos_payment.min_amount_installment',
-                                                  default=100.0, currency_field='currency_id')
+                                                  default=settings.DEFAULTS['min_amount_installment'],
+                                                  currency_field='currency_id')
     
     # İade/İptal Ayarları
     pos_auto_refund = fields.Boolean(string='Otomatik İade',
                                       config_parameter='turkey_pos_payment.auto_refund',
-                                      default=False)
+                                      default=settings.DEFAULTS['auto_refund'])
     pos_refund_time_limit = fields.Integer(string='İade Süre Limiti (Gün)',
                                             config_parameter='turkey_pos_payment.refund_time_limit',
-                                            default=30)
+                                            default=settings.DEFAULTS['refund_time_limit'])
     
     # Güvenlik Ayarları
     pos_log_requests = fields.Boolean(string='API İsteklerini Logla',
                                        config_parameter='turkey_pos_payment.log_requests',
-                                       default=True)
+                                       default=settings.DEFAULTS['log_requests'])
     pos_timeout_seconds = fields.Integer(string='API Zaman Aşımı (Saniye)',
                                           config_parameter='turkey_pos_payment.timeout_seconds',
-                                          default=30)
+                                          default=settings.DEFAULTS['timeout_seconds'])
     pos_retry_count = fields.Integer(string='Tekrar Deneme Sayısı',
                                       config_parameter='turkey_pos_payment.retry_count',
-                                      default=3)
+                                      default=settings.DEFAULTS['retry_count'])
+    pos_cron_max_workers = fields.Integer(string='Toplu Sorgu Eşzamanlılığı',
+                                           config_parameter='turkey_pos_payment.cron_max_workers',
+                                           default=settings.DEFAULTS['cron_max_workers'])
+    pos_hide_open_circuit = fields.Boolean(string='Yanıt Vermeyen Bankaları Gizle',
+                                            config_parameter='turkey_pos_payment.hide_open_circuit',
+                                            default=settings.DEFAULTS['hide_open_circuit'])
+    pos_warmup_mode = fields.Selection(warmup.MODES, string='Önbellek Isınması',
+                                        config_parameter='turkey_pos_payment.warmup_mode',
+                                        default=settings.DEFAULTS['warmup_mode'])
+    pos_metrics_token = fields.Char(string='Metrik Erişim Anahtarı',
+                                     config_parameter='turkey_pos_payment.metrics_token',
+                                     groups='base.group_system')
     
     # Bildirim Ayarları
     pos_notify_success = fields.Boolean(string='Başarılı Ödeme Bildirimi',
                                          config_parameter='turkey_pos_payment.notify_success',
-                                         default=True)
+                                         default=settings.DEFAULTS['notify_success'])
     pos_notify_failure = fields.Boolean(string='Başarısız Ödeme Bildirimi',
                                          config_parameter='turkey_pos_payment.notify_failure',
-                                         default=True)
+                                         default=settings.DEFAULTS['notify_failure'])
     pos_notify_refund = fields.Boolean(string='İade Bildirimi',
                                         config_parameter='turkey_pos_payment.notify_refund',
-                                        default=True)
+                                        default=settings.DEFAULTS['notify_refund'])
     
     # Para Birimi
     currency_id = fields.Many2one('res.currency', string='Para Birimi',
                                    default=lambda self: self.env.company.currency_id)
     
+    # ==================== AYAR ERİŞİMİ ====================
+
+    @api.model
+    @tools.ormcache()
+    def _get_pos_settings(self):
+        """Tipli ``settings.PosSettings``; parametre değişince tüm worker'larda yenilenir"""
+        self.env['ir.config_parameter'].flush_model(['key', 'value'])
+        self.env.cr.execute("""
+            SELECT key, value
+              FROM ir_config_parameter
+             WHERE key LIKE %s
+        """, [settings.PREFIX + '%'])
+        return settings.PosSettings(dict(self.env.cr.fetchall()))
+
     # ==================== HESAPLAMA METOTLARI ====================
     
     @api.onchange('pos_max_installment_count')
@@ -13,24 +13,66 @@ class SaleOrder(models.Model):
     installment_option_id = fields.Many2one('installment.option', string='Seçilen Taksit')
     installment_count = fields.Integer(related='installment_option_id.installment_count', 
                                         string='Taksit Sayısı', store=True)
-    installment_amount = fields.Monetary(string='Taksit Tutarı', compute='_compute_installment_amount', currency_field='currency_id')
-    commission_amount = fields.Monetary(string='Komisyon Tutarı', compute='_compute_installment_amount', currency_field='currency_id')
+    installment_amount = fields.Monetary(string='Taksit Tutarı', compute='_compute_installment_amount', store=True, currency_field='currency_id')
+    commission_amount = fields.Monetary(string='Komisyon Tutarı', compute='_compute_installment_amount', store=True, currency_field='currency_id')
+
+    # Sepet taksit seçeneklerinin anlık görüntüsü; anahtar eşleştiği sürece yeniden hesaplanmaz
+    installment_quote = fields.Json(string='Taksit Teklifi', compute='_compute_installment_quote',
+                                    store=True, readonly=False, copy=False)
+    installment_quote_key = fields.Char(string='Taksit Teklifi Anahtarı', compute='_compute_installment_quote',
+                                        store=True, readonly=False, copy=False)
 
     # ==================== HESAPLAMA METOTLARI ====================
     
-    @api.depends('amount_total', 'installment_option_id')
+    @api.depends('amount_total', 'installment_option_id', 'installment_option_id.installment_count',
+                 'installment_option_id.interest_rate', 'installment_option_id.commission_rate')
     def _compute_installment_amount(self):
-        for order in self:
+        # Tüm siparişler ve seçenekler tek geçişte fiyatlanır
+        quotes = self.installment_option_id._price_amounts(self.mapped('amount_total'))
+        for order, order_quotes in zip(self, quotes):
             if order.installment_option_id and order.amount_total > 0:
-                amounts = order.installment_option_id.calculate_installment_amount(order.amount_total)
+                amounts = order_quotes[order.installment_option_id.id]
                 order.installment_amount = amounts['installment_amount']
                 order.commission_amount = amounts['commission_amount']
             else:
                 order.installment_amount = order.amount_total
                 order.commission_amount = 0.0
 
+    @api.depends('order_line.product_id', 'order_line.product_uom_qty', 'amount_total')
+    def _compute_installment_quote(self):
+        # Satırlar değişince görüntü silinir; ilk istekte yeniden oluşturulur
+        for order in self:
+            order.installment_quote = False
+            order.installment_quote_key = False
+
     # ==================== İŞ METOTLARI ====================
     
+    def _get_installment_quote_key(self):
+        """Tutar, kategori kümesi ve taksit ayarları, genel taksit sınırı, kural dizini sürümü ve gün"""
+        self.ensure_one()
+        categories = self.order_line.mapped('product_id.categ_id').sorted('id')
+        amount = self.currency_id.round(self.amount_total)
+        return '%s|%s|%s|%s|%s' % (
+            amount,
+            ','.join('%s:%d:%s:%s' % (
+                category.id, category.allow_installments, category.max_installment_count,
+                category.min_amount_for_installment,
+            ) for category in categories),
+            self.env['res.config.settings']._get_pos_settings().max_installments(amount),
+            self.env['installment.option']._get_installment_index().version,
+            fields.Date.context_today(self),
+        )
+
+    def _get_installment_quote(self):
+        """Saklanan taksit seçeneklerini döndürür; anahtar değiştiyse yeniden çözüp saklar"""
+        self.ensure_one()
+        key = self._get_installment_quote_key()
+        if self.installment_quote_key == key:
+            return self.installment_quote or []
+        quote = self.get_category_based_installments()
+        self.sudo().write({'installment_quote': quote, 'installment_quote_key': key})
+        return quote
+
     def get_category_based_installments(self, provider_id=None):
         """Siparişteki ürünlere göre taksit seçeneklerini döndürür"""
         self.ensure_one()
@@ -41,7 +83,5 @@ class SaleOrder(models.Model):
         if not categories:
             return []
         
-        # En kısıtlayıcı kategoriyi bul (en düşük max_installment_count)
-        restrictive_category = min(categories, key=lambda c: c.max_installment_count)
-        
-        return restrictive_category.get_available_installments(self.amount_total, provider_id)
+        # Tüm kategoriler birlikte çözülür; en kısıtlayıcı sınırlar sepete uygulanır
+        return categories._resolve_cart_installments(self.amount_total, provider_id)
@@ -6,22 +6,6 @@ odoo.define('turkey_pos_payment.installment_calculator', function (require) {
     const core = require('web.core');
     const _t = core._t;
 
-    // Kart BIN numarasına göre banka tespiti
-    const CARD_BIN_RANGES = {
-        'akbank': ['454671', '454672', '413252', '520932'],
-        'garanti': ['514915', '540036', '540037', '541865'],
-        'isbank': ['450803', '540667', '540668', '541078'],
-        'ziraat': ['454671', '540130', '541865'],
-        'halkbank': ['522241', '540435', '543081'],
-        'vakifbank': ['411724', '411726', '425669'],
-        'yapikredi': ['545103', '545616', '547564'],
-        'finansbank': ['525312', '540963', '542404'],
-        'denizbank': ['552096', '554567', '676366'],
-        'teb': ['450918', '540638', '543738'],
-        'sekerbank': ['402275', '402276', '403814'],
-        'kuveytturk': ['402589', '402590', '410555'],
-    };
-
     // Kart markası tespiti
     function detectCardBrand(cardNumber) {
         const patterns = {
@@ -39,23 +23,37 @@ odoo.define('turkey_pos_payment.installment_calculator', function (require) {
         return 'unknown';
     }
 
-    // Kart numarasından banka tespiti
-    function detectBankFromCard(cardNumber) {
-        const bin = cardNumber.replace(/\s/g, '').substring(0, 6);
-        
-        for (const [bank, bins] of Object.entries(CARD_BIN_RANGES)) {
-            if (bins.includes(bin)) {
-                return bank;
-            }
-        }
-        return null;
-    }
-
     // Kart numarası formatlama
     function formatCardNumber(value) {
         return value.replace(/\s/g, '').replace(/(\d{4})(?=\d)/g, '$1 ').trim();
     }
 
+    // Sağlayıcılar × taksitler × tutarlar matrisini tek istekte al
+    function fetchInstallmentMatrix(amounts, bin, installmentCount) {
+        return ajax.jsonRpc('/payment/turkey_pos/installment_matrix', 'call', {
+            'amounts': amounts,
+            'bin_number': bin || null,
+            'installment_count': installmentCount || 1,
+        });
+    }
+
+    // Matristen bir sağlayıcının bir tutar için taksit listesini çıkar
+    function matrixOptions(matrix, provider, amountIndex) {
+        var options = [];
+        (provider.cells[amountIndex || 0] || []).forEach(function (cell, position) {
+            if (cell) {
+                options.push({
+                    installment_count: matrix.counts[position],
+                    monthly_amount: cell[0],
+                    total_amount: cell[1],
+                    commission_amount: cell[2],
+                    commission_rate: cell[3],
+                });
+            }
+        });
+        return options;
+    }
+
     // Ürün sayfası taksit widget'ı
     publicWidget.registry.ProductInstallments = publicWidget.Widget.extend({
         selector: '#product_installments_section',
@@ -95,66 +93,52 @@ odoo.define('turkey_pos_payment.installment_calculator', function (require) {
 
         _onCardNumberChange: function (cardNumber) {
             var self = this;
-            var bank = detectBankFromCard(cardNumber);
+            var bin = cardNumber.substring(0, 6);
             var brand = detectCardBrand(cardNumber);
             
-            // Kart bilgisi göster
-            var cardInfo = '';
-            if (brand !== 'unknown') {
-                cardInfo += '<span class="badge badge-info mr-2">' + brand.toUpperCase() + '</span>';
-            }
-            
-            if (bank) {
-                cardInfo += '<span class="badge badge-success">' + bank.toUpperCase() + '</span>';
-                this.$('#installment-info').hide();
-                this._loadBankInstallments(bank, this.productPrice);
-            } else {
-                cardInfo += '<span class="badge badge-warning">Tanımlanamayan Banka</span>';
-                this.$('#installment-info').html(
-                    'Bu kart için taksit seçeneği bulunamadı. <strong>Varsayılan banka</strong> ile tek çekim ödeme yapabilirsiniz.'
-                ).show();
-                this._loadDefaultInstallments(this.productPrice);
+            // Aynı BIN için tekrar istek atma
+            if (bin === this.loadedBin) {
+                return;
             }
+            this.loadedBin = bin;
             
-            this.$('#installment-card-info').html(cardInfo);
-        },
-
-        _loadInstallments: function () {
-            this.$('#installment-loading').hide();
-            this.$('#installment-content').show();
-        },
-
-        _loadBankInstallments: function (bankCode, amount) {
-            var self = this;
-            
-            ajax.jsonRpc('/payment/turkey_pos/get_product_installments', 'call', {
-                'bank_code': bankCode,
-                'amount': amount,
-                'product_id': this.productId
-            }).then(function (result) {
-                if (result.success) {
-                    self._renderInstallmentTable(result.installments, amount);
+            fetchInstallmentMatrix([this.productPrice], bin).then(function (matrix) {
+                if (!matrix.success || !matrix.providers.length) {
+                    return;
+                }
+                // Kartı çıkaran banka varsa onun taksitleri, yoksa önerilen ilk banka
+                var provider = matrix.providers.find(function (p) {
+                    return matrix.issuer && p.code === matrix.issuer;
+                });
+                var isDefault = !provider;
+                provider = provider || matrix.providers[0];
+                
+                // Kart bilgisi göster
+                var cardInfo = '';
+                if (brand !== 'unknown') {
+                    cardInfo += '<span class="badge badge-info mr-2">' + brand.toUpperCase() + '</span>';
+                }
+                if (isDefault) {
+                    cardInfo += '<span class="badge badge-warning">Tanımlanamayan Banka</span>';
+                    self.$('#installment-info').html(
+                        'Bu kart için taksit seçeneği bulunamadı. <strong>Varsayılan banka</strong> ile tek çekim ödeme yapabilirsiniz.'
+                    ).show();
                 } else {
-                    self._loadDefaultInstallments(amount);
+                    cardInfo += '<span class="badge badge-success">' + provider.code.toUpperCase() + '</span>';
+                    self.$('#installment-info').hide();
                 }
-            }).catch(function () {
-                self._loadDefaultInstallments(amount);
+                self.$('#installment-card-info').html(cardInfo);
+                self._renderInstallmentTable(matrixOptions(matrix, provider), self.productPrice, isDefault);
             });
         },
 
-        _loadDefaultInstallments: function (amount) {
-            var self = this;
-            
-            ajax.jsonRpc('/payment/turkey_pos/get_default_installments', 'call', {
-                'amount': amount
-            }).then(function (result) {
-                if (result.success) {
-                    self._renderInstallmentTable(result.installments, amount, true);
-                }
-            });
+        _loadInstallments: function () {
+            this.$('#installment-loading').hide();
+            this.$('#installment-content').show();
         },
 
         _renderInstallmentTable: function (installments, amount, isDefault) {
+            var self = this;
             var html = '<table class="table table-bordered table-striped">';
             html += '<thead><tr>';
             html += '<th>Taksit</th>';
@@ -177,7 +161,7 @@ odoo.define('turkey_pos_payment.installment_calculator', function (require) {
             if (installments && installments.length > 0) {
                 installments.forEach(function (inst) {
                     html += '<tr>';
-                    html += '<td>' + inst.count + ' Taksit</td>';
+                    html += '<td>' + inst.installment_count + ' Taksit</td>';
                     html += '<td>' + self._formatCurrency(inst.monthly_amount) + '</td>';
                     html += '<td>' + self._formatCurrency(inst.total_amount) + '</td>';
                     if (!isDefault) html += '<td>%' + inst.commission_rate + '</td>';
@@ -245,7 +229,7 @@ odoo.define('turkey_pos_payment.installment_calculator', function (require) {
             this.$el.on('change', '#pos-bank-selection', function (ev) {
                 var providerId = $(this).val();
                 if (providerId) {
-                    self._loadInstallmentOptions(providerId);
+                    self._showInstallmentOptions(providerId);
                 } else {
                     self.$('#pos-installment-group').hide();
                 }
@@ -289,8 +273,8 @@ odoo.define('turkey_pos_payment.installment_calculator', function (require) {
         },
 
         _onCardNumberChange: function (cardNumber) {
-            var bank = detectBankFromCard(cardNumber);
             var brand = detectCardBrand(cardNumber);
+            var bin = cardNumber.substring(0, 6);
             
             // Kart markası göster
             var brandHtml = '';
@@ -299,43 +283,66 @@ odoo.define('turkey_pos_payment.installment_calculator', function (require) {
             }
             this.$('#pos-card-brand').html(brandHtml);
             
-            // Banka otomatik seç
-            if (bank) {
-                var $option = this.$('#pos-bank-selection option[data-code="' + bank + '"]');
-                if ($option.length) {
-                    this.$('#pos-bank-selection').val($option.val()).trigger('change');
-                } else {
-                    // Banka bulunamadı, varsayılanı seç
-                    this._selectDefaultBank();
-                }
+            // Aynı BIN için tekrar yönlendirme isteme
+            if (bin === this.routedBin) {
+                return;
             }
+            this.routedBin = bin;
+            this._routeProviders(bin);
         },
 
-        _selectDefaultBank: function () {
+        _routeProviders: function (bin) {
             var self = this;
-            ajax.jsonRpc('/payment/turkey_pos/get_default_provider', 'call', {}).then(function (result) {
-                if (result.provider_id) {
-                    self.$('#pos-bank-selection').val(result.provider_id).trigger('change');
+            // Tek istek: önerilen sağlayıcı sırası ve tüm sağlayıcıların taksitleri;
+            // tam kart numarası gönderilmez
+            fetchInstallmentMatrix([this.cartTotal], bin, this.selectedInstallment).then(function (matrix) {
+                if (!matrix.success || !matrix.providers.length) {
+                    return;
+                }
+                self.matrix = matrix;
+                var $select = self.$('#pos-bank-selection');
+                var ranked = matrix.providers.map(function (provider) {
+                    return String(provider.id);
+                });
+                // Önerilen sağlayıcılar "Banka Seçiniz"in hemen ardından sırayla, diğerleri sonda
+                ranked.forEach(function (providerId) {
+                    $select.append($select.find('option[value="' + providerId + '"]'));
+                });
+                $select.find('option').filter(function () {
+                    return this.value && ranked.indexOf(this.value) === -1;
+                }).appendTo($select);
+                if (String($select.val()) !== ranked[0]) {
+                    $select.val(ranked[0]).trigger('change');
+                } else {
+                    self._showInstallmentOptions(ranked[0]);
                 }
             });
         },
 
-        _loadInstallmentOptions: function (providerId) {
+        _showInstallmentOptions: function (providerId, refetched) {
             var self = this;
-            
-            ajax.jsonRpc('/payment/turkey_pos/installment_options', 'call', {
-                'provider_id': providerId,
-                'amount': this.cartTotal
-            }).then(function (result) {
-                if (result.success && result.options) {
-                    self._renderInstallmentOptions(result.options);
-                    self.$('#pos-installment-group').show();
-                } else {
-                    // Taksit seçeneği yok, sadece tek çekim
-                    self.$('#pos-installment-count').html('<option value="1">Tek Çekim</option>');
-                    self.$('#pos-installment-group').show();
-                }
+            var provider = this.matrix && this.matrix.providers.find(function (p) {
+                return String(p.id) === String(providerId);
             });
+            if (!provider && !refetched) {
+                // Kart girilmeden banka seçildi: matrisi BIN olmadan bir kez al
+                fetchInstallmentMatrix([this.cartTotal]).then(function (matrix) {
+                    if (matrix.success) {
+                        self.matrix = matrix;
+                    }
+                    self._showInstallmentOptions(providerId, true);
+                });
+                return;
+            }
+            // Yeniden alınan matriste de sağlayıcı yoksa tek çekim sunulur
+            var options = provider ? matrixOptions(this.matrix, provider) : [];
+            if (options.length) {
+                this._renderInstallmentOptions(options);
+            } else {
+                // Taksit seçeneği yok, sadece tek çekim
+                this.$('#pos-installment-count').html('<option value="1">Tek Çekim</option>');
+            }
+            this.$('#pos-installment-group').show();
         },
 
         _renderInstallmentOptions: function (options) {
@@ -383,7 +390,6 @@ odoo.define('turkey_pos_payment.installment_calculator', function (require) {
 
     return {
         detectCardBrand: detectCardBrand,
-        detectBankFromCard: detectBankFromCard,
         formatCardNumber: formatCardNumber
     };
 });
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""Arka ofis işlemleri için asyncio tabanlı toplu banka istemcisi.
+
+İstekler ORM'den önceden hazırlanır (``BankCall``); ağ aşaması veritabanı
+imlecine dokunmadan bir olay döngüsünde çalışır. Toplam eşzamanlılık ve
+sağlayıcı başına eşzamanlılık semaforlarla sınırlanır. ``aiohttp`` kuruluysa
+çağrılar doğrudan döngüde yapılır; kurulu değilse ``Transport.send``
+``asyncio.to_thread`` ile çalıştırılır. Her iki yolda da devre kesici ve
+yeniden deneme politikası uygulanır.
+
+Senkron kod ``run`` ile çağırır::
+
+    results = async_gateway.run(calls, max_concurrency=50, limits={provider_id: 10})
+    text, duration, error = results[task_id]
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import circuit_breaker, retry
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 50
+
+
+class BankCall(object):
+    """Tek bir hazırlanmış banka isteği"""
+
+    __slots__ = ('key', 'task_id', 'transport', 'data', 'headers', 'operation')
+
+    def __init__(self, key, task_id, transport, data, headers=None, operation=None):
+        self.key = key
+        self.task_id = task_id
+        self.transport = transport
+        self.data = data
+        self.headers = headers
+        self.operation = operation
+
+
+class _HTTPStatusError(Exception):
+
+    def __init__(self, status):
+        super(_HTTPStatusError, self).__init__('HTTP %s' % status)
+        self.status = status
+
+
+def _classify(error):
+    """``retry.classify`` karşılığı: 'not_sent', 'ambiguous' veya 'fatal'"""
+    if isinstance(error, _HTTPStatusError):
+        if error.status in retry.NOT_PROCESSED_STATUS_CODES:
+            return 'not_sent'
+        if error.status in retry.AMBIGUOUS_STATUS_CODES:
+            return 'ambiguous'
+        return 'fatal'
+    if isinstance(error, aiohttp.ClientConnectorError):
+        return 'not_sent'
+    if isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError)):
+        return 'ambiguous'
+    return 'fatal'
+
+
+async def _post(session, call, timeout):
+    breaker = call.transport.breaker
+    if not breaker.allow():
+        raise circuit_breaker.CircuitOpenError()
+    started = time.monotonic()
+    try:
+        async with session.post(call.transport.url, data=call.data, headers=call.headers, timeout=timeout) as response:
+            text = await response.text()
+            if response.status >= 400:
+                raise _HTTPStatusError(response.status)
+    except (aiohttp.ClientError, asyncio.TimeoutError, _HTTPStatusError) as e:
+        breaker.record(_classify(e) == 'fatal', time.monotonic() - started)
+        raise
+    except BaseException:
+        # İptal (CancelledError) ve beklenmeyen hatalar deneme hakkını tutmasın
+        breaker.release()
+        raise
+    breaker.record(True, time.monotonic() - started)
+    return text
+
+
+async def _send_aiohttp(session, call):
+    """``retry.call`` ile aynı kurallar; belirsiz sonuçlar yalnızca güvenli işlemlerde tekrar denenir"""
+    policy = call.transport.policy
+    idempotent = retry.is_idempotent(call.operation)
+    deadline = time.monotonic() + policy.deadline
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise retry.GatewayError('Deadline of %ss exceeded for %s' % (policy.deadline, call.operation))
+        timeout = aiohttp.ClientTimeout(total=remaining, connect=min(policy.connect_timeout, remaining),
+                                        sock_read=min(policy.read_timeout, remaining))
+        try:
+            return await _post(session, call, timeout)
+        except (aiohttp.ClientError, asyncio.TimeoutError, _HTTPStatusError) as error:
+            kind = _classify(error)
+            if kind == 'fatal' or attempt >= policy.retries or (kind == 'ambiguous' and not idempotent):
+                raise retry.GatewayError(str(error) or type(error).__name__) from error
+            delay = policy.backoff(attempt)
+            if time.monotonic() + delay >= deadline:
+                raise retry.GatewayError(str(error) or type(error).__name__) from error
+            _logger.warning('%s attempt %s failed (%s), retrying in %.2fs', call.operation, attempt + 1, error, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+async def _run_all(calls, max_concurrency, limits, default_limit):
+    overall = asyncio.Semaphore(max_concurrency)
+    semaphores = {}
+    for call in calls:
+        if call.key not in semaphores:
+            semaphores[call.key] = asyncio.Semaphore(max(limits.get(call.key) or default_limit, 1))
+
+    session = None
+    if aiohttp is not None:
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=max_concurrency))
+    else:
+        # Yedek yol: iş parçacığı sayısı eşzamanlılık sınırını izler
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='turkey_pos'))
+
+    async def execute(call):
+        async with semaphores[call.key], overall:
+            started = time.monotonic()
+            try:
+                if session is not None:
+                    text = await _send_aiohttp(session, call)
+                else:
+                    text = await asyncio.to_thread(
+                        call.transport.send, call.data, headers=call.headers, operation=call.operation)
+                return call.task_id, (text, time.monotonic() - started, None)
+            except Exception as e:
+                return call.task_id, (None, time.monotonic() - started, e)
+
+    try:
+        return dict(await asyncio.gather(*(execute(call) for call in calls)))
+    finally:
+        if session is not None:
+            await session.close()
+
+
+def run(calls, max_concurrency=DEFAULT_MAX_CONCURRENCY, limits=None, default_limit=1):
+    """``BankCall`` listesini çalıştırır.
+
+    ``{task_id: (yanıt metni, süre, hata)}`` döndürür; hiçbir çağrı
+    istisna yükseltmez. Çalışan bir olay döngüsü içinden çağrılmamalıdır.
+    """
+    calls = list(calls)
+    if not calls:
+        return {}
+    return asyncio.run(_run_all(calls, max(int(max_concurrency or 1), 1), limits or {}, default_limit))
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""Sağlayıcı ve gateway tipi bazında devre kesici (circuit breaker).
+
+Bir bankanın uç noktası bozulduğunda her çağrının tam zaman aşımını
+beklemesini önler. Kayan pencerede hata oranı veya yavaş çağrı oranı eşiği
+aştığında devre açılır ve çağrılar beklemeden reddedilir. Açık kalma süresi
+dolunca sınırlı sayıda deneme isteğine izin verilir (yarı açık); deneme
+başarılıysa devre kapanır, değilse yeniden açılır.
+
+Durum worker başına bellekte tutulur.
+"""
+
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+STATES = [
+    (CLOSED, 'Kapalı (Sağlıklı)'),
+    (HALF_OPEN, 'Yarı Açık (Deneniyor)'),
+    (OPEN, 'Açık (Devre Dışı)'),
+]
+
+WINDOW_SECONDS = 60.0
+MIN_CALLS = 10
+ERROR_RATE_THRESHOLD = 0.5
+SLOW_CALL_SECONDS = 10.0
+SLOW_RATE_THRESHOLD = 0.8
+OPEN_SECONDS = 30.0
+HALF_OPEN_MAX_CALLS = 1
+
+_breakers = {}
+_lock = threading.Lock()
+
+
+class CircuitOpenError(Exception):
+    """Devre açıkken yapılan çağrılarda yükseltilir"""
+
+
+class CircuitBreaker(object):
+
+    def __init__(self):
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._calls = deque()
+        self._trials = 0
+        self._lock = threading.Lock()
+
+    def _prune(self, now):
+        while self._calls and now - self._calls[0][0] > WINDOW_SECONDS:
+            self._calls.popleft()
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self._trials = 0
+
+    def allow(self):
+        """Çağrıya izin verilip verilmediğini döndürür"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                if now - self.opened_at < OPEN_SECONDS:
+                    return False
+                self.state = HALF_OPEN
+                self._trials = 0
+            if self.state == HALF_OPEN:
+                if self._trials >= HALF_OPEN_MAX_CALLS:
+                    return False
+                self._trials += 1
+            return True
+
+    def release(self):
+        """Sonucu kaydedilmeyen çağrının yarı açık deneme hakkını geri verir.
+
+        Beklenmeyen hata veya iptal ile biten deneme ``record`` çağırmaz;
+        hakkı geri verilmezse devre yarı açıkta kalıp her çağrıyı reddeder.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self._trials > 0:
+                self._trials -= 1
+
+    def record(self, success, duration):
+        """Çağrı sonucunu kaydeder ve devre durumunu günceller"""
+        with self._lock:
+            now = time.monotonic()
+            slow = duration >= SLOW_CALL_SECONDS
+            if self.state == HALF_OPEN:
+                if success and not slow:
+                    self.state = CLOSED
+                    self._calls.clear()
+                else:
+                    self._open(now)
+                return
+            self._calls.append((now, success, duration))
+            self._prune(now)
+            if self.state == CLOSED and len(self._calls) >= MIN_CALLS:
+                error_rate, slow_rate, _latency = self._rates()
+                if error_rate >= ERROR_RATE_THRESHOLD or slow_rate >= SLOW_RATE_THRESHOLD:
+                    self._open(now)
+
+    def _rates(self):
+        total = len(self._calls)
+        if not total:
+            return 0.0, 0.0, 0.0
+        errors = sum(1 for _ts, success, _d in self._calls if not success)
+        slow = sum(1 for _ts, _s, duration in self._calls if duration >= SLOW_CALL_SECONDS)
+        latency = sum(duration for _ts, _s, duration in self._calls) / total
+        return errors / total, slow / total, latency
+
+    def snapshot(self):
+        """Görüntüleme için durum, hata oranı ve ortalama gecikmeyi döndürür"""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            state = self.state
+            if state == OPEN and now - self.opened_at >= OPEN_SECONDS:
+                state = HALF_OPEN
+            error_rate, _slow_rate, latency = self._rates()
+            return {
+                'state': state,
+                'error_rate': error_rate,
+                'avg_latency': latency,
+                'calls': len(self._calls),
+            }
+
+
+def get_breaker(key):
+    breaker = _breakers.get(key)
+    if breaker is None:
+        with _lock:
+            breaker = _breakers.setdefault(key, CircuitBreaker())
+    return breaker
+
+
+def peek_breaker(key):
+    """Anahtar için oluşturulmuş devre kesiciyi döndürür, yoksa None"""
+    return _breakers.get(key)
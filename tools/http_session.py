@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Banka API çağrıları için worker başına kalıcı (keep-alive) HTTP oturum havuzu.
+
+Her sağlayıcı/ortam çifti için tek bir ``requests.Session`` tutulur. Böylece
+aynı bankaya giden iade, iptal, sorgulama ve non-secure ödeme istekleri TCP
+bağlantısını ve TLS oturumunu yeniden kullanır. Sağlayıcının URL veya kimlik
+bilgileri değiştiğinde parmak izi değişir ve oturum yeniden kurulur.
+"""
+
+import hashlib
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_logger = logging.getLogger(__name__)
+
+# Havuz sınırları: worker başına bir sağlayıcı için açık tutulacak bağlantılar
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 10
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def fingerprint(*values):
+    """Oturumu etkileyen alanlardan kısa bir parmak izi üretir"""
+    digest = hashlib.sha256()
+    for value in values:
+        digest.update(str(value or '').encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def _build_session(pool_maxsize):
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=pool_maxsize,
+        pool_block=True,
+        max_retries=0,
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(key, print_, pool_maxsize=POOL_MAXSIZE):
+    """Anahtar için havuzdaki oturumu döndürür, parmak izi değiştiyse yeniler"""
+    entry = _sessions.get(key)
+    if entry and entry[0] == print_:
+        return entry[1]
+    with _lock:
+        entry = _sessions.get(key)
+        if entry and entry[0] == print_:
+            return entry[1]
+        session = _build_session(pool_maxsize)
+        _sessions[key] = (print_, session)
+    if entry:
+        _logger.info('HTTP session for %s rebuilt after configuration change', key)
+        entry[1].close()
+    return session
+
+
+def drop_session(key):
+    """Anahtara ait oturumu kapatır ve havuzdan çıkarır"""
+    with _lock:
+        entry = _sessions.pop(key, None)
+    if entry:
+        entry[1].close()
+
+
+def drop_sessions(predicate):
+    """Koşulu sağlayan tüm oturumları kapatır"""
+    with _lock:
+        keys = [key for key in _sessions if predicate(key)]
+        entries = [_sessions.pop(key) for key in keys]
+    for _print, session in entries:
+        session.close()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Taksit kurallarının worker içi dizini.
+
+``installment.option``, ``product.category.installment``,
+``product.category.bank.installment`` ve ``product.category.campaign``
+kayıtları tek seferde okunup (tür, kategori, sağlayıcı) kovalarına ayrılır.
+Her kova en az tutara göre sıralıdır; tutar sorgusu ``bisect`` ile en az
+tutarı uyan adayları bulur, en çok tutarı ve tarihi bellekte süzer. Sonuçlar
+kayıtların veritabanındaki sırasıyla döner.
+
+``version`` kuralların içeriğinden üretilen özettir; dizinden türetilip
+saklanan sonuçlar bu değerle eşleştirilir.
+"""
+
+import hashlib
+from bisect import bisect_right
+
+OPTION = 'option'
+CATEGORY = 'category'
+BANK = 'bank'
+CAMPAIGN = 'campaign'
+
+
+class Rule(object):
+
+    __slots__ = ('id', 'kind', 'position', 'provider_id', 'category_id', 'option_id', 'installment_count',
+                 'interest_rate', 'commission_rate', 'min_amount', 'max_amount', 'option_active',
+                 'date_start', 'date_end', 'card_brand_id')
+
+    def __init__(self, kind, id, provider_id, installment_count, interest_rate, commission_rate,
+                 min_amount, max_amount, category_id=None, option_id=None, option_active=True,
+                 date_start=None, date_end=None, card_brand_id=None):
+        self.kind = kind
+        self.id = id
+        self.position = 0
+        self.provider_id = provider_id
+        self.category_id = category_id
+        self.option_id = option_id or (id if kind == OPTION else None)
+        self.installment_count = installment_count or 0
+        self.interest_rate = interest_rate or 0.0
+        self.commission_rate = commission_rate or 0.0
+        self.min_amount = min_amount or 0.0
+        self.max_amount = max_amount or 0.0
+        self.option_active = option_active
+        self.date_start = date_start
+        self.date_end = date_end
+        self.card_brand_id = card_brand_id
+
+    def rate_row(self):
+        """``pricing.RateTable`` satırı"""
+        return (self.id, self.installment_count, self.interest_rate, self.commission_rate,
+                self.min_amount, self.max_amount)
+
+
+class _Bucket(object):
+
+    __slots__ = ('mins', 'rules')
+
+    def __init__(self, rules):
+        self.rules = sorted(rules, key=lambda rule: (rule.min_amount, rule.position))
+        self.mins = [rule.min_amount for rule in self.rules]
+
+    def stab(self, amount):
+        """``min_amount <= tutar <= max_amount`` olan kurallar"""
+        return [rule for rule in self.rules[:bisect_right(self.mins, amount)] if amount <= rule.max_amount]
+
+
+class InstallmentIndex(object):
+
+    def __init__(self, rules):
+        rules = list(rules)
+        self.size = 0
+        self._by_id = {}
+        groups = {}
+        for position, rule in enumerate(rules):
+            rule.position = position
+            self.size += 1
+            self._by_id[rule.kind, rule.id] = rule
+            # Sağlayıcı filtresiz ve sağlayıcılı sorgular için iki kova
+            groups.setdefault((rule.kind, rule.category_id, None), []).append(rule)
+            groups.setdefault((rule.kind, rule.category_id, rule.provider_id), []).append(rule)
+        self._buckets = {key: _Bucket(group) for key, group in groups.items()}
+        digest = hashlib.sha1()
+        for rule in rules:
+            digest.update(repr(tuple(getattr(rule, name) for name in Rule.__slots__)).encode('utf-8'))
+        self.version = digest.hexdigest()[:16]
+
+    def get(self, kind, rule_id):
+        return self._by_id.get((kind, rule_id))
+
+    def lookup(self, kind, amount=None, provider_id=None, category_id=None, max_count=None,
+               installment_count=None, on_date=None):
+        """Koşullara uyan kuralları veritabanı sırasıyla döndürür.
+
+        ``amount`` verilmezse tutar sınırı uygulanmaz; ``on_date`` yalnızca
+        kampanyaların tarih aralığını süzer.
+        """
+        bucket = self._buckets.get((kind, category_id or None, provider_id or None))
+        if bucket is None:
+            return []
+        rules = bucket.rules if amount is None else bucket.stab(float(amount))
+        if max_count is not None:
+            rules = [rule for rule in rules if rule.installment_count <= max_count]
+        if installment_count is not None:
+            rules = [rule for rule in rules if rule.installment_count == installment_count]
+        if on_date is not None:
+            rules = [rule for rule in rules
+                     if rule.date_start and rule.date_end and rule.date_start <= on_date <= rule.date_end]
+        return sorted(rules, key=lambda rule: rule.position)
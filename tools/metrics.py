@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""Süreç içi metrikler ve Prometheus metin formatı.
+
+Değerler her Odoo işçisinin belleğinde tutulur; çok işçili kurulumlarda her
+kazıma yanıt veren işçinin gözlemlerini döndürür. Prometheus tarafında
+``rate``/``histogram_quantile`` toplamaları bu nedenle ``instance`` yerine
+metrik etiketleri üzerinden yapılmalıdır.
+"""
+
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, _escape(value)) for name, value in pairs)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Histogram(object):
+    """Etiket kombinasyonu başına kümülatif kovalı histogram"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def observe(self, value, *label_values):
+        key = tuple(str(v) for v in label_values)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        with self._lock:
+            series = {key: ([c for c in s[0]], s[1], s[2]) for key, s in self._series.items()}
+        lines = []
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append('%s_bucket%s %d' % (
+                    self.name, _format_labels(self.labels, key, ('le', _format_value(bound))), cumulative))
+            labels = _format_labels(self.labels, key)
+            lines.append('%s_sum%s %s' % (self.name, labels, _format_value(total)))
+            lines.append('%s_count%s %d' % (self.name, labels, count))
+        return lines
+
+
+class Gauge(object):
+    """Etiket kombinasyonu başına son ayarlanan değer"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def set(self, value, *label_values):
+        key = tuple(str(v) for v in label_values)
+        with self._lock:
+            self._series[key] = float(value)
+
+    def replace(self, values):
+        """Tüm serileri ``{etiket değerleri: değer}`` ile değiştirir"""
+        series = {tuple(str(v) for v in key): float(value) for key, value in values.items()}
+        with self._lock:
+            self._series = series
+
+    def collect(self):
+        with self._lock:
+            series = dict(self._series)
+        return ['%s%s %s' % (self.name, _format_labels(self.labels, key), _format_value(value))
+                for key, value in sorted(series.items())]
+
+
+def timed(func, *args, **kwargs):
+    """``func`` çağrısını ölçer: ``(sonuç, süre, hata)`` döndürür, yükseltmez"""
+    started = time.monotonic()
+    try:
+        return func(*args, **kwargs), time.monotonic() - started, None
+    except Exception as e:
+        return None, time.monotonic() - started, e
+
+
+def render():
+    """Kayıtlı tüm metrikleri Prometheus metin formatında döndürür"""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.append('# HELP %s %s' % (metric.name, metric.documentation))
+        lines.append('# TYPE %s %s' % (metric.name, metric.kind))
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
+
+
+BANK_REQUEST_DURATION = Histogram(
+    'turkey_pos_bank_request_duration_seconds',
+    'Bankaya yapılan isteklerin yeniden denemeler dahil toplam süresi',
+    labels=('provider', 'gateway_type', 'operation', 'outcome', 'code'),
+)
+
+WEBHOOK_QUEUE_DEPTH = Gauge(
+    'turkey_pos_webhook_queue_depth',
+    'İşlenmeyi bekleyen webhook sayısı (kazıma anında veritabanından okunur)',
+    labels=('provider_code',),
+)
+
+WEBHOOK_QUEUE_OLDEST_AGE = Gauge(
+    'turkey_pos_webhook_queue_oldest_age_seconds',
+    'Bekleyen en eski webhook\'un yaşı (kazıma anında veritabanından okunur)',
+    labels=('provider_code',),
+)
+
+WEBHOOK_PROCESSING_LAG = Histogram(
+    'turkey_pos_webhook_processing_lag_seconds',
+    'Webhook\'un alınması ile işlenmesi arasındaki süre',
+    labels=('provider_code', 'outcome'),
+    buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0),
+)
+
+WARMUP_DURATION = Gauge(
+    'turkey_pos_warmup_duration_seconds',
+    'Worker önbelleklerinin son ısınma süresi',
+    labels=('db',),
+)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Bankaya gönderilen sipariş numaraları.
+
+Numara ``<uzunluk><işlem id><sıra>`` biçimindedir: işlem id ve PostgreSQL
+sırasından alınan değer gateway'in alfabesinde yazılır, ilk karakter işlem
+id parçasının uzunluğunu verir. Sıra değeri her denemede farklı olduğundan
+numaralar çakışmaz; işlem id'si veritabanına bakmadan geri çözülür. Sabit
+uzunluk isteyen gateway'lerde numara soldan '0' ile doldurulur (uzunluk
+karakteri hiçbir zaman '0' değildir).
+"""
+
+DIGITS = '0123456789'
+ALPHANUMERIC = DIGITS + 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+class OrderIdRule(object):
+
+    __slots__ = ('alphabet', 'max_length', 'fixed_length')
+
+    def __init__(self, alphabet=ALPHANUMERIC, max_length=64, fixed_length=False):
+        self.alphabet = alphabet
+        self.max_length = max_length
+        self.fixed_length = fixed_length
+
+
+DEFAULT_RULE = OrderIdRule()
+
+# Gateway tipi -> sipariş numarası kuralı
+GATEWAY_RULES = {
+    'est': OrderIdRule(max_length=64),
+    'est_v3': OrderIdRule(max_length=64),
+    'garanti': OrderIdRule(max_length=36),
+    # PosNet XID: tam 24 karakter, bankanın döndürdüğü biçimle aynı
+    'posnet': OrderIdRule(max_length=24, fixed_length=True),
+    'posnet_v1': OrderIdRule(max_length=24, fixed_length=True),
+    'payfor': OrderIdRule(max_length=32),
+    'interpos': OrderIdRule(max_length=32),
+    'kuveyt': OrderIdRule(max_length=50),
+    'akbank': OrderIdRule(max_length=64),
+    'param': OrderIdRule(max_length=50),
+    'tosla': OrderIdRule(max_length=64),
+    'vakifkatilim': OrderIdRule(max_length=50),
+    'payflex': OrderIdRule(alphabet=DIGITS, max_length=20),
+    'payflex_cp': OrderIdRule(alphabet=DIGITS, max_length=20),
+}
+
+
+def get_rule(gateway_type):
+    return GATEWAY_RULES.get(gateway_type, DEFAULT_RULE)
+
+
+def _to_base(value, alphabet):
+    base = len(alphabet)
+    digits = []
+    while True:
+        value, remainder = divmod(value, base)
+        digits.append(alphabet[remainder])
+        if not value:
+            break
+    return ''.join(reversed(digits))
+
+
+def encode(transaction_id, sequence, gateway_type=None):
+    """İşlem id ve sıra değerinden gateway kurallarına uyan numara üretir"""
+    rule = get_rule(gateway_type)
+    alphabet = rule.alphabet
+    tx_part = _to_base(transaction_id, alphabet)
+    if len(tx_part) >= len(alphabet):
+        raise ValueError('Transaction id %s is too large for order id alphabet' % transaction_id)
+    order_id = alphabet[len(tx_part)] + tx_part + _to_base(sequence, alphabet)
+    if len(order_id) > rule.max_length:
+        raise ValueError('Order id %s exceeds %s characters' % (order_id, rule.max_length))
+    if rule.fixed_length:
+        order_id = order_id.rjust(rule.max_length, '0')
+    return order_id
+
+
+def decode(order_id, gateway_type=None):
+    """Numaradan işlem id'sini çözer; bu biçimde değilse None döndürür"""
+    alphabet = get_rule(gateway_type).alphabet
+    value = (order_id or '').lstrip('0').upper()
+    if not value:
+        return None
+    length = alphabet.find(value[0])
+    tx_part = value[1:1 + length]
+    if length < 1 or len(value) <= length + 1 or any(char not in alphabet for char in value):
+        return None
+    return int(tx_part, len(alphabet))
+
+
+def same(stored, received):
+    """Saklanan numara ile bankanın döndürdüğünü dolgu farkı gözetmeden karşılaştırır"""
+    return bool(stored) and (stored or '').lstrip('0').upper() == (received or '').lstrip('0').upper()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Taksit fiyatlama motoru.
+
+Seçeneklerin oran tablosu (taksit sayısı, vade farkı, komisyon, tutar
+sınırları) dizilere yüklenir; N tutar × M seçenek tek geçişte hesaplanır.
+``numpy`` kuruluysa hesap vektörel yapılır, kurulu değilse aynı formül düz
+Python ile uygulanır. İşlem sırası eski kayıt bazlı hesapla aynıdır ve
+kuruşa yuvarlama her iki yolda da Python ``round`` ile yapılır; sonuçlar
+birebir aynıdır.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class RateTable(object):
+    """``(anahtar, taksit, vade farkı %, komisyon %, en az, en çok)`` satırlarından oran tablosu"""
+
+    __slots__ = ('keys', 'counts', 'interest_rates', 'commission_rates', 'min_amounts', 'max_amounts')
+
+    def __init__(self, rows):
+        rows = list(rows)
+        self.keys = [row[0] for row in rows]
+        columns = list(zip(*rows))[1:] if rows else [()] * 5
+        if numpy is not None:
+            columns = [numpy.asarray(column, dtype=float) for column in columns]
+        (self.counts, self.interest_rates, self.commission_rates,
+         self.min_amounts, self.max_amounts) = columns
+
+    def __len__(self):
+        return len(self.keys)
+
+    def price(self, amounts, charge_single=False):
+        """Her tutar için ``{anahtar: (taksit tutarı, toplam, komisyon)}`` listesi döndürür.
+
+        ``charge_single`` kapalıysa tek çekimde vade farkı ve komisyon
+        uygulanmaz (``installment.option`` davranışı).
+        """
+        amounts = [float(amount or 0.0) for amount in amounts]
+        if not self.keys or not amounts:
+            return [{} for _amount in amounts]
+        if numpy is None:
+            grids = _price_python(amounts, self.counts, self.interest_rates, self.commission_rates, charge_single)
+        else:
+            grids = _price_numpy(amounts, self.counts, self.interest_rates, self.commission_rates, charge_single)
+        installments, totals, commissions = (
+            [[round(value, 2) for value in row] for row in grid] for grid in grids)
+        return [dict(zip(self.keys, zip(*columns)))
+                for columns in zip(installments, totals, commissions)]
+
+    def eligible(self, amount):
+        """Tutar sınırları içinde kalan seçeneklerin anahtarları"""
+        amount = float(amount or 0.0)
+        if numpy is None:
+            return [key for key, low, high in zip(self.keys, self.min_amounts, self.max_amounts)
+                    if low <= amount <= high]
+        mask = (self.min_amounts <= amount) & (amount <= self.max_amounts)
+        return [key for key, ok in zip(self.keys, mask.tolist()) if ok]
+
+
+def _price_numpy(amounts, counts, interest_rates, commission_rates, charge_single):
+    base = numpy.asarray(amounts, dtype=float)[:, None]
+    with_interest = numpy.where(interest_rates > 0, base * (1 + (interest_rates / 100)), base)
+    commission = (with_interest * commission_rates) / 100
+    total = with_interest + commission
+    installment = total / numpy.where(counts > 0, counts, 1)
+    if not charge_single:
+        single = counts <= 1
+        installment = numpy.where(single, base, installment)
+        total = numpy.where(single, base, total)
+        commission = numpy.where(single, 0.0, commission)
+    shape = (len(amounts), len(counts))
+    return tuple(numpy.broadcast_to(grid, shape).tolist() for grid in (installment, total, commission))
+
+
+def _price_python(amounts, counts, interest_rates, commission_rates, charge_single):
+    installments, totals, commissions = [], [], []
+    for base in amounts:
+        row_installment, row_total, row_commission = [], [], []
+        for count, interest_rate, commission_rate in zip(counts, interest_rates, commission_rates):
+            if count <= 1 and not charge_single:
+                row_installment.append(base)
+                row_total.append(base)
+                row_commission.append(0.0)
+                continue
+            with_interest = base * (1 + (interest_rate / 100)) if interest_rate > 0 else base
+            commission = (with_interest * commission_rate) / 100
+            total = with_interest + commission
+            row_installment.append(total / (count if count > 0 else 1))
+            row_total.append(total)
+            row_commission.append(commission)
+        installments.append(row_installment)
+        totals.append(row_total)
+        commissions.append(row_commission)
+    return installments, totals, commissions
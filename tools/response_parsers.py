@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""Gateway tipine göre banka yanıtı ayrıştırıcıları.
+
+Yanıtlar lxml ile ayrıştırılır; ağaçta yalnızca alan haritasında bulunan
+dallara inilir, gereksiz elemanlar tek bir sözlük aramasıyla atlanır. Sonuç,
+sözlük gibi de okunabilen ``GatewayResult`` nesnesidir; mevcut
+``result.get('success')`` kullanımları değişmeden çalışır.
+"""
+
+import threading
+
+from lxml import etree
+
+PARSING_ERROR = 'PARSING_ERROR'
+
+
+class GatewayResult(object):
+    """Banka yanıtının ortak alanları"""
+
+    __slots__ = ('success', 'code', 'message', 'auth_code', 'rrn', 'transaction_id',
+                 'order_id', 'error_code', 'trans_stat', 'processed', 'raw')
+
+    # Sözlük erişiminde görünen alanlar (ham yanıt hariç)
+    KEYS = __slots__[:-1]
+
+    def __init__(self, success=False, code='', message='', auth_code='', rrn='', transaction_id='',
+                 order_id='', error_code='', trans_stat='', processed=False, raw=None):
+        self.success = success
+        self.code = code
+        self.message = message
+        self.auth_code = auth_code
+        self.rrn = rrn
+        self.transaction_id = transaction_id
+        self.order_id = order_id
+        self.error_code = error_code
+        self.trans_stat = trans_stat
+        self.processed = processed
+        self.raw = raw
+
+    def get(self, key, default=None):
+        if key in self.KEYS:
+            return getattr(self, key)
+        return default
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.KEYS}
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+_local = threading.local()
+
+
+def _parser():
+    # lxml ayrıştırıcıları iş parçacıkları arasında paylaşılmaz
+    parser = getattr(_local, 'parser', None)
+    if parser is None:
+        # Metin zaten çözülmüş olduğundan XML bildirimindeki kodlama yok sayılır
+        parser = _local.parser = etree.XMLParser(encoding='utf-8', resolve_entities=False, no_network=True)
+    return parser
+
+
+def _walk(element, field_map, values):
+    for child in element:
+        target = field_map.get(child.tag)
+        if target is None:
+            continue
+        if isinstance(target, dict):
+            _walk(child, target, values)
+        else:
+            text = child.text or ''
+            for name in target:
+                values[name] = text
+
+
+# Etiket -> alan adları; iç içe sözlükler alt elemanlara iner
+CC5_FIELDS = {
+    'ProcReturnCode': ('code',),
+    'ErrMsg': ('message',),
+    'AuthCode': ('auth_code',),
+    'HostRefNum': ('rrn',),
+    'TransId': ('transaction_id',),
+    'OrderId': ('order_id',),
+    'Extra': {
+        'ERRORCODE': ('error_code',),
+        'TRANS_STAT': ('trans_stat',),
+    },
+}
+
+GVPS_FIELDS = {
+    'Order': {
+        'OrderID': ('order_id',),
+    },
+    'Transaction': {
+        'Response': {
+            'Code': ('code',),
+            'Message': ('message',),
+            'ReasonCode': ('error_code',),
+        },
+        'RetrefNum': ('rrn', 'transaction_id'),
+        'AuthCode': ('auth_code',),
+    },
+}
+
+
+def _parse(field_map, response_text):
+    values = {}
+    try:
+        if isinstance(response_text, str):
+            root = etree.fromstring(response_text.encode('utf-8'), _parser())
+        else:
+            # Baytlarda XML bildirimindeki kodlama geçerlidir
+            root = etree.fromstring(response_text)
+        _walk(root, field_map, values)
+    except (etree.XMLSyntaxError, ValueError, AttributeError) as e:
+        return GatewayResult(code=PARSING_ERROR, message=str(e), raw=response_text)
+    return GatewayResult(success=values.get('code') == '00', raw=response_text, **values)
+
+
+def parse_cc5(response_text):
+    """EST CC5Response"""
+    return _parse(CC5_FIELDS, response_text)
+
+
+def parse_gvps(response_text):
+    """Garanti GVPSResponse"""
+    return _parse(GVPS_FIELDS, response_text)
+
+
+PARSERS = {
+    'est': parse_cc5,
+    'est_v3': parse_cc5,
+    'garanti': parse_gvps,
+}
+
+
+def get_parser(gateway_type):
+    return PARSERS.get(gateway_type)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Banka çağrıları için idempotency farkındalıklı yeniden deneme motoru.
+
+Bağlantı kurulamadan oluşan hatalar (istek bankaya ulaşmamıştır) her işlem
+için güvenle tekrar denenir. Yanıt alınamayan durumlarda ise işlem bankada
+gerçekleşmiş olabilir: yalnızca güvenli işlemler (OrderInq) doğrudan tekrar
+denenir, Credit/Void/Auth gibi işlemler önce durum sorgusuyla doğrulanır.
+"""
+
+import logging
+import random
+import time
+
+import requests
+
+_logger = logging.getLogger(__name__)
+
+# Tekrar denenmesi bankada çift işlem yaratmayan operasyonlar
+SAFE_OPERATIONS = frozenset({'OrderInq', 'OrderHistory', 'Inquiry'})
+
+# Bankanın isteği işlemediğini bildiren HTTP kodları
+NOT_PROCESSED_STATUS_CODES = frozenset({429})
+# Bankanın isteği işleyip işlemediği belirsiz olan HTTP kodları
+AMBIGUOUS_STATUS_CODES = frozenset({500, 502, 503, 504})
+
+
+class GatewayError(Exception):
+    """Yeniden denemeler tükendikten sonra yükseltilen hata"""
+
+
+class RetryPolicy(object):
+    """Deneme sayısı, bekleme ve zaman aşımı sınırları"""
+
+    __slots__ = ('retries', 'base_delay', 'max_delay', 'connect_timeout', 'read_timeout', 'deadline')
+
+    def __init__(self, retries=3, base_delay=0.5, max_delay=8.0,
+                 connect_timeout=5.0, read_timeout=30.0, deadline=60.0):
+        self.retries = max(int(retries or 0), 0)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+
+    def backoff(self, attempt):
+        """Üstel bekleme süresini tam jitter ile döndürür"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+def is_idempotent(operation):
+    return operation in SAFE_OPERATIONS
+
+
+def classify(error):
+    """Hatayı sınıflandırır: 'not_sent', 'ambiguous' veya 'fatal'"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return 'not_sent'
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        if status in NOT_PROCESSED_STATUS_CODES:
+            return 'not_sent'
+        if status in AMBIGUOUS_STATUS_CODES:
+            return 'ambiguous'
+        return 'fatal'
+    if isinstance(error, requests.exceptions.ConnectionError):
+        # Bağlantı hiç kurulamadıysa istek bankaya ulaşmamıştır
+        cause = error.args[0] if error.args else None
+        reason = getattr(cause, 'reason', cause)
+        if type(reason).__name__ in ('NewConnectionError', 'NameResolutionError'):
+            return 'not_sent'
+        return 'ambiguous'
+    if isinstance(error, requests.exceptions.Timeout):
+        return 'ambiguous'
+    return 'fatal'
+
+
+def call(send, policy, operation=None, verify=None):
+    """``send(timeout)`` çağrısını politikaya göre tekrar dener.
+
+    ``verify`` güvenli olmayan işlemler için kullanılır ve ``(applied, text)``
+    döndürür: ``applied`` True ise işlem bankada gerçekleşmiştir ve ``text``
+    yanıt olarak kullanılır, False ise tekrar denenir, None ise durum
+    bilinmediğinden tekrar denenmez.
+    """
+    idempotent = is_idempotent(operation)
+    deadline = time.monotonic() + policy.deadline
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise GatewayError('Deadline of %ss exceeded for %s' % (policy.deadline, operation))
+        timeout = (min(policy.connect_timeout, remaining), min(policy.read_timeout, remaining))
+        try:
+            return send(timeout)
+        except requests.exceptions.RequestException as error:
+            kind = classify(error)
+            if kind == 'fatal' or attempt >= policy.retries:
+                raise GatewayError(str(error)) from error
+            if kind == 'ambiguous' and not idempotent:
+                if verify is None:
+                    raise GatewayError(str(error)) from error
+                applied, text = verify()
+                if applied:
+                    _logger.info('%s already applied at bank, not retrying', operation)
+                    return text
+                if applied is None:
+                    raise GatewayError(str(error)) from error
+            delay = policy.backoff(attempt)
+            if time.monotonic() + delay >= deadline:
+                raise GatewayError(str(error)) from error
+            _logger.warning('%s attempt %s failed (%s), retrying in %.2fs', operation, attempt + 1, error, delay)
+            time.sleep(delay)
+            attempt += 1
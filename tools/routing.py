@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""Ödeme ekranı için sağlayıcı yönlendirme motoru.
+
+Her sağlayıcı için son işlemlerin başarı oranı, bu worker'da ölçülen banka
+yanıt süreleri ve taksit seçenekleri bellekte tutulur. Durum veritabanı
+başına bir kez oluşturulur ve ``REFRESH_SECONDS`` aralıklarla yalnızca
+değişen işlemler okunarak güncellenir; sıralama isteği veritabanına gitmez.
+
+Puan; kartı çıkaran bankayla eşleşme, yumuşatılmış başarı oranı, yanıt süresi
+ve varsayılan sağlayıcı tercihinin ağırlıklı toplamıdır. İstenen taksit
+sayısını sunmayan sağlayıcılar listenin sonuna düşer.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Kart BIN numarası (ilk 6 hane) -> kartı çıkaran banka (sağlayıcı kodu)
+CARD_BIN_RANGES = {
+    'akbank': ['454671', '454672', '413252', '520932'],
+    'garanti': ['514915', '540036', '540037', '541865'],
+    'isbank': ['450803', '540667', '540668', '541078'],
+    'ziraat': ['454671', '540130', '541865'],
+    'halkbank': ['522241', '540435', '543081'],
+    'vakifbank': ['411724', '411726', '425669'],
+    'yapikredi': ['545103', '545616', '547564'],
+    'finansbank': ['525312', '540963', '542404'],
+    'denizbank': ['552096', '554567', '676366'],
+    'teb': ['450918', '540638', '543738'],
+    'sekerbank': ['402275', '402276', '403814'],
+    'kuveytturk': ['402589', '402590', '410555'],
+}
+
+# Tablo sırası korunur: birden çok bankada geçen BIN ilk bankaya eşlenir
+BIN_INDEX = {}
+for _bank, _bins in CARD_BIN_RANGES.items():
+    for _bin in _bins:
+        BIN_INDEX.setdefault(_bin, _bank)
+
+REFRESH_SECONDS = 30.0
+# Artımlı okumada su seviyesinin geri alındığı süre; write_date yazan işlemin
+# başlangıç zamanıdır, uzun süren işlemler su seviyesinden sonra kaydedilebilir
+WATERMARK_OVERLAP_SECONDS = 300
+# Sağlayıcı başına dikkate alınan son işlem sonucu ve yanıt süresi sayısı
+OUTCOME_WINDOW = 200
+LATENCY_WINDOW = 100
+# Başarı oranının az veriyle uç değerlere kaymasını önleyen ön bilgi
+PRIOR_SUCCESS_RATE = 0.9
+PRIOR_WEIGHT = 10.0
+# Bu sürede yanıt veren banka gecikme puanının yarısını alır
+LATENCY_REFERENCE_SECONDS = 2.0
+
+WEIGHT_ISSUER = 0.3
+WEIGHT_SUCCESS = 0.4
+WEIGHT_LATENCY = 0.2
+WEIGHT_DEFAULT = 0.1
+PENALTY_NO_INSTALLMENT = 1.0
+PENALTY_CIRCUIT_OPEN = 2.0
+
+
+def detect_bank(card_number):
+    """Kart numarası veya BIN'den kartı çıkaran bankanın kodunu döndürür"""
+    digits = ''.join(char for char in str(card_number or '') if char.isdigit())
+    return BIN_INDEX.get(digits[:6])
+
+
+class ProviderStats(object):
+
+    __slots__ = ('outcomes', 'latencies')
+
+    def __init__(self):
+        # işlem id -> başarılı mı; aynı işlem güncellenirse sonucu değişir
+        self.outcomes = OrderedDict()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def record_outcome(self, transaction_id, success):
+        if transaction_id in self.outcomes:
+            # Örtüşen okumalardaki tekrarlar sırayı değiştirmez
+            self.outcomes[transaction_id] = success
+            return
+        self.outcomes[transaction_id] = success
+        while len(self.outcomes) > OUTCOME_WINDOW:
+            self.outcomes.popitem(last=False)
+
+    def success_rate(self):
+        successes = sum(1 for success in self.outcomes.values() if success)
+        return (successes + PRIOR_SUCCESS_RATE * PRIOR_WEIGHT) / (len(self.outcomes) + PRIOR_WEIGHT)
+
+    def median_latency(self):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[len(ordered) // 2]
+
+
+class RoutingState(object):
+
+    def __init__(self):
+        self.stats = {}
+        # sağlayıcı id -> [(taksit sayısı, en az tutar, en çok tutar)]
+        self.installments = {}
+        self.watermark = None
+        self.refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def _stats(self, provider_id):
+        stats = self.stats.get(provider_id)
+        if stats is None:
+            stats = self.stats[provider_id] = ProviderStats()
+        return stats
+
+    def needs_refresh(self, now=None):
+        return (now or time.monotonic()) - self.refreshed_at >= REFRESH_SECONDS
+
+    def apply(self, outcomes, installments, watermark):
+        """``(işlem id, sağlayıcı id, başarılı)`` sonuçlarını ve taksit tablosunu uygular"""
+        with self._lock:
+            for transaction_id, provider_id, success in outcomes:
+                self._stats(provider_id).record_outcome(transaction_id, success)
+            if installments is not None:
+                table = {}
+                for provider_id, count, min_amount, max_amount in installments:
+                    table.setdefault(provider_id, []).append((count, min_amount, max_amount))
+                self.installments = table
+            if watermark is not None:
+                self.watermark = watermark
+            self.refreshed_at = time.monotonic()
+
+    def observe_latency(self, provider_id, seconds):
+        with self._lock:
+            self._stats(provider_id).latencies.append(seconds)
+
+    def offers_installment(self, provider_id, count, amount):
+        if not count or count <= 1:
+            return True
+        return any(option_count == count and (amount is None or min_amount <= amount <= max_amount)
+                   for option_count, min_amount, max_amount in self.installments.get(provider_id, ()))
+
+    def score(self, provider_id, code, issuer=None, amount=None, installment_count=1,
+              default_id=None, circuit_open=False):
+        """Sağlayıcının puanını ve puanı oluşturan bileşenleri döndürür"""
+        with self._lock:
+            stats = self.stats.get(provider_id) or ProviderStats()
+            success_rate = stats.success_rate()
+            latency = stats.median_latency()
+            has_installment = self.offers_installment(provider_id, installment_count, amount)
+        latency_score = 0.5 if latency is None else 1.0 / (1.0 + latency / LATENCY_REFERENCE_SECONDS)
+        score = (WEIGHT_ISSUER * (issuer is not None and code == issuer)
+                 + WEIGHT_SUCCESS * success_rate
+                 + WEIGHT_LATENCY * latency_score
+                 + WEIGHT_DEFAULT * (provider_id == default_id))
+        if not has_installment:
+            score -= PENALTY_NO_INSTALLMENT
+        if circuit_open:
+            score -= PENALTY_CIRCUIT_OPEN
+        return score, {
+            'issuer_match': issuer is not None and code == issuer,
+            'success_rate': round(success_rate, 4),
+            'median_latency': latency,
+            'installment_available': has_installment,
+            'circuit_open': circuit_open,
+        }
+
+    def rank(self, candidates, issuer=None, amount=None, installment_count=1, default_id=None):
+        """``(sağlayıcı id, kod, devre açık mı)`` adaylarını puana göre sıralar.
+
+        ``[(sağlayıcı id, puan, bileşenler)]`` döndürür; eşit puanlar aday
+        sırasını korur.
+        """
+        ranked = []
+        for provider_id, code, circuit_open in candidates:
+            score, details = self.score(provider_id, code, issuer, amount, installment_count,
+                                        default_id, circuit_open)
+            ranked.append((provider_id, score, details))
+        ranked.sort(key=lambda item: -item[1])
+        return ranked
+
+
+_states = {}
+_states_lock = threading.Lock()
+
+
+def get_state(dbname):
+    """Veritabanının yönlendirme durumunu döndürür (worker başına)"""
+    state = _states.get(dbname)
+    if state is None:
+        with _states_lock:
+            state = _states.setdefault(dbname, RoutingState())
+    return state
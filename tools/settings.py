@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""``turkey_pos_payment.*`` sistem parametrelerinin tipli görünümü.
+
+Parametreler ``res.config.settings._get_pos_settings`` ile tek sorguda okunur
+ve kayıt defteri önbelleğinde tutulur; ``ir.config_parameter`` değiştiğinde
+önbellek tüm worker'larda temizlenir. Kayıtlı olmayan parametre ayar
+ekranındaki gibi varsayılan değerini alır.
+"""
+
+from . import warmup
+
+PREFIX = 'turkey_pos_payment.'
+
+
+def _bool(value):
+    return value.strip().lower() not in ('', '0', 'false', 'none')
+
+
+def _int_or_none(value):
+    return int(value) or None
+
+
+# alan adı -> (dönüştürücü, varsayılan)
+SPECS = {
+    'default_pos_provider': (_int_or_none, None),
+    'force_3d_secure': (_bool, False),
+    'min_amount_3d': (float, 0.0),
+    'enable_installments': (_bool, True),
+    'max_installment_count': (int, 12),
+    'min_amount_installment': (float, 100.0),
+    'auto_refund': (_bool, False),
+    'refund_time_limit': (int, 30),
+    'log_requests': (_bool, True),
+    'timeout_seconds': (int, 30),
+    'retry_count': (int, 3),
+    'cron_max_workers': (int, 50),
+    'hide_open_circuit': (_bool, False),
+    'warmup_mode': (str, warmup.LAZY),
+    'metrics_token': (str, ''),
+    'notify_success': (_bool, True),
+    'notify_failure': (_bool, True),
+    'notify_refund': (_bool, True),
+}
+
+DEFAULTS = {name: default for name, (_convert, default) in SPECS.items()}
+
+
+class PosSettings(object):
+    """Salt okunur ayar nesnesi; önbellekte paylaşıldığı için değiştirilemez"""
+
+    __slots__ = tuple(SPECS)
+
+    def __init__(self, values):
+        for name, (convert, default) in SPECS.items():
+            raw = values.get(PREFIX + name)
+            try:
+                value = default if raw in (None, False) else convert(raw)
+            except (TypeError, ValueError):
+                value = default
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('PosSettings is read-only')
+
+    def __repr__(self):
+        return 'PosSettings(%s)' % ', '.join('%s=%r' % (name, getattr(self, name)) for name in SPECS)
+
+    def requires_3d(self, amount):
+        """Tutar için 3D Secure zorunlu mu"""
+        return self.force_3d_secure and (amount or 0.0) >= self.min_amount_3d
+
+    def max_installments(self, amount):
+        """Tutar için sunulabilecek en yüksek taksit sayısı"""
+        if not self.enable_installments or (amount or 0.0) < self.min_amount_installment:
+            return 1
+        return max(self.max_installment_count, 1)
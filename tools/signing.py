@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Sağlayıcı bazında imzalama bağlamı.
+
+Anahtarlar bir kez kodlanır, türetilmiş değerler (Garanti ``security_data``)
+bir kez hesaplanır ve hash/HMAC nesneleri önceden hazırlanıp her çağrıda
+``copy()`` ile kullanılır. Karşılaştırmalar sabit zamanlıdır.
+"""
+
+import hashlib
+import hmac
+
+HASH_FACTORIES = {
+    'sha256': hashlib.sha256,
+    'sha512': hashlib.sha512,
+}
+
+# Gateway tipi -> (özet algoritması, büyük harf). Algoritma None ise
+# sağlayıcının hash_algorithm alanı kullanılır.
+HASH_SCHEMES = {
+    'est': (None, False),
+    'est_v3': (None, False),
+    'garanti': ('sha256', True),
+    'posnet': (None, False),
+    'posnet_v1': (None, False),
+    'payfor': (None, False),
+    'interpos': (None, False),
+    'kuveyt': (None, True),
+    'akbank': (None, False),
+    'param': (None, False),
+    'tosla': (None, False),
+    'vakifkatilim': (None, False),
+    'payflex': (None, False),
+    'payflex_cp': (None, False),
+}
+
+
+def _factory(algorithm):
+    return HASH_FACTORIES.get(algorithm, hashlib.sha256)
+
+
+def digest(data, algorithm='sha256'):
+    """``data`` için onaltılık özet döndürür (sha512 dışındakiler sha256)"""
+    return _factory(algorithm)(data.encode('utf-8')).hexdigest()
+
+
+def compare(expected, received):
+    """Sabit zamanlı, büyük/küçük harf duyarlı karşılaştırma"""
+    return hmac.compare_digest((expected or '').encode('utf-8'), (received or '').encode('utf-8'))
+
+
+class SigningContext(object):
+
+    __slots__ = ('gateway_type', 'algorithm', 'upper', 'store_key', '_hash_proto',
+                 '_sha256_proto', '_hmac_proto', 'security_data')
+
+    def __init__(self, gateway_type, hash_algorithm, store_key, terminal_id='', provision_password=''):
+        algorithm, upper = HASH_SCHEMES.get(gateway_type, (None, False))
+        self.gateway_type = gateway_type
+        self.algorithm = algorithm or hash_algorithm or 'sha256'
+        self.upper = upper
+        self.store_key = (store_key or '').encode('utf-8')
+        self._hash_proto = _factory(self.algorithm)()
+        self._sha256_proto = hashlib.sha256()
+        self._hmac_proto = hmac.new(self.store_key, digestmod=hashlib.sha256)
+        # Garanti: SHA-256(provizyon şifresi + 9 haneli terminal no), yalnızca sağlayıcı alanlarına bağlı
+        self.security_data = self._hexdigest(
+            self._sha256_proto, (provision_password or '') + (terminal_id or '').zfill(9)).upper()
+
+    @staticmethod
+    def _hexdigest(proto, data, suffix=b''):
+        h = proto.copy()
+        h.update(data.encode('utf-8'))
+        if suffix:
+            h.update(suffix)
+        return h.hexdigest()
+
+    def sign(self, data):
+        """Gateway'in şemasıyla istek hash'i üretir"""
+        value = self._hexdigest(self._hash_proto, data)
+        return value.upper() if self.upper else value
+
+    def sign_with_key(self, data, algorithm=None):
+        """``data + mağaza anahtarı`` özetini döndürür"""
+        proto = self._hash_proto if algorithm in (None, self.algorithm) else _factory(algorithm)()
+        return self._hexdigest(proto, data, self.store_key)
+
+    def hmac(self, data):
+        """Mağaza anahtarıyla HMAC-SHA256 döndürür"""
+        h = self._hmac_proto.copy()
+        h.update(data if isinstance(data, bytes) else data.encode('utf-8'))
+        return h.hexdigest()
+
+    # ---- Doğrulama ----
+    def _expected_est(self, post_data):
+        return self.sign_with_key(post_data.get('HASHPARAMSVAL', '')).upper(), (post_data.get('HASH') or '').upper()
+
+    def _expected_garanti(self, post_data):
+        data = '%s%s%s%s%s' % (
+            post_data.get('clientid', ''), post_data.get('oid', ''), post_data.get('authCode', ''),
+            post_data.get('procReturnCode', ''), post_data.get('mdStatus', ''))
+        return self._hexdigest(self._sha256_proto, data, self.store_key).upper(), post_data.get('HASH', '')
+
+    def verify_callback(self, post_data):
+        """3D dönüşünün hash'ini doğrular; şeması olmayan gateway'ler için None"""
+        expected = CALLBACK_SCHEMES.get(self.gateway_type)
+        if not expected:
+            return None
+        calculated, received = expected(self, post_data)
+        return compare(calculated, received)
+
+    def verify_hmac(self, payload, signature):
+        """Webhook gövdesinin HMAC imzasını doğrular.
+
+        Mağaza anahtarı ya da imza yoksa doğrulama başarısızdır; boş anahtarlı
+        HMAC herkes tarafından üretilebilir.
+        """
+        if not self.store_key or not signature:
+            return False
+        return compare(self.hmac(payload), signature.lower())
+
+    def verify_many(self, callbacks=(), webhooks=()):
+        """Çok sayıda 3D dönüşünü ve ``(gövde, imza)`` webhook'unu tek seferde doğrular"""
+        return (
+            [self.verify_callback(post_data) for post_data in callbacks],
+            [self.verify_hmac(payload, signature) for payload, signature in webhooks],
+        )
+
+
+# Gateway tipi -> 3D dönüş hash'i (hesaplanan, gelen) çifti
+CALLBACK_SCHEMES = {
+    'est': SigningContext._expected_est,
+    'est_v3': SigningContext._expected_est,
+    'garanti': SigningContext._expected_garanti,
+}
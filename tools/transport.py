@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""ORM'den bağımsız banka taşıma katmanı.
+
+``payment.provider._get_transport`` sağlayıcı ayarlarını bir kez okuyup bu
+nesneyi oluşturur. Nesne veritabanı imlecine dokunmadığı için iş
+parçacıklarında (cron fan-out) güvenle kullanılabilir.
+"""
+
+import time
+
+import requests
+
+from . import circuit_breaker, retry
+
+
+class Transport(object):
+
+    __slots__ = ('label', 'url', 'session', 'breaker', 'policy')
+
+    def __init__(self, label, url, session, breaker, policy):
+        self.label = label
+        self.url = url
+        self.session = session
+        self.breaker = breaker
+        self.policy = policy
+
+    def _post(self, data, headers, timeout):
+        if not self.breaker.allow():
+            raise circuit_breaker.CircuitOpenError()
+        started = time.monotonic()
+        try:
+            response = self.session.post(self.url, data=data, headers=headers, timeout=timeout)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            # 4xx gibi kalıcı hatalar bankanın sağlığını göstermez
+            self.breaker.record(retry.classify(e) == 'fatal', time.monotonic() - started)
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        self.breaker.record(True, time.monotonic() - started)
+        return response.text
+
+    def send(self, data, headers=None, operation=None, verify=None):
+        """İsteği gönderir; ``CircuitOpenError`` veya ``GatewayError`` yükseltebilir"""
+        return retry.call(
+            lambda timeout: self._post(data, headers, timeout),
+            self.policy, operation=operation, verify=verify,
+        )
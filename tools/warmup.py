@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Worker başına bir kez çalışan ısınma adımı.
+
+Aynı veritabanı için eşzamanlı gelen ilk istekler ısınmayı tekrar başlatmaz;
+biri çalıştırırken diğerleri bitmesini bekler. Başarısız ısınma bir sonraki
+çağrıda yeniden denenir.
+"""
+
+import threading
+import time
+
+EAGER = 'eager'
+LAZY = 'lazy'
+OFF = 'off'
+
+MODES = [
+    (EAGER, 'Worker başlarken'),
+    (LAZY, 'İlk ödeme isteğinde'),
+    (OFF, 'Kapalı'),
+]
+
+_done = set()
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def is_done(key):
+    return key in _done
+
+
+def run_once(key, func):
+    """``func``'ı ``key`` için bir kez çalıştırır; süresini veya zaten ısındıysa None döndürür"""
+    if key in _done:
+        return None
+    with _locks_lock:
+        lock = _locks.setdefault(key, threading.Lock())
+    with lock:
+        if key in _done:
+            return None
+        started = time.monotonic()
+        func()
+        _done.add(key)
+        return time.monotonic() - started
+
+
+def reset(key):
+    """Önbellekler temizlendiğinde sonraki istekte yeniden ısınılmasını sağlar"""
+    _done.discard(key)
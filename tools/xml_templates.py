@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""Önceden derlenmiş XML istek şablonları.
+
+Sağlayıcıya özgü sabit bloklar (kimlik bilgileri, terminal, işlem tipi) bir
+kez lxml ile oluşturulup hedef kodlamada serileştirilir ve işleme özgü
+alanların yerlerinden bayt parçalarına bölünür. ``render`` yalnızca bu
+alanları kaçışlayıp kodlayarak parçaları birleştirir; çıktı lxml'in aynı
+ağaç için ürettiği baytlarla aynıdır.
+"""
+
+import uuid
+from xml.sax.saxutils import escape
+
+from lxml import etree
+
+# Gateway tipi -> XML lehçesi. Formla çalışan (XML API işlemi olmayan)
+# gateway'ler None ile eşlenir.
+GATEWAY_DIALECTS = {
+    'est': 'cc5',
+    'est_v3': 'cc5',
+    'garanti': 'gvps',
+    'posnet': None,
+    'posnet_v1': None,
+    'payfor': None,
+    'interpos': None,
+    'kuveyt': None,
+    'akbank': None,
+    'param': None,
+    'tosla': None,
+    'vakifkatilim': None,
+    'payflex': None,
+    'payflex_cp': None,
+}
+
+DIALECT_ENCODINGS = {
+    'cc5': 'ISO-8859-9',
+    'gvps': 'UTF-8',
+}
+
+# lxml metin düğümlerinde \r karakterini de kaçışlar
+_TEXT_ENTITIES = {'\r': '&#13;'}
+
+
+class Slot(object):
+    """Şablonda işleme özgü değerin yeri"""
+
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+
+class RequestTemplate(object):
+
+    __slots__ = ('chunks', 'slots', 'encoding')
+
+    def __init__(self, chunks, slots, encoding):
+        self.chunks = chunks
+        self.slots = slots
+        self.encoding = encoding
+
+    def render(self, values):
+        """``values`` sözlüğündeki alanlarla istek gövdesini bayt olarak döndürür"""
+        encoding = self.encoding
+        parts = [self.chunks[0]]
+        for name, chunk in zip(self.slots, self.chunks[1:]):
+            value = values[name]
+            parts.append(escape(value if isinstance(value, str) else str(value), _TEXT_ENTITIES)
+                         .encode(encoding, 'xmlcharrefreplace'))
+            parts.append(chunk)
+        return b''.join(parts)
+
+
+def _build(parent, children, markers):
+    for tag, value in children:
+        element = etree.SubElement(parent, tag)
+        if isinstance(value, (list, tuple)):
+            _build(element, value, markers)
+        elif isinstance(value, Slot):
+            marker = '{%s}' % uuid.uuid4().hex
+            markers.append((marker, value.name))
+            element.text = marker
+        else:
+            element.text = value or ''
+
+
+def compile_template(root_tag, children, encoding):
+    """``(etiket, değer)`` ağacından şablon derler.
+
+    Değer sabit metin, ``Slot`` ya da alt ``(etiket, değer)`` listesi olabilir.
+    """
+    root = etree.Element(root_tag)
+    markers = []
+    _build(root, children, markers)
+    data = etree.tostring(root, encoding=encoding, xml_declaration=True)
+
+    chunks = []
+    for marker, _name in markers:
+        head, sep, data = data.partition(marker.encode('ascii'))
+        if not sep:
+            raise ValueError('Template marker for %s not found' % _name)
+        chunks.append(head)
+    chunks.append(data)
+    return RequestTemplate(tuple(chunks), tuple(name for _marker, name in markers), encoding)
+
+
+def get_dialect(gateway_type):
+    return GATEWAY_DIALECTS.get(gateway_type)
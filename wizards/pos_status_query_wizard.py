@@ -2,6 +2,7 @@
 
 import logging
 from odoo import api, fields, models, _
+from odoo.exceptions import UserError
 
 _logger = logging.getLogger(__name__)
 
@@ -81,3 +82,25 @@ class PosStatusQueryWizard(models.TransientModel):
             }
         
         return {'type': 'ir.actions.act_window_close'}
+
+    def action_bulk_query(self):
+        """Sonuçlardaki işlemleri bankadan eşzamanlı sorgular"""
+        self.ensure_one()
+        transactions = self.result_ids.filtered('pos_order_id')
+        if not transactions:
+            raise UserError(_('Sorgulanacak işlem bulunamadı.'))
+        
+        outcomes = transactions._bulk_query_status()
+        success_count = sum(1 for result, error in outcomes.values() if not error and result.get('success'))
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Toplu Durum Sorgulama'),
+                'message': _('%(success)s / %(total)s işlem başarıyla sorgulandı.') % {
+                    'success': success_count, 'total': len(transactions),
+                },
+                'type': 'info',
+                'next': {'type': 'ir.actions.act_window_close'},
+            }
+        }